@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""
+Compares the write throughput of per row save() with BaseModel.bulk_upsert and BaseModel.copy_from.
+
+Meant for a throwaway Postgres: the database is the one configured for core_db (DB_* environment variables and
+the SSM credentials parameter), a scratch table is created in p2p_schema and dropped at the end.
+
+    python benchmarks/bulk_write_benchmark.py [rows]
+"""
+import datetime
+import os
+import sys
+import time
+from decimal import Decimal
+from pathlib import Path
+
+LAYERS = Path(__file__).resolve().parent.parent / "src" / "layers"
+sys.path[:0] = [
+    str(LAYERS / "core_db" / "python"),
+    str(LAYERS / "core" / "python"),
+    str(LAYERS / "lambda_powertools_custom" / "python"),
+]
+os.environ.setdefault("ENVIRONMENT", "dev")
+os.environ.setdefault("APP_NAME", "p2p")
+os.environ.setdefault("DEVELOPER", "benchmark")
+
+from core_db.base_model import BaseModel, database  # noqa: E402
+from peewee import BigIntegerField, DateTimeField, DecimalField, TextField  # noqa: E402
+
+
+class BenchmarkTransaction(BaseModel):
+    id = BigIntegerField(primary_key=True)
+    source_id = BigIntegerField()
+    dest_id = BigIntegerField()
+    amount = DecimalField(max_digits=20, decimal_places=2)
+    status = TextField()
+    created_at = DateTimeField()
+
+    class Meta:
+        table_name = "benchmark_transaction"
+        schema = "p2p_schema"
+
+
+def rows_payload(rows, status):
+    created_at = datetime.datetime(2023, 5, 1, 12, 30)
+    return (
+        {
+            "id": i,
+            "source_id": 1000 + i,
+            "dest_id": 2000 + i,
+            "amount": Decimal(f"{i % 5000}.{i % 100:02d}"),
+            "status": status,
+            "created_at": created_at + datetime.timedelta(seconds=i),
+        }
+        for i in range(rows)
+    )
+
+
+def per_row_save(rows):
+    for row in rows_payload(rows, "created"):
+        BenchmarkTransaction(**row).save(force_insert=True)
+
+
+def bulk_insert(rows):
+    BenchmarkTransaction.bulk_upsert(rows_payload(rows, "created"), ["id"])
+
+
+def bulk_update(rows):
+    # Every row conflicts, so all of them are updated.
+    BenchmarkTransaction.bulk_upsert(rows_payload(rows, "done"), ["id"], ["status"])
+
+
+def copy(rows):
+    BenchmarkTransaction.copy_from(rows_payload(rows, "created"))
+
+
+def run(rows):
+    database.connect(reuse_if_open=True)
+    BenchmarkTransaction.drop_table(safe=True)
+    BenchmarkTransaction.create_table()
+    try:
+        print(f"{rows} rows")
+        reference = None
+        for name, function, truncate in (
+            ("save() per row", per_row_save, True),
+            ("bulk_upsert, inserts", bulk_insert, False),
+            ("bulk_upsert, updates", bulk_update, True),
+            ("copy_from", copy, True),
+        ):
+            started = time.perf_counter()
+            function(rows)
+            throughput = rows / (time.perf_counter() - started)
+            assert BenchmarkTransaction.select().count() == rows, f"{name} wrote a different number of rows"
+            reference = reference or throughput
+            print(f"{name:<22} {throughput:>10.0f} rows/s  x{throughput / reference:.1f}")
+            if truncate:
+                BenchmarkTransaction.truncate_table()
+    finally:
+        BenchmarkTransaction.drop_table(safe=True)
+        database.close()
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
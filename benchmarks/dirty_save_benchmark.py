@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""
+Compares the update throughput of BaseModel.save() writing every column with the default dirty fields only saves,
+on a wide table where a single column changes per save and on saves without changes.
+
+The database is the one configured for core_db (DB_* environment variables and the SSM credentials parameter).
+A scratch table is created in p2p_schema and dropped at the end.
+
+    python benchmarks/dirty_save_benchmark.py [rows] [columns]
+"""
+import datetime
+import os
+import sys
+import time
+from decimal import Decimal
+from pathlib import Path
+
+LAYERS = Path(__file__).resolve().parent.parent / "src" / "layers"
+sys.path[:0] = [
+    str(LAYERS / "core_db" / "python"),
+    str(LAYERS / "core" / "python"),
+    str(LAYERS / "lambda_powertools_custom" / "python"),
+]
+os.environ.setdefault("ENVIRONMENT", "dev")
+os.environ.setdefault("APP_NAME", "p2p")
+os.environ.setdefault("DEVELOPER", "benchmark")
+
+from core_db.base_model import BaseModel, database  # noqa: E402
+from peewee import BigAutoField, DateTimeField, DecimalField, TextField  # noqa: E402
+
+
+def wide_model(columns, only_save_dirty):
+    attrs = {"id": BigAutoField(), "status": TextField()}
+    for i in range(columns):
+        attrs[f"amount_{i}"] = DecimalField(max_digits=20, decimal_places=2)
+        attrs[f"note_{i}"] = TextField()
+        attrs[f"created_at_{i}"] = DateTimeField()
+    attrs["Meta"] = type("Meta", (), {
+        "table_name": "benchmark_wide_row",
+        "schema": "p2p_schema",
+        "only_save_dirty": only_save_dirty,
+    })
+    return type(f"WideRow{'Dirty' if only_save_dirty else 'Full'}", (BaseModel,), attrs)
+
+
+def seed(model, rows, columns):
+    now = datetime.datetime(2023, 5, 1, 12, 30)
+    values = {}
+    for i in range(columns):
+        values[f"amount_{i}"] = Decimal("1234.56")
+        values[f"note_{i}"] = "x" * 200
+        values[f"created_at_{i}"] = now
+    with database.atomic():
+        model.insert_many([dict(values, status="created") for _ in range(rows)]).execute()
+
+
+def timed_saves(model, change):
+    instances = list(model.select())
+    started = time.perf_counter()
+    queries = 0
+    for position, instance in enumerate(instances):
+        if change:
+            instance.status = f"status-{position}-{time.perf_counter_ns()}"
+        queries += 1 if instance.save() else 0
+    return len(instances) / (time.perf_counter() - started), queries
+
+
+def run(rows, columns):
+    full, dirty = wide_model(columns, False), wide_model(columns, True)
+    database.connect(reuse_if_open=True)
+    full.drop_table(safe=True)
+    full.create_table()
+    try:
+        seed(full, rows, columns)
+        print(f"{rows} rows of {3 * columns + 2} columns, one save per row")
+        for change in (True, False):
+            print("one column changed" if change else "no changes")
+            reference = None
+            for name, model in (("all columns", full), ("dirty fields only", dirty)):
+                throughput, queries = timed_saves(model, change)
+                reference = reference or throughput
+                print(f"  {name:<18} {throughput:>9.0f} saves/s  x{throughput / reference:.1f}  {queries} queries")
+    finally:
+        full.drop_table(safe=True)
+        database.close()
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 2000, int(sys.argv[2]) if len(sys.argv) > 2 else 10)
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+"""
+Compares cast_python_default's previous json dumps/loads round trip with the single pass normalizers of
+core_utils.serializer: equal output, time and peak allocation.
+
+    python benchmarks/normalizer_benchmark.py [rows] [repeat]
+"""
+import datetime
+import json
+import os
+import sys
+import timeit
+import tracemalloc
+import uuid
+from decimal import Decimal
+from pathlib import Path
+
+LAYERS = Path(__file__).resolve().parent.parent / "src" / "layers"
+sys.path[:0] = [str(LAYERS / "core" / "python"), str(LAYERS / "lambda_powertools_custom" / "python")]
+os.environ.setdefault("ENVIRONMENT", "dev")
+os.environ.setdefault("APP_NAME", "p2p")
+os.environ.setdefault("DEVELOPER", "benchmark")
+
+from core_utils import serializer  # noqa: E402
+from core_utils.utils import cast_default  # noqa: E402
+
+
+def rows_payload(rows):
+    created_at = datetime.datetime(2023, 5, 1, 12, 30)
+    return [
+        {
+            "id": i,
+            "trx_id": uuid.uuid4(),
+            "source_id": 1000 + i,
+            "dest_id": 2000 + i,
+            "amount": Decimal(f"{i % 5000}.{i % 100:02d}"),
+            "status": "PENDING" if i % 3 else "COMPLETED",
+            "created_at": created_at + datetime.timedelta(seconds=i),
+            "value_date": created_at.date(),
+            "limits": (Decimal("100"), Decimal("5000.00")),
+            "metadata": {"channel": "app", "tags": ["p2p", "transfer"], "attempt": 1},
+        }
+        for i in range(rows)
+    ]
+
+
+def round_trip(data):
+    return json.loads(json.dumps(data, default=cast_default, ensure_ascii=False))
+
+
+def peak_allocation(function, data):
+    tracemalloc.start()
+    try:
+        function(data)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run(rows, repeat):
+    data = rows_payload(rows)
+    expected = round_trip(data)
+    candidates = {
+        "json dumps/loads": round_trip,
+        "normalize": serializer.normalize,
+        "normalize_iterative": serializer.normalize_iterative,
+    }
+
+    print(f"{rows} rows, best of {repeat}")
+    reference = None
+    for name, function in candidates.items():
+        assert function(data) == expected, f"{name} produced a different output"
+        best = min(timeit.repeat(lambda: function(data), number=1, repeat=repeat))
+        peak = peak_allocation(function, data)
+        reference = reference or best
+        print(f"{name:<22} {best * 1000:>9.2f} ms  x{reference / best:.1f}  peak {peak / 1024 / 1024:>7.2f} MiB")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 10000, int(sys.argv[2]) if len(sys.argv) > 2 else 5)
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+"""
+Per row cost of the namedtuple rows of single_object: a new class per call as before against the row types cached
+by column names, and the rows of many_objects built from tuples, with the peak allocation of each.
+
+    python benchmarks/row_type_benchmark.py [rows] [repeat]
+"""
+import datetime
+import os
+import sys
+import timeit
+import tracemalloc
+import uuid
+from collections import namedtuple
+from decimal import Decimal
+from pathlib import Path
+
+LAYERS = Path(__file__).resolve().parent.parent / "src" / "layers"
+sys.path[:0] = [
+    str(LAYERS / "core_db" / "python"),
+    str(LAYERS / "lambda_powertools_custom" / "python"),
+]
+os.environ.setdefault("ENVIRONMENT", "dev")
+os.environ.setdefault("APP_NAME", "p2p")
+os.environ.setdefault("DEVELOPER", "benchmark")
+
+from core_db.rows import compact_rows, row_type  # noqa: E402
+
+COLUMNS = ("id", "source_id", "dest_id", "amount", "status", "created_at")
+
+
+def dict_rows(rows):
+    created_at = datetime.datetime(2023, 5, 1, 12, 30)
+    return [dict(zip(COLUMNS, (i, 1000 + i, 2000 + i, Decimal("17.50"), "done", created_at))) for i in range(rows)]
+
+
+def class_per_call(rows):
+    return [namedtuple(f"single_object{uuid.uuid4().hex}", row.keys())(*row.values()) for row in rows]
+
+
+def cached_class(rows):
+    return [row_type(tuple(row.keys()))(*row.values()) for row in rows]
+
+
+def peak_allocation(function, data):
+    tracemalloc.start()
+    try:
+        function(data)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run(rows, repeat):
+    data = dict_rows(rows)
+    tuples = [tuple(row.values()) for row in data]
+    candidates = {
+        "single_object, class per call": (class_per_call, data),
+        "single_object, cached class": (cached_class, data),
+        "many_objects, from tuples": (lambda values: list(compact_rows(COLUMNS, values)), tuples),
+    }
+
+    print(f"{rows} rows, best of {repeat}")
+    reference = None
+    for name, (function, argument) in candidates.items():
+        assert [tuple(row) for row in function(argument)] == tuples, f"{name} produced different rows"
+        best = min(timeit.repeat(lambda: function(argument), number=1, repeat=repeat)) / rows
+        reference = reference or best
+        peak = peak_allocation(function, argument)
+        print(f"{name:<31} {best * 1e6:>8.2f} us/row  x{reference / best:.1f}  peak {peak / 1024 / 1024:>7.2f} MiB")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 5000, int(sys.argv[2]) if len(sys.argv) > 2 else 5)
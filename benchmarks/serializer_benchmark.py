@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""
+Compares the JSON serialization of transactions payloads with json.dumps(default=cast_default) and with the
+core_utils.serializer backends.
+
+    python benchmarks/serializer_benchmark.py [rows] [repeat]
+"""
+import datetime
+import json
+import os
+import sys
+import timeit
+import uuid
+from decimal import Decimal
+from pathlib import Path
+
+LAYERS = Path(__file__).resolve().parent.parent / "src" / "layers"
+sys.path[:0] = [str(LAYERS / "core" / "python"), str(LAYERS / "lambda_powertools_custom" / "python")]
+os.environ.setdefault("ENVIRONMENT", "dev")
+os.environ.setdefault("APP_NAME", "p2p")
+os.environ.setdefault("DEVELOPER", "benchmark")
+
+from core_utils import serializer  # noqa: E402
+from core_utils.utils import cast_default  # noqa: E402
+
+
+def transactions(rows):
+    created_at = datetime.datetime(2023, 5, 1, 12, 30, tzinfo=datetime.timezone.utc)
+    return {
+        "transactions": [
+            {
+                "id": i,
+                "trx_id": uuid.uuid4(),
+                "source_id": 1000 + i,
+                "dest_id": 2000 + i,
+                "amount": Decimal(f"{i % 5000}.{i % 100:02d}"),
+                "fee": Decimal(i % 10),
+                "status": "PENDING" if i % 3 else "COMPLETED",
+                "created_at": created_at + datetime.timedelta(seconds=i),
+                "value_date": created_at.date(),
+                "metadata": {"channel": "app", "tags": ["p2p", "transfer"]},
+            }
+            for i in range(rows)
+        ],
+        "total": rows,
+    }
+
+
+def baseline(payload):
+    return json.dumps(payload, default=cast_default, ensure_ascii=False)
+
+
+def run(rows, repeat):
+    payload = transactions(rows)
+    expected = json.loads(baseline(payload))
+    candidates = {"json.dumps + cast_default": baseline}
+    for backend in ("json", "orjson"):
+        try:
+            serializer.set_backend(backend)
+        except ValueError:
+            print(f"{backend}: not installed, skipped")
+            continue
+        candidates[f"serializer[{backend}]"] = lambda p, backend=backend: (
+            serializer.set_backend(backend), serializer.dumps(p)
+        )[1]
+
+    print(f"{rows} rows, best of {repeat}")
+    reference = None
+    for name, function in candidates.items():
+        assert json.loads(function(payload)) == expected, f"{name} produced a different payload"
+        best = min(timeit.repeat(lambda: function(payload), number=1, repeat=repeat))
+        reference = reference or best
+        print(f"{name:<28} {best * 1000:>9.2f} ms  x{reference / best:.1f}")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 1000, int(sys.argv[2]) if len(sys.argv) > 2 else 20)
@@ -2,92 +2,309 @@ from http import HTTPStatus
 
 from core_api.responses import api_response
 from core_decorators import requester_patch
+from core_utils import serializer
 from core_utils.utils import get_logger, get_body
 from core_decorators.logs import lambda_logger
 from playhouse.shortcuts import model_to_dict
-from db_aws.ssm import get_parameter
+from db_aws.ssm import declare_parameter, get_parameter
 
+# Declared before importing core_db so it is fetched together with the database configuration
+declare_parameter("p2p/transaction-bus/arn")
+
+from core_db.base_model import connection_manager, database
+from core_db.idempotency import IdempotencyStore
 from core_db.models import P2Ptransaction
+from db_utils.enum import P2PTransactionStatusEnum
+from core_aws.batch import RecordFailure, SqsBatchProcessor
+from core_aws.consumer import SqsConsumer
 from datetime import datetime
 import core_aws.eventbridge
 import uuid
 
 requester_patch()
 LOGGER = get_logger()
+PROCESSOR = SqsBatchProcessor()
+# Redelivered messages of a transaction already processed get its stored result back, the claims of a crashed
+# invocation expire with the function timeout (configuration.json).
+IDEMPOTENCY = IdempotencyStore("request_p2p_transaction", in_progress_ttl=30)
 
 TRX_BUS_ARN = get_parameter("p2p/transaction-bus/arn")
 
-@lambda_logger(logger=LOGGER)
-def lambda_handler(event: dict, _):
-    records = event.get("Records")
-    if records is None:
-        LOGGER.info("No records founded")
-        return {
-            "error": True,
-            "message": "No records founded"
-        }
-    
-    trxs = []
-    event_details = {
-        "name": "Send Notification",
-        "details": None
+
+def target_status(body: dict) -> str:
+    """
+    Status a banking request moves its transaction to.
+    """
+    if 'error' in body:
+        return P2PTransactionStatusEnum.FAILURE.value
+    return P2PTransactionStatusEnum.DONE.value
+
+
+def process_transaction(body: dict, trx_reg: P2Ptransaction):
+    """
+    Resolve the outcome of a single banking request whose transaction was already moved to its new status.
+
+    Returns: (dict, dict)
+        mock_resp: dict -> Details of the simulated bank response
+        resp_body: dict -> Outcome reported for the message
+    """
+    mock_resp = {
+        'trx_id': str(uuid.uuid4())
+    }
+    resp_body = {
+        "error": False,
+        "message": "OK"
     }
-    for record in records:
-        body = get_body(record)
-        LOGGER.info(f"{20 * '*'}  Processing banking request  {20 * '*'}")
 
-        trx_reg = P2Ptransaction.get_by_id(body.get('id', None))
-        LOGGER.info(trx_reg)
+    if trx_reg.status == P2PTransactionStatusEnum.FAILURE.value:
         mock_resp = {
-            'trx_id': str(uuid.uuid4())
-        }
-        trx_status = 'done'
-        resp_body = {
-            "error": False,
-            "message": "OK"
+            'error': True,
+            'message': 'Somenthing goes wrong at bank services'
         }
+        resp_body["error"] = True
+        resp_body["message"] = "Something goes wrong"
+    else:
+        resp_body["trx"] = trx_reg
+        mock_resp["source"] = trx_reg.source_id
+        mock_resp["dest"] = trx_reg.dest_id
+        mock_resp["amount"] = trx_reg.amount
+        mock_resp["timestamp"] = datetime.now().isoformat()
+
+    return mock_resp, resp_body
+
+
+def process_batch(bodies: list):
+    """
+    Move every created transaction of the batch to its new status with one conditional update per status, the
+    updated rows come back from the same statement so nothing is selected before.
 
-        if 'error' in body:
-            mock_resp = {
-                'error': True,
-                'message': 'Somenthing goes wrong at bank services'
-            }
-            trx_status = 'failure'
-            resp_body["error"] = True
-            resp_body["message"] = "Something goes wrong"
+    A transaction already in the status of its message was moved by an earlier delivery whose notification was not
+    confirmed, the lambda failed to publish it or timed out after the commit, so it is processed and published
+    again. A transaction in another status is reported as such, and a missing one as not found.
+
+    Returns: list
+        One outcome per message, in the same order as the bodies received.
+    """
+    outcomes = []
+    created = P2PTransactionStatusEnum.CREATED.value
+    with database.atomic():
+        ids_by_status = {}
+        for body in bodies:
+            ids_by_status.setdefault(target_status(body), []).append(body.get('id', None))
+        trx_regs = {}
+        for status, ids in ids_by_status.items():
+            trx_regs.update({trx_reg.id: trx_reg for trx_reg in P2Ptransaction.transition(ids, created, status)})
+        # Only the transactions that were not moved are looked up, usually none.
+        current = P2Ptransaction.get_by_ids(body.get('id', None) for body in bodies if body.get('id') not in trx_regs)
+
+        failed_by_status = {}
+        for body in bodies:
+            trx_id = body.get('id', None)
+            trx_reg = trx_regs.get(trx_id)
+            if trx_reg is None and trx_id in current:
+                if current[trx_id].status == target_status(body):
+                    LOGGER.info(f"Transaction {trx_id} already {current[trx_id].status}, publishing it again")
+                    trx_reg = current[trx_id]
+                else:
+                    outcomes.append({
+                        'input': body,
+                        'trx_reg': None,
+                        'details': None,
+                        'output': {
+                            "error": True,
+                            "message": f"Transaction is {current[trx_id].status}, not {created}"
+                        }
+                    })
+                    continue
+            if trx_reg is None:
+                outcomes.append({
+                    'input': body,
+                    'trx_reg': None,
+                    'details': None,
+                    'output': {"error": True, "message": "Transaction not found"}
+                })
+                continue
+            try:
+                mock_resp, resp_body = process_transaction(body, trx_reg)
+            except Exception as details:
+                LOGGER.exception(f"Transaction {trx_reg.id} could not be processed")
+                failed_by_status.setdefault(trx_reg.status, []).append(trx_reg.id)
+                outcomes.append({
+                    'input': body,
+                    'trx_reg': None,
+                    'details': None,
+                    'output': {"error": True, "message": str(details)},
+                    'exception': details
+                })
+                continue
+            outcomes.append({
+                'input': body,
+                'trx_reg': trx_reg,
+                'details': mock_resp,
+                'output': resp_body
+            })
+        # The transactions that could not be processed go back to created, so the retry can move them again.
+        for status, ids in failed_by_status.items():
+            P2Ptransaction.transition(ids, status, created)
+    return outcomes
+
+
+def handle_records(records: list) -> list:
+    """
+    Process the messages of the batch together.
+
+    Returns: list
+        One entry per record, in the same order. A RecordFailure marks the messages that must be retried: the
+        ones whose body can't be read, whose transaction is being processed by another invocation, whose processing
+        raised or whose event was rejected by EventBridge. A transaction already processed gets its stored result
+        without touching the database or EventBridge.
+    """
+    results = [None] * len(records)
+    bodies = {}
+    for position, record in enumerate(records):
+        try:
+            bodies[position] = get_body(record.raw_event)
+        except Exception as details:
+            results[position] = RecordFailure(f"Invalid message body: {details}")
+
+    claims = IDEMPOTENCY.begin(body.get('id') for body in bodies.values() if body.get('id') is not None)
+    pending = {}
+    duplicates = {}
+    first_positions = {}
+    for position, body in bodies.items():
+        trx_id = body.get('id')
+        claim = claims.get(trx_id)
+        if trx_id is not None and trx_id in first_positions:
+            duplicates[position] = first_positions[trx_id]
+        elif claim is None or claim.claimed:
+            if trx_id is not None:
+                first_positions[trx_id] = position
+            pending[position] = body
+        elif claim.result is not None:
+            LOGGER.info(f"Transaction {trx_id} already processed")
+            results[position] = claim.result
         else:
-            resp_body["trx"] = trx_reg
-            mock_resp["source"] = trx_reg.source_id
-            mock_resp["dest"] = trx_reg.dest_id
-            mock_resp["amount"] = trx_reg.amount
-            mock_resp["timestamp"] = datetime.now().isoformat()
+            results[position] = RecordFailure(f"Transaction {trx_id} is being processed by another invocation")
+    claimed = [trx_id for trx_id, claim in claims.items() if claim.claimed]
 
-        trx_reg.status = trx_status
-        trx_reg.save()
+    try:
+        publish_outcomes(pending, results)
+    except Exception:
+        IDEMPOTENCY.release(claimed)
+        raise
 
-        trx_obj = model_to_dict(trx_reg)
+    completed = {}
+    for position, body in pending.items():
+        result = results[position]
+        if body.get('id') in claims and not isinstance(result, RecordFailure) and result['eb_status']:
+            completed[body['id']] = serializer.normalize(result)
+    IDEMPOTENCY.complete(completed)
+    IDEMPOTENCY.release(trx_id for trx_id in claimed if trx_id not in completed)
 
-        resp_body["trx_details"] = mock_resp
+    for position, first_position in duplicates.items():
+        results[position] = results[first_position]
+    return results
+
+
+def publish_outcomes(bodies: dict, results: list):
+    """
+    Process the bodies, publish the notification of every transaction and set the result of each position.
+    """
+    outcomes = process_batch(list(bodies.values()))
+
+    trxs = []
+    event_details = {
+        "name": "Send Notification",
+        "details": None
+    }
+    publisher = core_aws.eventbridge.EventPublisher(bus_name=TRX_BUS_ARN)
+    events = {}
+    for outcome in outcomes:
+        trx_reg = outcome['trx_reg']
+        LOGGER.info(trx_reg)
+        if trx_reg is None:
+            trxs.append({
+                'input': outcome['input'],
+                'output': outcome['output'],
+                'eb_status': False
+            })
+            continue
+
+        trx_obj = model_to_dict(trx_reg)
+        resp_body = outcome['output']
+        resp_body["trx_details"] = outcome['details']
 
         event_details['details'] = {
-            'trx_id': mock_resp['trx_id'],
+            'trx_id': outcome['details'].get('trx_id'),
             'payload_request': trx_obj,
-            'details': mock_resp
+            'details': outcome['details']
         }
 
-        status = core_aws.eventbridge.put_event(
+        events[len(trxs)] = publisher.add(
             event_name=event_details['name'],
-            event_input=event_details['details'],
-            bus_name=TRX_BUS_ARN
+            event_input=event_details['details']
         )
 
-        
         trxs.append({
             'input': trx_obj,
             'output': resp_body,
-            'eb_status': status
+            'eb_status': None
         })
-    return api_response({
+
+    statuses = publisher.flush()
+    for position, entry in events.items():
+        trxs[position]['eb_status'] = statuses[entry]['success']
+
+    for position, outcome, trx in zip(bodies, outcomes, trxs):
+        if outcome.get('exception') is not None:
+            results[position] = RecordFailure(str(outcome['exception']), result=trx)
+        elif outcome['trx_reg'] is not None and not trx['eb_status']:
+            results[position] = RecordFailure("The notification event was not published", result=trx)
+        else:
+            results[position] = trx
+
+
+@lambda_logger(logger=LOGGER)
+@connection_manager.managed
+def lambda_handler(event: dict, _):
+    records = event.get("Records")
+    if records is None:
+        LOGGER.info("No records founded")
+        return {
+            "error": True,
+            "message": "No records founded"
+        }
+
+    LOGGER.info(f"{20 * '*'}  Processing {len(records)} banking requests  {20 * '*'}")
+    with PROCESSOR(records=records, batch_handler=handle_records):
+        PROCESSOR.process()
+
+    trxs = [result.result if isinstance(result, RecordFailure) else result for result in PROCESSOR.results]
+    response = api_response({
         "message": "OK",
-        "transactions": trxs
-    }, HTTPStatus.OK)
\ No newline at end of file
+        "transactions": [trx for trx in trxs if trx is not None]
+    }, HTTPStatus.OK)
+    # Only the messages in batchItemFailures are retried by SQS.
+    response.update(PROCESSOR.response())
+    return response
+
+
+def drain(queue_name: str, **options) -> dict:
+    """
+    Processes the messages of the queue outside Lambda, e.g. from a container during a backlog drain, with the same
+    handler as the lambda. Returns once a receive finds the queue empty.
+
+    Parameters
+    ----------
+    queue_name : str
+        The name of the queue the lambda is subscribed to.
+    options
+        Passed to SqsConsumer, e.g. visibility_timeout.
+
+    Returns
+    -------
+    dict
+        The totals of SqsConsumer.run.
+    """
+    consumer = SqsConsumer(queue_name, batch_handler=connection_manager.managed(handle_records), **options)
+    return consumer.run(stop_when_empty=True)
@@ -7,6 +7,9 @@ from core_api.utils import (
     get_body,
     get_status_code,
 )
+from core_db.idempotency import Claim, IdempotencyStore
+from core_db.models import P2Ptransaction
+from db_utils.enum import IdempotencyStatusEnum
 
 from lambda_function import (
     lambda_handler,
@@ -38,9 +41,45 @@ mock_event_from_sqs = {
     ]
 }
 
+mock_event_batch_from_sqs = {
+    "Records": [
+        {"body": json.dumps({"id": 8})},
+        {"body": json.dumps({"id": 9, "error": True})},
+        {"body": json.dumps({"id": 10})},
+    ]
+}
+
+mock_event_partial_batch_from_sqs = {
+    "Records": [
+        {"messageId": "message-1", "body": json.dumps({"id": 8})},
+        {"messageId": "message-2", "body": json.dumps({"id": 9})},
+        {"messageId": "message-3", "body": "{not a json"},
+        {"messageId": "message-4", "body": json.dumps({"id": 10})},
+    ]
+}
+
 mock_get_ssm_parameter = "/my-parameter"
 
 
+def mock_transition(ids, from_status, to_status):
+    return [
+        P2Ptransaction(id=_id, source_id=1, dest_id=2, amount=17.0, status=to_status)
+        for _id in ids if _id != 10
+    ]
+
+
+def mock_claim_all(keys):
+    return {key: Claim(True, IdempotencyStatusEnum.IN_PROGRESS, None) for key in keys}
+
+
+def mock_claim_processed(keys):
+    return {
+        key: Claim(False, IdempotencyStatusEnum.COMPLETED, {"input": {"id": key}, "output": {}, "eb_status": True})
+        if key == 8 else Claim(True, IdempotencyStatusEnum.IN_PROGRESS, None)
+        for key in keys
+    }
+
+
 def call_lambda(mock_test):
     """
     Common method to call lambda to test
@@ -114,6 +153,112 @@ class TestP2PTrxReq(TestCase):
         body, status_code = call_lambda(self.event_successfully)
         self.__common_asserts(body, status_code, HTTPStatus.INTERNAL_SERVER_ERROR.value)
 
+    @mock.patch("core_aws.eventbridge.EventPublisher.flush", return_value=[{"success": True}, {"success": True}])
+    @mock.patch("core_db.base_model.database.atomic", new_callable=mock.MagicMock)
+    @mock.patch("core_db.connection.ConnectionManager.acquire")
+    @mock.patch("core_db.connection.ConnectionManager.release")
+    @mock.patch.object(P2Ptransaction, "get_by_ids", return_value={})
+    @mock.patch.object(P2Ptransaction, "transition", side_effect=mock_transition)
+    @mock.patch.object(IdempotencyStore, "release")
+    @mock.patch.object(IdempotencyStore, "complete")
+    @mock.patch.object(IdempotencyStore, "begin", side_effect=mock_claim_all)
+    def test_lambda_batch_outcomes(self, begin, complete, release, transition, *_, **__):
+        """
+        Unit test when a batch is written with one conditional update per status and every message gets its outcome
+        """
+        body, status_code = call_lambda(mock_event_batch_from_sqs)
+        self.__common_asserts(body, status_code, HTTPStatus.OK.value)
+        self.assertEqual(
+            [mock.call([8, 10], "created", "done"), mock.call([9], "created", "failure")],
+            transition.call_args_list
+        )
+        outputs = [trx["output"] for trx in body["transactions"]]
+        self.assertEqual([False, True, True], [output["error"] for output in outputs])
+        self.assertEqual("Transaction not found", outputs[2]["message"])
+        self.assertEqual([True, True, False], [trx["eb_status"] for trx in body["transactions"]])
+        self.assertEqual([8, 9], sorted(complete.call_args.args[0]))
+        self.assertEqual([10], list(release.call_args.args[0]))
+
+    @mock.patch("core_aws.eventbridge.EventPublisher.flush", return_value=[{"success": True}, {"success": False}])
+    @mock.patch("core_db.base_model.database.atomic", new_callable=mock.MagicMock)
+    @mock.patch("core_db.connection.ConnectionManager.acquire")
+    @mock.patch("core_db.connection.ConnectionManager.release")
+    @mock.patch.object(P2Ptransaction, "get_by_ids", return_value={})
+    @mock.patch.object(P2Ptransaction, "transition", side_effect=mock_transition)
+    @mock.patch.object(IdempotencyStore, "release")
+    @mock.patch.object(IdempotencyStore, "complete")
+    @mock.patch.object(IdempotencyStore, "begin", side_effect=mock_claim_all)
+    def test_lambda_partial_batch_failure(self, *_, **__):
+        """
+        Unit test when only the messages with an unreadable body or a rejected event are reported to be retried
+        """
+        response = lambda_handler(mock_event_partial_batch_from_sqs, None)
+        self.assertEqual(HTTPStatus.OK.value, get_status_code(response))
+        self.assertEqual(
+            [{"itemIdentifier": "message-2"}, {"itemIdentifier": "message-3"}],
+            response["batchItemFailures"]
+        )
+
+    @mock.patch("core_aws.eventbridge.EventPublisher.flush", return_value=[{"success": True}])
+    @mock.patch("core_db.base_model.database.atomic", new_callable=mock.MagicMock)
+    @mock.patch("core_db.connection.ConnectionManager.acquire")
+    @mock.patch("core_db.connection.ConnectionManager.release")
+    @mock.patch.object(P2Ptransaction, "get_by_ids", return_value={})
+    @mock.patch.object(P2Ptransaction, "transition", side_effect=mock_transition)
+    @mock.patch.object(IdempotencyStore, "release")
+    @mock.patch.object(IdempotencyStore, "complete")
+    @mock.patch.object(IdempotencyStore, "begin", side_effect=mock_claim_processed)
+    def test_lambda_duplicate_messages(self, begin, complete, release, transition, *_, **__):
+        """
+        Unit test when a transaction already processed and a message repeated in the batch are not processed again
+        """
+        event = {
+            "Records": [
+                {"messageId": "message-1", "body": json.dumps({"id": 8})},
+                {"messageId": "message-2", "body": json.dumps({"id": 9})},
+                {"messageId": "message-3", "body": json.dumps({"id": 9})},
+            ]
+        }
+        body, status_code = call_lambda(event)
+        self.__common_asserts(body, status_code, HTTPStatus.OK.value)
+        transition.assert_called_once_with([9], "created", "done")
+        self.assertEqual([8, 9, 9], [trx["input"]["id"] for trx in body["transactions"]])
+        self.assertEqual([9], list(complete.call_args.args[0]))
+        self.assertEqual([], list(release.call_args.args[0]))
+
+    @mock.patch("core_aws.eventbridge.EventPublisher.flush", return_value=[{"success": True}, {"success": True}])
+    @mock.patch("core_db.base_model.database.atomic", new_callable=mock.MagicMock)
+    @mock.patch("core_db.connection.ConnectionManager.acquire")
+    @mock.patch("core_db.connection.ConnectionManager.release")
+    @mock.patch.object(P2Ptransaction, "get_by_ids", return_value={
+        10: P2Ptransaction(id=10, source_id=1, dest_id=2, amount=17.0, status="done"),
+        11: P2Ptransaction(id=11, source_id=1, dest_id=2, amount=17.0, status="failure"),
+    })
+    @mock.patch.object(P2Ptransaction, "transition", side_effect=lambda ids, from_status, to_status: [
+        P2Ptransaction(id=8, source_id=1, dest_id=2, amount=17.0, status=to_status)
+    ])
+    @mock.patch.object(IdempotencyStore, "release")
+    @mock.patch.object(IdempotencyStore, "complete")
+    @mock.patch.object(IdempotencyStore, "begin", side_effect=mock_claim_all)
+    def test_lambda_redelivered_after_commit(self, begin, complete, release, transition, get_by_ids, *_, **__):
+        """
+        Unit test when a transaction moved by an earlier delivery whose notification was not published is published
+        again, and one in another status is reported as such
+        """
+        event = {
+            "Records": [
+                {"messageId": "message-1", "body": json.dumps({"id": 8})},
+                {"messageId": "message-2", "body": json.dumps({"id": 10})},
+                {"messageId": "message-3", "body": json.dumps({"id": 11})},
+            ]
+        }
+        body, status_code = call_lambda(event)
+        self.__common_asserts(body, status_code, HTTPStatus.OK.value)
+        self.assertEqual([10, 11], sorted(get_by_ids.call_args.args[0]))
+        self.assertEqual([True, True, False], [trx["eb_status"] for trx in body["transactions"]])
+        self.assertEqual("Transaction is failure, not created", body["transactions"][2]["output"]["message"])
+        self.assertEqual([8, 10], sorted(complete.call_args.args[0]))
+
 test_suites = unittest.TestSuite()
 testLambda = TestP2PTrxReq()
 testLambda.setUp()
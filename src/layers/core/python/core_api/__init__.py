@@ -1,15 +1,11 @@
-import os
-
 from core_utils import (
     load_environment_variables,
 )
 
 load_environment_variables()
 try:
-    if not os.getenv("DEVELOPER"):
-        print("patching...")
-        from aws_xray_sdk.core import patch_all
+    from core_utils.tracing import patch_modules
 
-        patch_all()
+    patch_modules()
 except Exception as e:
     print(str(e))
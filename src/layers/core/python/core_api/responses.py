@@ -1,9 +1,5 @@
 # -*- coding: utf-8 -*-
-import json
-
-from core_utils.utils import (
-    cast_default,
-)
+from core_utils import serializer
 
 __all__ = ["api_response"]
 
@@ -29,7 +25,7 @@ def api_response(body, status_code):
 
     """
     try:
-        body = json.dumps(body, default=cast_default, ensure_ascii=False)
+        body = serializer.dumps(body)
     except Exception as details:
         print(str(details))
         raise details
@@ -1,14 +1,23 @@
 # -*- coding: utf-8 -*-
-try:
-    from dotenv import load_dotenv
-except ImportError:
-    pass
-else:
-    load_dotenv()
+import importlib
+import os
+
+if not os.getenv("AWS_LAMBDA_FUNCTION_NAME"):
+    try:
+        from dotenv import load_dotenv
+    except ImportError:
+        pass
+    else:
+        load_dotenv()
 
 __all__ = [
+    "batch",
+    "bootstrap",
+    "clients",
     "cognito",
+    "consumer",
     "dynamo",
+    "eventbridge",
     "lambdas",
     "s3",
     "secret_manager",
@@ -17,3 +26,10 @@ __all__ = [
     "session",
     "sts"
 ]
+
+
+def __getattr__(name):
+    # Submodules are imported on first access, so importing the package alone does not load them all.
+    if name in __all__:
+        return importlib.import_module(f"{__name__}.{name}")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
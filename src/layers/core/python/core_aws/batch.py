@@ -0,0 +1,262 @@
+# -*- coding: utf-8 -*-
+"""
+Partial batch responses for SQS triggered lambdas.
+
+Only the messages reported in batchItemFailures go back to the queue, the event source mapping must have
+ReportBatchItemFailures in its FunctionResponseTypes.
+"""
+import threading
+from collections import OrderedDict, deque
+from contextlib import nullcontext
+from typing import Any, Callable, ContextManager, Dict, Iterable, List, Optional
+
+from aws_lambda_powertools.utilities.batch import BatchProcessor, EventType
+from aws_lambda_powertools.utilities.data_classes.sqs_event import SQSRecord
+from core_utils.utils import get_logger
+
+__all__ = [
+    "RecordExecutor",
+    "RecordFailure",
+    "SqsBatchProcessor",
+    "process_partial_response",
+]
+
+LOGGER = get_logger("layer-batch")
+
+
+class RecordFailure(Exception):
+    """
+    Returned by a batch handler in the position of a record that failed, the result it got so far is kept.
+
+    Examples
+    --------
+    >>> from core_aws.batch import RecordFailure
+    >>> RecordFailure("EventBridge rejected the event", result={"id": 8})
+    """
+
+    def __init__(self, message: str, result: Any = None):
+        super().__init__(message)
+        self.result = result
+
+
+class RecordExecutor:
+    """
+    Runs a function over the items of a batch with a bounded number of threads.
+
+    Items with the same group key run one after another in input order on the same worker, the groups run
+    concurrently. Every worker enters worker_context once before taking items, e.g. to hold its own database
+    connection while it runs.
+
+    Parameters
+    ----------
+    max_workers : int
+        The maximum number of threads.
+    worker_context : callable
+        Returns the context manager entered by every worker, core_db's connection_manager.worker for instance.
+
+    Examples
+    --------
+    >>> from core_aws.batch import RecordExecutor
+    >>> from core_db.base_model import connection_manager
+    >>> executor = RecordExecutor(4, worker_context=connection_manager.worker)
+    >>> executor.map(process_record, records)
+    """
+
+    def __init__(self, max_workers: int = 4, *, worker_context: Callable[[], ContextManager] = None):
+        if max_workers < 1:
+            raise ValueError("max_workers must be greater than 0")
+        self.max_workers = max_workers
+        self.worker_context = worker_context or nullcontext
+
+    def map(self, function: Callable[[Any], Any], items: Iterable, *,
+            group_key: Callable[[Any], Any] = None) -> List[Any]:
+        """
+        Calls function with every item and returns the results in input order.
+
+        Parameters
+        ----------
+        function : callable
+            Receives one item.
+        items : iterable
+            The items to process.
+        group_key : callable
+            Receives one item and returns its group, None for an item without group.
+
+        Returns
+        -------
+        list
+            The result of every item, in the same order as the items.
+
+        Raises
+        ------
+        Exception
+            The first exception raised by a call or by a worker context, once every worker finished.
+        """
+        items = list(items)
+        groups = OrderedDict()
+        for index, item in enumerate(items):
+            key = group_key(item) if group_key else None
+            groups.setdefault(("item", index) if key is None else ("group", key), []).append(index)
+        pending = deque(groups.values())
+        results = [None] * len(items)
+        errors = {}
+
+        def work():
+            # The context is only entered by the workers that get a group, a late one may find nothing left.
+            try:
+                indexes = pending.popleft()
+            except IndexError:
+                return
+            try:
+                with self.worker_context():
+                    while True:
+                        for index in indexes:
+                            try:
+                                results[index] = function(items[index])
+                            except Exception as details:
+                                errors[index] = details
+                        try:
+                            indexes = pending.popleft()
+                        except IndexError:
+                            return
+            except Exception as details:
+                errors[-1] = details
+
+        workers = [threading.Thread(target=work, daemon=True) for _ in range(min(self.max_workers, len(groups)))]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        if errors:
+            raise errors[min(errors)]
+        return results
+
+
+class SqsBatchProcessor(BatchProcessor):
+    """
+    Powertools BatchProcessor for SQS that also accepts a batch handler.
+
+    A record handler receives one SQSRecord and fails it by raising. A batch handler receives every SQSRecord and
+    returns one result per record in the same order, an Exception in a position fails that record. If the batch
+    handler raises, the whole batch fails.
+
+    Record handlers run one record at a time, or concurrently when an executor is given. The messages of a FIFO
+    queue keep their order inside each message group and, once one fails, the next ones of its group are failed
+    without being processed so SQS redelivers them in order.
+
+    After processing, results holds the value or the exception of every record in input order.
+
+    Examples
+    --------
+    >>> from core_aws.batch import SqsBatchProcessor
+    >>> processor = SqsBatchProcessor()
+    >>> with processor(records=event["Records"], batch_handler=handle_records):
+    ...     processor.process()
+    >>> processor.response()
+    """
+
+    def __init__(self, model=None, executor: RecordExecutor = None):
+        super().__init__(EventType.SQS, model)
+        self.executor = executor
+        self.batch_handler: Optional[Callable[[List[SQSRecord]], List[Any]]] = None
+        self.results: List[Any] = []
+
+    def __call__(self, records: List[dict], handler: Callable = None, lambda_context=None, *,
+                 batch_handler: Callable[[List[SQSRecord]], List[Any]] = None):
+        if (handler is None) == (batch_handler is None):
+            raise ValueError("Either a record handler or a batch handler is required")
+        self.batch_handler = batch_handler
+        return super().__call__(records, handler, lambda_context)
+
+    def _prepare(self):
+        super()._prepare()
+        self.results = []
+
+    def process(self) -> List[tuple]:
+        data = [self._to_batch_type(record=record, event_type=self.event_type, model=self.model)
+                for record in self.records]
+        if self.batch_handler is None:
+            results = self._handle_records(data)
+        else:
+            try:
+                results = list(self.batch_handler(data))
+                if len(results) != len(data):
+                    raise ValueError(f"The batch handler returned {len(results)} results for {len(data)} records")
+            except Exception as details:
+                results = [details] * len(data)
+
+        entries = []
+        for record, item, result in zip(self.records, data, results):
+            self.results.append(result)
+            if isinstance(result, Exception):
+                entries.append(self.failure_handler(item, (type(result), result, result.__traceback__)))
+            else:
+                entries.append(self.success_handler(record, result))
+        return entries
+
+    def _handle_records(self, data: list) -> list:
+        groups = [record.get("attributes", {}).get("MessageGroupId") for record in self.records]
+        failed_groups = set()
+
+        def handle(index):
+            group = groups[index]
+            if group is not None and group in failed_groups:
+                return RecordFailure("Not processed, an earlier message of its group failed")
+            try:
+                if self._handler_accepts_lambda_context:
+                    return self.handler(record=data[index], lambda_context=self.lambda_context)
+                return self.handler(record=data[index])
+            except Exception as details:
+                if group is not None:
+                    failed_groups.add(group)
+                return details
+
+        if self.executor is None:
+            return [handle(index) for index in range(len(data))]
+        return self.executor.map(handle, range(len(data)), group_key=groups.__getitem__)
+
+    def failure_handler(self, record, exception):
+        message_id = record.messageId if self.model else record.get("messageId")
+        LOGGER.warning(f"Message {message_id} failed: {exception[1]}")
+        return super().failure_handler(record, exception)
+
+
+def process_partial_response(event: Dict[str, Any], record_handler: Callable = None, *,
+                             batch_handler: Callable[[List[SQSRecord]], List[Any]] = None,
+                             processor: SqsBatchProcessor = None, context=None) -> Dict[str, List[Dict[str, str]]]:
+    """
+    Processes the records of an SQS event and returns the partial batch response.
+
+    Parameters
+    ----------
+    event : dict
+        The SQS event received by the lambda.
+    record_handler : callable
+        Receives one SQSRecord, raises to fail it.
+    batch_handler : callable
+        Receives every SQSRecord and returns one result per record, an Exception fails the record.
+    processor : SqsBatchProcessor
+        The processor to use, a new one by default.
+    context : LambdaContext
+        Injected into the record handler if it has a lambda_context parameter.
+
+    Returns
+    -------
+    dict
+        {"batchItemFailures": [{"itemIdentifier": message_id}, ...]}
+
+    Raises
+    ------
+    BatchProcessingError
+        If every record failed, so the whole batch is retried.
+
+    Examples
+    --------
+    >>> from core_aws.batch import process_partial_response
+    >>> def lambda_handler(event, context):
+    ...     return process_partial_response(event, record_handler, context=context)
+    """
+    processor = processor or SqsBatchProcessor()
+    with processor(event.get("Records", []), record_handler, context, batch_handler=batch_handler):
+        processor.process()
+    return processor.response()
@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+"""
+Cold-start prefetch of SSM parameters and Secrets Manager secrets.
+
+Declared values are fetched concurrently the first time any of them is needed and kept in the Powertools
+provider caches for ``ttl`` seconds. Both ``core_aws`` and ``db_aws`` read through those same providers, so
+one prefetch serves every layer of the process. The providers use the shared clients of ``core_aws.clients``.
+
+The values live only in memory: a copy on ``/tmp`` would only be read after Lambda restarts the runtime in the
+same execution environment, a timeout or a crash, which is not worth encrypting and writing every value.
+"""
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from aws_lambda_powertools.utilities import parameters
+from aws_lambda_powertools.utilities.parameters.base import DEFAULT_PROVIDERS, ExpirableValue
+from core_aws.clients import get_client
+from core_utils.utils import get_logger
+
+__all__ = ["ParametersBootstrap", "BOOTSTRAP", "SSM", "SECRETS"]
+
+LAYER_NAME = "bootstrap"
+LOGGER = get_logger(f"layer-{LAYER_NAME}")
+
+SSM = "ssm"
+SECRETS = "secrets"
+PROVIDERS = {
+    SSM: lambda: parameters.SSMProvider(boto3_client=get_client("ssm")),
+    SECRETS: lambda: parameters.SecretsProvider(boto3_client=get_client("secretsmanager")),
+}
+
+
+class ParametersBootstrap:
+    """
+    Registry of the parameters and secrets to prefetch.
+
+    Parameters
+    ----------
+    ttl : int
+        Seconds a prefetched value is served from memory.
+    max_workers : int
+        The maximum number of concurrent fetches.
+    """
+
+    def __init__(self, *, ttl: int = 300, max_workers: int = 8):
+        self.ttl = ttl
+        self.max_workers = max_workers
+        self._declared = set()
+        self._pending = set()
+        self._lock = threading.Lock()
+
+    def configure(self, *, ttl: int = None):
+        if ttl is not None:
+            self.ttl = ttl
+
+    def declare(self, kind: str, name: str, transform: str = None):
+        """Declares a value, it is fetched on the next prefetch if it was not declared before."""
+        key = (kind, name, transform)
+        with self._lock:
+            if key not in self._declared:
+                self._declared.add(key)
+                self._pending.add(key)
+
+    def load(self, kind: str, values: dict):
+        """
+        Stores values fetched in bulk so they are served from the cache, JSON values are also stored transformed.
+        """
+        entries = {}
+        for name, value in values.items():
+            entries[(kind, name, None)] = value
+            try:
+                entries[(kind, name, "json")] = json.loads(value)
+            except (TypeError, ValueError):
+                pass
+        with self._lock:
+            self._declared.update(entries)
+            self._pending.difference_update(entries)
+        for key, value in entries.items():
+            self.__store(key, value)
+
+    def is_cached(self, kind: str, name: str, transform: str = None) -> bool:
+        return self.provider(kind)._has_not_expired((name, transform))
+
+    def prefetch(self) -> dict:
+        """
+        Fetches every declared value not fetched yet, concurrently.
+
+        Returns
+        -------
+        dict
+            The values loaded, keyed by (kind, name, transform).
+        """
+        with self._lock:
+            pending, self._pending = self._pending, set()
+        if not pending:
+            return {}
+
+        # Providers are created before starting the workers so all of them fill the same cache
+        for kind in {key[0] for key in pending}:
+            self.provider(kind)
+        values = {}
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(pending))) as executor:
+            for key, value in zip(pending, executor.map(self.__fetch, pending)):
+                if value is not None:
+                    values[key] = value
+        return values
+
+    @staticmethod
+    def provider(kind: str):
+        if kind not in DEFAULT_PROVIDERS:
+            DEFAULT_PROVIDERS[kind] = PROVIDERS[kind]()
+        return DEFAULT_PROVIDERS[kind]
+
+    def __fetch(self, key):
+        kind, name, transform = key
+        try:
+            return self.provider(kind).get(name, max_age=self.ttl, transform=transform)
+        except Exception as error:
+            LOGGER.warning(f"Prefetch of {kind} {name} failed: {error}")
+            return None
+
+    def __store(self, key, value):
+        kind, name, transform = key
+        expires = datetime.now() + timedelta(seconds=self.ttl)
+        self.provider(kind).store[(name, transform)] = ExpirableValue(value, expires)
+
+
+BOOTSTRAP = ParametersBootstrap()
@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+"""
+Process-wide registry of boto3 clients and resources.
+
+Clients are created on first use and kept for the lifetime of the execution environment, so warm invocations
+reuse the already loaded service model and the open connections of the pool.
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from botocore.config import Config
+
+__all__ = [
+    "configure",
+    "get_client",
+    "get_resource",
+    "get_credentials_params",
+    "clear"
+]
+
+MAX_ENTRIES = 32
+
+_SETTINGS = {
+    "max_pool_connections": 10,
+    "tcp_keepalive": True,
+}
+_REGISTRY: "OrderedDict[tuple, object]" = OrderedDict()
+_LOCK = threading.RLock()
+
+
+def configure(*, max_pool_connections: int = None, tcp_keepalive: bool = None):
+    """
+    Changes the connection settings used by the clients created from now on.
+
+    Parameters
+    ----------
+    max_pool_connections : int
+        The maximum number of connections kept in the pool of every client.
+    tcp_keepalive : bool
+        If True, enables TCP keep-alive on the connections of the clients.
+
+    Examples
+    --------
+    >>> from core_aws.clients import configure
+    >>> configure(max_pool_connections=20)
+    """
+    with _LOCK:
+        if max_pool_connections is not None:
+            _SETTINGS["max_pool_connections"] = max_pool_connections
+        if tcp_keepalive is not None:
+            _SETTINGS["tcp_keepalive"] = tcp_keepalive
+        _REGISTRY.clear()
+
+
+def clear():
+    """Drops every registered client and resource."""
+    with _LOCK:
+        _REGISTRY.clear()
+
+
+def _identity(session, aws_access_key_id, aws_session_token):
+    if session is not None:
+        credentials = session.get_credentials()
+        if credentials is None:
+            return None
+        credentials = credentials.get_frozen_credentials()
+        aws_access_key_id, aws_session_token = credentials.access_key, credentials.token
+    if aws_access_key_id is None:
+        return None
+    token = hashlib.sha256(aws_session_token.encode()).hexdigest() if aws_session_token else None
+    return aws_access_key_id, token
+
+
+def _config_key(config):
+    # Two Config built with the same options share their client, whatever the instance.
+    if config is None:
+        return None
+    return tuple(sorted((name, repr(value)) for name, value in config._user_provided_options.items()))
+
+
+def _get(kind, service, *, region_name=None, session=None, endpoint_url=None, aws_access_key_id=None,
+         aws_secret_access_key=None, aws_session_token=None, config: "Config" = None):
+    if session is not None and region_name is None:
+        region_name = session.region_name
+    key = (kind, service, region_name, endpoint_url, _identity(session, aws_access_key_id, aws_session_token),
+           _config_key(config))
+    with _LOCK:
+        if key in _REGISTRY:
+            _REGISTRY.move_to_end(key)
+            return _REGISTRY[key]
+
+        # boto3 and botocore are imported with the first client, a layer import does not pay for them.
+        import boto3
+        from botocore.config import Config
+
+        default_config = Config(
+            max_pool_connections=_SETTINGS["max_pool_connections"],
+            tcp_keepalive=_SETTINGS["tcp_keepalive"],
+        )
+        params = {
+            "region_name": region_name,
+            "endpoint_url": endpoint_url,
+            "config": default_config.merge(config) if config else default_config,
+        }
+        if session is None:
+            session = boto3.session.Session(
+                aws_access_key_id=aws_access_key_id,
+                aws_secret_access_key=aws_secret_access_key,
+                aws_session_token=aws_session_token,
+            ) if aws_access_key_id is not None else boto3._get_default_session()
+        instance = getattr(session, kind)(service, **params)
+
+        _REGISTRY[key] = instance
+        if len(_REGISTRY) > MAX_ENTRIES:
+            _REGISTRY.popitem(last=False)
+        return instance
+
+
+def get_client(service: str, **kwargs):
+    """
+    Gets the shared low-level client of a service.
+
+    Clients are keyed by service, region, endpoint, credentials identity and the options of config, the least
+    recently used ones are dropped when the registry grows beyond MAX_ENTRIES.
+
+    Parameters
+    ----------
+    service : str
+        The name of the AWS service.
+    kwargs
+        region_name, endpoint_url, session, aws_access_key_id, aws_secret_access_key, aws_session_token
+        and config.
+
+    Returns
+    -------
+    botocore.client.BaseClient
+        A low-level client of the service.
+
+    Examples
+    --------
+    >>> from core_aws.clients import get_client
+    >>> get_client("sqs", region_name="us-east-1")
+    """
+    return _get("client", service, **kwargs)
+
+
+def get_resource(service: str, **kwargs):
+    """
+    Gets the shared resource of a service.
+
+    Parameters
+    ----------
+    service : str
+        The name of the AWS service.
+    kwargs
+        The same options accepted by get_client.
+
+    Returns
+    -------
+    boto3.resources.base.ServiceResource
+        A resource of the service.
+
+    Examples
+    --------
+    >>> from core_aws.clients import get_resource
+    >>> get_resource("dynamodb")
+    """
+    return _get("resource", service, **kwargs)
+
+
+def get_credentials_params(credentials: dict) -> dict:
+    """Maps the Credentials of a STS response to the keyword arguments of get_client."""
+    return {
+        "aws_access_key_id": credentials["AccessKeyId"],
+        "aws_secret_access_key": credentials["SecretAccessKey"],
+        "aws_session_token": credentials["SessionToken"],
+    }
@@ -1,10 +1,10 @@
 # -*- coding: utf-8 -*-
 import os
 
-import boto3
 from botocore.exceptions import (
     ClientError,
 )
+from core_aws.clients import get_client
 from core_aws.ssm import get_parameter
 
 
@@ -38,7 +38,7 @@ def get_cognito_headers(*, region, client_id, username, password, user_pool_id,
     >>> get_cognito_headers('us-east-1', 'client_id', 'username', 'password', 'user_pool_id', 'domain')
 
     """
-    client = boto3.client(
+    client = get_client(
         "cognito-idp",
         aws_access_key_id="",
         aws_secret_access_key="",
@@ -104,7 +104,7 @@ def get_token_cognito(
     >>> get_token_cognito('client_id', 'username', 'password', 'user_pool_id')
 
     """
-    client = boto3.client("cognito-idp", region_name=region_name)
+    client = get_client("cognito-idp", region_name=region_name)
     response = client.initiate_auth(
         ClientId=client_id,
         AuthFlow=auth_flow,
@@ -119,7 +119,7 @@ def get_token_cognito(
 
 
 def create_new_user(*, email, parent, region="us-east-1"):
-    client = boto3.client("cognito-idp", region)
+    client = get_client("cognito-idp", region_name=region)
     parameter_name_pool_id = f'MERCHANT_POOL_ID_{os.getenv("ENVIRONMENT")}'
     try:
         response = client.admin_create_user(
@@ -0,0 +1,270 @@
+# -*- coding: utf-8 -*-
+"""
+Long-poll consumer of an SQS queue for workers running outside Lambda.
+
+The messages are handed to the same record or batch handlers as the SQS triggered lambdas, through an
+SqsBatchProcessor. The processed messages are deleted and the failed ones are left to be redelivered. The next
+receive runs while a batch is processed, and messages held for more than half the visibility timeout get it
+extended.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List
+
+from aws_lambda_powertools.utilities.batch.exceptions import BatchProcessingError
+from core_aws import sqs
+from core_aws.batch import SqsBatchProcessor
+from core_utils.utils import get_logger
+
+__all__ = ["SqsConsumer", "to_lambda_record"]
+
+LOGGER = get_logger("layer-consumer")
+
+RECEIVE_ERROR_WAIT = 5
+
+
+def to_lambda_record(message: Dict[str, Any], queue_arn: str, region: str) -> Dict[str, Any]:
+    """
+    Converts a message of a ReceiveMessage response to the record of an SQS event received by a lambda.
+
+    Parameters
+    ----------
+    message : dict
+        A message of the ReceiveMessage response.
+    queue_arn : str
+        The ARN of the queue, the eventSourceARN of the record.
+    region : str
+        The region of the queue.
+
+    Returns
+    -------
+    dict
+        The record as a lambda gets it in event["Records"].
+    """
+    attributes = {}
+    for name, attribute in message.get("MessageAttributes", {}).items():
+        attributes[name] = {
+            "stringValue": attribute.get("StringValue"),
+            "binaryValue": attribute.get("BinaryValue"),
+            "stringListValues": attribute.get("StringListValues", []),
+            "binaryListValues": attribute.get("BinaryListValues", []),
+            "dataType": attribute["DataType"],
+        }
+    return {
+        "messageId": message["MessageId"],
+        "receiptHandle": message["ReceiptHandle"],
+        "body": message["Body"],
+        "attributes": message.get("Attributes", {}),
+        "messageAttributes": attributes,
+        "md5OfBody": message.get("MD5OfBody"),
+        "eventSource": "aws:sqs",
+        "eventSourceARN": queue_arn,
+        "awsRegion": region,
+    }
+
+
+class SqsConsumer:
+    """
+    Polls a queue and processes its messages with a record handler or a batch handler, as SqsBatchProcessor does
+    for a lambda.
+
+    Parameters
+    ----------
+    queue_name : str
+        The name of the queue.
+    record_handler : callable
+        Receives one SQSRecord, raises to fail it.
+    batch_handler : callable
+        Receives every SQSRecord of a receive and returns one result per record, an Exception fails the record.
+    processor : SqsBatchProcessor
+        The processor to use, a new one by default. Give one with an executor to process records concurrently.
+    wait_time : int
+        Seconds a receive waits for messages.
+    max_messages : int
+        Messages per receive, up to 10.
+    visibility_timeout : int
+        Seconds the received messages stay hidden, extended while they are being processed.
+
+    Examples
+    --------
+    >>> from core_aws.consumer import SqsConsumer
+    >>> consumer = SqsConsumer("p2p-transactions", batch_handler=handle_records)
+    >>> consumer.run(stop_when_empty=True)
+    {'batches': 12, 'received': 118, 'deleted': 117, 'failed': 1}
+    """
+
+    def __init__(self, queue_name: str, record_handler: Callable = None, *,
+                 batch_handler: Callable[[List[Any]], List[Any]] = None, processor: SqsBatchProcessor = None,
+                 wait_time: int = 20, max_messages: int = 10, visibility_timeout: int = 60):
+        if (record_handler is None) == (batch_handler is None):
+            raise ValueError("Either a record handler or a batch handler is required")
+        self.queue_name = queue_name
+        self.record_handler = record_handler
+        self.batch_handler = batch_handler
+        self.processor = processor or SqsBatchProcessor()
+        self.wait_time = wait_time
+        self.max_messages = max_messages
+        self.visibility_timeout = visibility_timeout
+        self._queue_url = None
+        # receipt handle: monotonic time of its receive or of its last extension
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+
+    @property
+    def queue_url(self) -> str:
+        if self._queue_url is None:
+            self._queue_url = sqs.get_sqs_queue_url(self.queue_name)
+        return self._queue_url
+
+    @property
+    def region(self) -> str:
+        return sqs.get_sqs_client().meta.region_name
+
+    @property
+    def queue_arn(self) -> str:
+        # The path of a queue URL is /<account>/<name>
+        account, name = self.queue_url.rstrip("/").split("/")[-2:]
+        return f"arn:aws:sqs:{self.region}:{account}:{name}"
+
+    def stop(self):
+        """Makes run return once the batch being processed is done."""
+        self._stopped.set()
+
+    def receive(self) -> List[Dict[str, Any]]:
+        """Long-polls the queue once and returns the messages received."""
+        response = sqs.receive_message(self.queue_url, self.max_messages, self.wait_time, self.visibility_timeout)
+        messages = response.get("Messages", [])
+        received_at = time.monotonic()
+        with self._lock:
+            for message in messages:
+                self._in_flight[message["ReceiptHandle"]] = received_at
+        return messages
+
+    def process(self, messages: List[Dict[str, Any]]) -> Dict[str, int]:
+        """
+        Processes the messages with the handler and deletes the ones that succeeded.
+
+        Returns
+        -------
+        dict
+            The number of messages "deleted" and "failed".
+        """
+        records = [to_lambda_record(message, self.queue_arn, self.region) for message in messages]
+        try:
+            with self.processor(records, self.record_handler, batch_handler=self.batch_handler):
+                self.processor.process()
+        except BatchProcessingError:
+            # Raised by the processor when every record failed, their results are kept anyway.
+            pass
+        done = [message["ReceiptHandle"] for message, result in zip(messages, self.processor.results)
+                if not isinstance(result, Exception)]
+        try:
+            deleted = len(sqs.delete_sqs_messages(self.queue_name, done)["Successful"]) if done else 0
+        finally:
+            self._forget(message["ReceiptHandle"] for message in messages)
+        return {"deleted": deleted, "failed": len(messages) - len(done)}
+
+    def run(self, *, max_batches: int = None, stop_when_empty: bool = False) -> Dict[str, int]:
+        """
+        Receives and processes batches until stop is called.
+
+        Parameters
+        ----------
+        max_batches : int
+            Return after processing this many batches.
+        stop_when_empty : bool
+            Return after a receive without messages, to drain a backlog.
+
+        Returns
+        -------
+        dict
+            The "batches" processed and the messages "received", "deleted" and "failed".
+        """
+        self._stopped.clear()
+        totals = {"batches": 0, "received": 0, "deleted": 0, "failed": 0}
+        heartbeat = threading.Thread(target=self._extend_visibility, name=f"visibility-{self.queue_name}",
+                                     daemon=True)
+        heartbeat.start()
+        try:
+            with ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqs-receive") as receiver:
+                prefetch = receiver.submit(self.receive)
+                try:
+                    while prefetch is not None:
+                        try:
+                            messages = prefetch.result()
+                        except Exception as details:
+                            LOGGER.warning(f"Receive from {self.queue_name} failed: {details}")
+                            messages = None
+                        prefetch = None
+                        if self._stopped.is_set():
+                            self._release(messages or [])
+                            break
+                        if messages is None:
+                            prefetch = receiver.submit(self._receive_later)
+                            continue
+                        if not messages and stop_when_empty:
+                            break
+                        # The next receive runs while this batch is processed.
+                        if not messages or max_batches is None or totals["batches"] + 1 < max_batches:
+                            prefetch = receiver.submit(self.receive)
+                        if messages:
+                            outcome = self.process(messages)
+                            totals["batches"] += 1
+                            totals["received"] += len(messages)
+                            totals["deleted"] += outcome["deleted"]
+                            totals["failed"] += outcome["failed"]
+                            LOGGER.info(f"Processed {len(messages)} messages of {self.queue_name}: {outcome}")
+                finally:
+                    # A batch that raised leaves the next receive in flight, its messages are made visible again.
+                    if prefetch is not None:
+                        self._stopped.set()
+                        self._release_pending(prefetch)
+        finally:
+            self._stopped.set()
+            heartbeat.join()
+        LOGGER.info(f"Consumer of {self.queue_name} stopped: {totals}")
+        return totals
+
+    def _receive_later(self) -> List[Dict[str, Any]]:
+        if self._stopped.wait(RECEIVE_ERROR_WAIT):
+            return []
+        return self.receive()
+
+    def _release_pending(self, prefetch):
+        try:
+            self._release(prefetch.result())
+        except Exception as details:
+            LOGGER.warning(f"Releasing the messages prefetched from {self.queue_name} failed: {details}")
+
+    def _release(self, messages: List[Dict[str, Any]]):
+        # Prefetched messages that will not be processed are made visible again for other consumers.
+        handles = [message["ReceiptHandle"] for message in messages]
+        self._forget(handles)
+        if handles:
+            sqs.change_message_visibility(self.queue_url, handles, 0)
+
+    def _forget(self, handles):
+        with self._lock:
+            for handle in handles:
+                self._in_flight.pop(handle, None)
+
+    def _extend_visibility(self):
+        interval = max(self.visibility_timeout / 4, 1)
+        while not self._stopped.wait(interval):
+            now = time.monotonic()
+            with self._lock:
+                handles = [handle for handle, extended_at in self._in_flight.items()
+                           if now - extended_at >= self.visibility_timeout / 2]
+                for handle in handles:
+                    self._in_flight[handle] = now
+            if not handles:
+                continue
+            try:
+                failed = sqs.change_message_visibility(self.queue_url, handles, self.visibility_timeout)
+            except Exception as details:
+                LOGGER.warning(f"Extending the visibility of {len(handles)} messages failed: {details}")
+            else:
+                if failed:
+                    LOGGER.warning(f"The visibility of {len(failed)} messages was not extended: {failed}")
@@ -1,13 +1,11 @@
 # -*- coding: utf-8 -*-
 import datetime
 import logging
+from core_aws.clients import get_client, get_resource
 from core_aws.sts import get_session_sts, get_client_sts
 from decimal import Decimal
+from functools import lru_cache
 
-import boto3
-from boto3.dynamodb.types import (
-    TypeSerializer,
-)
 from botocore.exceptions import (
     ClientError,
 )
@@ -19,16 +17,24 @@ __all__ = [
     "put_item",
     "update_item",
     "get_items_by_query",
+    "query_pages",
+    "query_items",
+    "collect",
     "get_item",
     "batch_write_item"
 ]
 
-_SERIALIZER = TypeSerializer()
-_DYNAMODB = boto3.client("dynamodb")
 _LOGGER = get_logger("layer-dynamo")
 _PARAMS = ParametersApp()
 
 
+@lru_cache(maxsize=None)
+def _get_serializer():
+    from boto3.dynamodb.types import TypeSerializer
+
+    return TypeSerializer()
+
+
 def put_item(table: str, item: dict, log_level=None, role=None, use_prefix=False):
     """Creates an item in the specified table from DynamoDB
 
@@ -45,8 +51,9 @@ def put_item(table: str, item: dict, log_level=None, role=None, use_prefix=False
     if use_prefix:
         prefix = f"{_PARAMS.environment}-{_PARAMS.app_name}"
         table = f"{prefix}-{table}"
-    client = _DYNAMODB if not role else get_client_sts(role)
-    item = {k: _SERIALIZER.serialize(v) for k, v in item.items()}
+    client = get_client("dynamodb") if not role else get_client_sts(role)
+    serializer = _get_serializer()
+    item = {k: serializer.serialize(v) for k, v in item.items()}
     try:
         response = client.put_item(
             TableName=table,
@@ -86,7 +93,7 @@ def get_table(table_name, role=None):
     >>> from core_aws.dynamo import get_table
     >>> get_table('table_name_dynamo')
     """
-    dynamodb = boto3.resource("dynamodb") if not role else get_session_sts(role).resource("dynamodb")
+    dynamodb = get_resource("dynamodb") if not role else get_resource("dynamodb", session=get_session_sts(role))
     table = dynamodb.Table(table_name)
     return table
 
@@ -181,8 +188,49 @@ def __define_parameters_update_table(fields_to_update: dict):
     return update_expression, values_expression, expression_attribute_names
 
 
-def get_items_by_query(table_name, index, key_condition, expr_attr_values=None, filter_expression=None, client=None,
-                       use_prefix=False):
+def query_pages(table_name, index, key_condition, expr_attr_values=None, filter_expression=None, client=None,
+                use_prefix=False, *, page_size=None, projection=None, expr_attr_names=None):
+    """
+    Queries a table page by page, following LastEvaluatedKey until the last page.
+
+    The pages are requested as they are consumed, stopping the iteration stops the query.
+
+    Parameters
+    ----------
+    table_name : str
+        The name of the table.
+    index : str
+        The name of the index to query, None for the table.
+    key_condition
+        The KeyConditionExpression.
+    expr_attr_values : dict
+        The ExpressionAttributeValues.
+    filter_expression
+        The FilterExpression, applied by DynamoDB after reading each page.
+    client
+        A low-level DynamoDB client, the values of the expressions and of the items are typed then. The table
+        resource is used when it is None.
+    use_prefix : bool
+        True if the prefix should be used to construct the table name, false otherwise
+    page_size : int
+        The Limit of every Query, items read per page before the filter.
+    projection : str
+        The ProjectionExpression, the attributes to return.
+    expr_attr_names : dict
+        The ExpressionAttributeNames of the expressions.
+
+    Yields
+    ------
+    dict
+        The response of every Query.
+
+    Examples
+    --------
+    >>> from boto3.dynamodb.conditions import Key
+    >>> from core_aws.dynamo import query_pages
+    >>> for page in query_pages("Invoices", None, Key("cdc").eq("123456"), page_size=100):
+    ...     process(page["Items"])
+    """
     prefix = f"{_PARAMS.environment}-{_PARAMS.app_name}"
     table_name = f"{prefix}-{table_name}" if use_prefix else table_name
 
@@ -201,15 +249,110 @@ def get_items_by_query(table_name, index, key_condition, expr_attr_values=None,
     if expr_attr_values:
         query.update({'ExpressionAttributeValues': expr_attr_values})
 
-    response = table.query(**query)
-    items = response.get('Items').copy()
-    while 'LastEvaluatedKey' in response and items:
+    if expr_attr_names:
+        query.update({'ExpressionAttributeNames': expr_attr_names})
+
+    if projection:
+        query.update({'ProjectionExpression': projection})
+
+    if page_size:
+        query.update({'Limit': page_size})
+
+    while True:
         response = table.query(**query)
-        items.extend(response.get('Items'))
-    response['Items'] = items
+        yield response
+        # A page can be empty because of the filter and still have more pages after it.
+        if 'LastEvaluatedKey' not in response:
+            return
+        query['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def query_items(table_name, index, key_condition, expr_attr_values=None, filter_expression=None, client=None,
+                use_prefix=False, *, limit=None, **options):
+    """
+    Queries a table and yields its items, across every page.
+
+    Parameters
+    ----------
+    limit : int
+        Stop after yielding this many items, no more pages are requested then.
+    options
+        page_size, projection and expr_attr_names, as in query_pages.
+
+    Examples
+    --------
+    >>> from boto3.dynamodb.conditions import Key
+    >>> from core_aws.dynamo import query_items
+    >>> first = next(query_items("Invoices", None, Key("cdc").eq("123456"), projection="id"), None)
+    """
+    if limit is not None and limit <= 0:
+        return
+    count = 0
+    for page in query_pages(table_name, index, key_condition, expr_attr_values, filter_expression, client,
+                            use_prefix, **options):
+        for item in page.get('Items', []):
+            yield item
+            count += 1
+            if count == limit:
+                return
+
+
+def collect(pages, limit=None, key_names=None) -> dict:
+    """
+    Joins the pages of a query in one response, with the Items, Count and ScannedCount of all of them.
+
+    Parameters
+    ----------
+    pages : iterable
+        The responses of query_pages.
+    limit : int
+        Keep this many items at most, no more pages are requested once they are reached.
+    key_names : iterable
+        The key attributes of the table and of the index, taken from the LastEvaluatedKey of the page by default.
+
+    Returns
+    -------
+    dict
+        The last response read, with the items of every page. When limit cut the results short, its
+        LastEvaluatedKey is the key of the last item kept, to resume the query after it.
+
+    Raises
+    ------
+    ValueError
+        If limit cut the last page and key_names was not given, the key of the last item kept is unknown then.
+    """
+    items, scanned, response = [], 0, {}
+    for response in pages:
+        items.extend(response.get('Items', []))
+        scanned += response.get('ScannedCount', 0)
+        if limit is not None and len(items) >= limit:
+            break
+    response = dict(response, ScannedCount=scanned)
+    if limit is not None and len(items) > limit:
+        # The items of the page after the last one kept are read again from its key.
+        names = key_names or response.get('LastEvaluatedKey')
+        if not names:
+            raise ValueError("key_names is required to resume a query whose last page is cut by limit")
+        del items[limit:]
+        response['LastEvaluatedKey'] = {name: items[-1][name] for name in names}
+    response.update(Items=items, Count=len(items))
     return response
 
 
+def get_items_by_query(table_name, index, key_condition, expr_attr_values=None, filter_expression=None, client=None,
+                       use_prefix=False):
+    """
+    Queries a table and returns every item in one response, see query_items to iterate them page by page instead.
+
+    Returns
+    -------
+    dict
+        The Query response with the items of every page.
+    """
+    return collect(query_pages(table_name, index, key_condition, expr_attr_values, filter_expression, client,
+                               use_prefix))
+
+
 def get_item(*, table_name, key, role=None, use_prefix=True):
     """Gets an item from a table with the specified key
 
@@ -1,21 +1,187 @@
 # -*- coding: utf-8 -*-
-import boto3
-import json
+import time
 from botocore.exceptions import (
     ClientError,
 )
+from core_aws.clients import get_client
+from core_utils import serializer
 from core_utils.utils import (
     get_logger,
-    cast_default
 )
 from datetime import datetime
 
 __all__ = [
-    "put_event"
+    "put_event",
+    "EventPublisher"
 ]
 
 LOGGER = get_logger("layer-eventbridge")
 
+MAX_ENTRIES_PER_CALL = 10
+MAX_CALL_SIZE = 256 * 1024
+TIME_ENTRY_SIZE = 14
+
+
+def get_events_client():
+    try:
+        return get_client('events')
+    except Exception as details:
+        LOGGER.error("Error create client events")
+        LOGGER.error("Details: {}".format(details))
+        raise ClientError
+
+
+def get_entry_size(entry: dict) -> int:
+    """
+    Calculates the size of an entry the way EventBridge does to enforce the PutEvents limit.
+
+    Parameters
+    ----------
+    entry : dict
+        A PutEventsRequestEntry.
+
+    Returns
+    -------
+    int
+        The size in bytes of the entry.
+    """
+    size = TIME_ENTRY_SIZE if entry.get('Time') else 0
+    for key in ('Source', 'DetailType', 'Detail'):
+        if entry.get(key):
+            size += len(entry[key].encode('utf-8'))
+    for resource in entry.get('Resources', []):
+        size += len(resource.encode('utf-8'))
+    return size
+
+
+class EventPublisher:
+    """
+    Buffers EventBridge entries and sends them packed in PutEvents calls of up to 10 entries and 256KB.
+
+    Only the entries reported as failed by EventBridge, or sent in a call that raised a ClientError, are retried, and
+    every entry gets its own status.
+
+    Examples
+    --------
+    >>> from core_aws.eventbridge import EventPublisher
+    >>> publisher = EventPublisher(bus_name='my-bus')
+    >>> publisher.add(event_name='sample_event', event_input={'key': 'value'})
+    >>> publisher.flush()
+    """
+
+    def __init__(self, *, source: str = 'lambda', bus_name: str = 'default', max_retries: int = 2,
+                 backoff: float = 0.1, client=None):
+        self.source = source
+        self.bus_name = bus_name
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self._client = client
+        self._entries = []
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = get_events_client()
+        return self._client
+
+    def __len__(self):
+        return len(self._entries)
+
+    def add(self, *, event_name: str, event_input: dict, source: str = None, bus_name: str = None) -> int:
+        """
+        Buffers an event to be sent on the next flush.
+
+        Returns
+        -------
+        int
+            The position of the entry in the statuses returned by flush.
+        """
+        self._entries.append({
+            'Time': datetime.now(),
+            'Source': source or self.source,
+            'DetailType': event_name,
+            'Detail': serializer.dumps(event_input),
+            'EventBusName': bus_name or self.bus_name
+        })
+        return len(self._entries) - 1
+
+    def flush(self) -> list:
+        """
+        Sends every buffered entry and empties the buffer.
+
+        Returns
+        -------
+        list
+            One status per entry in the order they were added, with the keys "success", "event_id",
+            "error_code" and "error_message".
+        """
+        entries, self._entries = self._entries, []
+        statuses = [None] * len(entries)
+        pending = []
+        for index, entry in enumerate(entries):
+            if get_entry_size(entry) > MAX_CALL_SIZE:
+                statuses[index] = self.__status(error_code='EntryTooLarge',
+                                                error_message='The entry exceeds the 256KB PutEvents limit')
+            else:
+                pending.append(index)
+
+        attempt = 0
+        while pending:
+            failed = []
+            for batch in self.__pack(entries, pending):
+                failed.extend(self.__send(entries, batch, statuses))
+            if not failed or attempt >= self.max_retries:
+                break
+            attempt += 1
+            LOGGER.warning(f"Retrying {len(failed)} failed entries, attempt {attempt}")
+            time.sleep(self.backoff * 2 ** (attempt - 1))
+            pending = failed
+        return statuses
+
+    @staticmethod
+    def __pack(entries: list, indexes: list):
+        batch, batch_size = [], 0
+        for index in indexes:
+            size = get_entry_size(entries[index])
+            if batch and (len(batch) == MAX_ENTRIES_PER_CALL or batch_size + size > MAX_CALL_SIZE):
+                yield batch
+                batch, batch_size = [], 0
+            batch.append(index)
+            batch_size += size
+        if batch:
+            yield batch
+
+    def __send(self, entries: list, batch: list, statuses: list) -> list:
+        try:
+            response = self.client.put_events(Entries=[entries[index] for index in batch])
+        except ClientError as error:
+            # The statuses of the calls already sent are kept, the entries of this one are failed and retried.
+            LOGGER.warning(f"PutEvents call of {len(batch)} entries failed: {error}")
+            for index in batch:
+                statuses[index] = self.__status(error_code=error.response['Error']['Code'], error_message=str(error))
+            return list(batch)
+        failed = []
+        for index, result in zip(batch, response['Entries']):
+            if 'EventId' in result:
+                statuses[index] = self.__status(event_id=result['EventId'])
+            else:
+                statuses[index] = self.__status(error_code=result.get('ErrorCode'),
+                                                error_message=result.get('ErrorMessage'))
+                failed.append(index)
+        if response.get('FailedEntryCount'):
+            LOGGER.warning(f"{response['FailedEntryCount']} of {len(batch)} entries failed")
+        return failed
+
+    @staticmethod
+    def __status(*, event_id=None, error_code=None, error_message=None) -> dict:
+        return {
+            'success': event_id is not None,
+            'event_id': event_id,
+            'error_code': error_code,
+            'error_message': error_message
+        }
+
+
 def put_event(*, event_name: str, event_input: dict, source: str = 'lambda', bus_name: str = 'default') -> True:
     """
     This function sends an event to AWS EventBridge.
@@ -50,22 +216,6 @@ def put_event(*, event_name: str, event_input: dict, source: str = 'lambda', bus
         print('Failed to send event')
     ```
     """
-    try:
-        eb = boto3.client('events')
-    except Exception as details:
-        LOGGER.error("Error create client ssm")
-        LOGGER.error("Details: {}".format(details))
-        raise ClientError
-    eb_response = eb.put_events(
-        Entries=[
-            {
-                'Time': datetime.now(),
-                'Source': source,
-                'DetailType': event_name,
-                'Detail': json.dumps(event_input, default=cast_default, ensure_ascii=False),
-                'EventBusName': bus_name
-            },
-        ]
-    )
-
-    return all(list(map(lambda entry: 'EventId' in entry, eb_response['Entries'])))
+    publisher = EventPublisher(source=source, bus_name=bus_name, max_retries=0, client=get_events_client())
+    publisher.add(event_name=event_name, event_input=event_input)
+    return all(status['success'] for status in publisher.flush())
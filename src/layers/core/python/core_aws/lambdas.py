@@ -3,7 +3,7 @@ import uuid
 import json
 import os
 
-import boto3
+from core_aws.clients import get_client
 from core_utils.utils import get_logger
 
 __all__ = [
@@ -57,7 +57,7 @@ def call_lambda(lambda_name, parameters, arn=False):
     >>> call_lambda('name_your_lambda',{pathParameters: {},body:{}})
     """
 
-    client = boto3.client('lambda')
+    client = get_client('lambda')
     if not arn:
         if "AWS_LAMBDA_FUNCTION_NAME" in os.environ:
             path = os.environ['AWS_LAMBDA_FUNCTION_NAME']
@@ -3,10 +3,10 @@
 import logging
 import os
 
-import boto3
 from botocore.exceptions import (
     ClientError,
 )
+from core_aws import clients
 
 __all__ = [
     "upload_file_to_bucket_s3",
@@ -21,7 +21,16 @@ __all__ = [
     "copy_object"
 ]
 
-s3 = boto3.client("s3")
+
+def _s3():
+    return clients.get_client("s3")
+
+
+def __getattr__(name):
+    # The default client used to be created at import, it is built now on first use.
+    if name == "s3":
+        return _s3()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 def upload_file_to_bucket_s3(file_name, bucket, object_name=None, is_pdf=False):
@@ -54,7 +63,7 @@ def upload_file_to_bucket_s3(file_name, bucket, object_name=None, is_pdf=False):
         extra_args['ContentType'] = 'application/pdf'
 
     try:
-        response = s3.upload_file(file_name, bucket, object_name, ExtraArgs=extra_args)
+        response = _s3().upload_file(file_name, bucket, object_name, ExtraArgs=extra_args)
     except ClientError as e:
         logging.error(e)
         return False
@@ -145,7 +154,7 @@ def generate_pre_signed_url(*, bucket, object_key, in_line=False, expiration=360
     if in_line:
         parameters.update({"ContentDisposition": "inline"})
 
-    response = s3.generate_presigned_url(
+    response = _s3().generate_presigned_url(
         ClientMethod=client_action, Params=parameters, ExpiresIn=expiration
     )
     return response
@@ -175,13 +184,13 @@ def get_metadata(*, bucket: str, key: str, default=None):
     >>> get_metadata(bucket='my-bucket', key='my-key')
 
     """
-    obj = s3.get_object(Bucket=bucket, Key=key)
+    obj = _s3().get_object(Bucket=bucket, Key=key)
     return obj.get("Metadata", default)
 
 
 def get_object(bucket: str, key: str):
     try:
-        response = s3.get_object(Bucket=bucket, Key=key)
+        response = _s3().get_object(Bucket=bucket, Key=key)
         return response.get("Body")
     except ClientError as error:
         if error.response.get("Error", {}).get("Code") == "NoSuchKey":
@@ -215,11 +224,11 @@ def upload_stream_object(bucket: str, key: str, body, content_type='text/plain')
     >>> content_type='application/pdf')
     """
 
-    return s3.put_object(Bucket=bucket, Key=key, Body=body, ContentType=content_type)
+    return _s3().put_object(Bucket=bucket, Key=key, Body=body, ContentType=content_type)
 
 
 def list_object_keys(bucket, prefix):
-    """Lists the objects in the specified bucket that have certain prefix
+    """Lists the objects in the specified bucket that have certain prefix, following every page of the listing
 
     Parameters
     ----------
@@ -233,8 +242,8 @@ def list_object_keys(bucket, prefix):
     list
         A list with the keys of the objects found on the bucket
     """
-    response = s3.list_objects(Bucket=bucket, Prefix=prefix)
-    return list(map(lambda o: o.get("Key"), response.get("Contents", [])))
+    pages = _s3().get_paginator("list_objects_v2").paginate(Bucket=bucket, Prefix=prefix)
+    return [o.get("Key") for page in pages for o in page.get("Contents", [])]
 
 
 def get_client(*, region="us-east-1", access_key_id=None, secret_access_key=None, session_token=None):
@@ -258,9 +267,9 @@ def get_client(*, region="us-east-1", access_key_id=None, secret_access_key=None
 
     """
     if not access_key_id or not secret_access_key or not session_token:
-        return s3
+        return _s3()
     else:
-        return boto3.client(
+        return clients.get_client(
             "s3",
             region_name=region,
             aws_access_key_id=access_key_id,
@@ -284,7 +293,7 @@ def copy(copy_source, client_source, bucket, key):
     key : str
         The name of the key to copy to
     """
-    s3.copy(copy_source, bucket, key, SourceClient=client_source)
+    _s3().copy(copy_source, bucket, key, SourceClient=client_source)
 
 
 def copy_object(*, bucket, source_key, destination_key):
@@ -304,7 +313,7 @@ def copy_object(*, bucket, source_key, destination_key):
     dict
         The response from s3
     """
-    return s3.copy_object(Bucket=bucket, CopySource=source_key, Key=destination_key)
+    return _s3().copy_object(Bucket=bucket, CopySource=source_key, Key=destination_key)
 
 
 def delete_object(*, bucket, key):
@@ -322,7 +331,7 @@ def delete_object(*, bucket, key):
     dict
         The response from s3
     """
-    return s3.delete_object(Bucket=bucket, Key=key)
+    return _s3().delete_object(Bucket=bucket, Key=key)
 
 
 def try_download_file(*, bucket, key, filename):
@@ -337,4 +346,4 @@ def try_download_file(*, bucket, key, filename):
     filename : str
         The path to the file to download to
     """
-    s3.download_file(bucket, key, filename)
+    _s3().download_file(bucket, key, filename)
@@ -2,6 +2,7 @@ from typing import Any
 
 from aws_lambda_powertools.utilities import parameters
 from aws_lambda_powertools.utilities.parameters import GetParameterError
+from core_aws.bootstrap import BOOTSTRAP, SECRETS
 from core_utils.environment import ParametersApp
 from core_utils.utils import get_logger
 
@@ -14,10 +15,19 @@ SECRETS_PREFIX = f"{PARAMETERS_APP.environment}-{PARAMETERS_APP.app_name}"
 GLOBAL_SECRETS_PREFIX = f"{PARAMETERS_APP.environment}-{PARAMETERS_APP.app_name}"
 
 
+def declare_secret(secret_name: str, transform: bool = False, use_prefix: bool = True, is_global=False):
+    """Declares a secret to be fetched concurrently with the other declared values on first use."""
+    prefix = GLOBAL_SECRETS_PREFIX if is_global else SECRETS_PREFIX
+    secret_name = f"{prefix}-{secret_name}" if use_prefix else secret_name
+    BOOTSTRAP.declare(SECRETS, secret_name, "json" if transform else None)
+
+
 def get_secret(secret_name: str, transform: bool = False, default: Any = None, use_prefix: bool = True, is_global=False):
     extra_args = {"transform": "json"} if transform else {}
     prefix = GLOBAL_SECRETS_PREFIX if is_global else SECRETS_PREFIX
     secret_name = f"{prefix}-{secret_name}" if use_prefix else secret_name
+    BOOTSTRAP.declare(SECRETS, secret_name, extra_args.get("transform"))
+    BOOTSTRAP.prefetch()
     try:
         value = parameters.get_secret(secret_name, **extra_args)
     except GetParameterError as e:
@@ -1,10 +1,25 @@
 # -*- coding: utf-8 -*-
 __all__ = ["get_current_region", "get_current_account"]
 
-import boto3
+from functools import lru_cache
 
-client = boto3.client("sts")
-session = boto3.session.Session()
+from core_aws.clients import get_client
+
+
+@lru_cache(maxsize=None)
+def _session():
+    import boto3
+
+    return boto3.session.Session()
+
+
+def __getattr__(name):
+    # The sts client and the default session used to be created at import, they are built now on first use.
+    if name == "client":
+        return get_client("sts")
+    if name == "session":
+        return _session()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 def get_current_region():
@@ -14,7 +29,7 @@ def get_current_region():
         Region name associated to current user
 
     """
-    return session.region_name
+    return _session().region_name
 
 
 def get_current_account():
@@ -23,7 +38,7 @@ def get_current_account():
     Returns: (str)
         Account ID number
     """
-    return client.get_caller_identity()["Account"]
+    return get_client("sts").get_caller_identity()["Account"]
 
 
 def get_session_by_role(access_key_id: str, secret_access_key: str, session_token: str):
@@ -38,6 +53,8 @@ def get_session_by_role(access_key_id: str, secret_access_key: str, session_toke
         Service client instance
 
     """
+    import boto3
+
     return boto3.session.Session(
         aws_access_key_id=access_key_id,
         aws_secret_access_key=secret_access_key,
@@ -1,7 +1,7 @@
 # -*- coding: utf-8 -*-
 import json
 
-import boto3
+from core_aws.clients import get_client
 from core_utils.utils import get_logger
 
 __all__ = [
@@ -35,7 +35,7 @@ def execute_sfn(*, name, state_machine_arn, input_value, region_name="us-east-1"
         get_parameter(stateMachineArn="arn:aws:state:my_arn", name="mi_execution_name", input={'key':value})
     """
     try:
-        sfn = boto3.client("stepfunctions", region_name=region_name)
+        sfn = get_client("stepfunctions", region_name=region_name)
         return sfn.start_execution(
             stateMachineArn=state_machine_arn,
             name=name,
@@ -62,7 +62,7 @@ def describe_execution(*, execution_arn, region_name="us-east-1"):
             describe_execution(execution_arn="execution_arn")
         """
     try:
-        sfn_client = boto3.client("stepfunctions", region_name=region_name)
+        sfn_client = get_client("stepfunctions", region_name=region_name)
         return sfn_client.describe_execution(
             executionArn=execution_arn)
     except Exception as details:
@@ -89,7 +89,7 @@ def list_executions(state_machine_arn, status=None, region_name="us-east-1"):
         from core_aws.sfn import list_executions
         list_executions(state_machine_arn="arn:aws:state:my_arn")
     """
-    sfn = boto3.client('stepfunctions', region_name=region_name)
+    sfn = get_client('stepfunctions', region_name=region_name)
     return sfn.list_executions(stateMachineArn=state_machine_arn, statusFilter=status)
 
 def get_events_from_execution(*, execution_arn: str, region_name:str ="us-east-1", results_steps: int=1000) -> list:
@@ -112,7 +112,7 @@ def get_events_from_execution(*, execution_arn: str, region_name:str ="us-east-1
         events = get_events_from_execution(execution_arn="execution_arn", region_name="us-east-1")
     """
     try:
-        sfn_client = boto3.client("stepfunctions", region_name=region_name)
+        sfn_client = get_client("stepfunctions", region_name=region_name)
         response = sfn_client.get_execution_history(
             executionArn=execution_arn,
             maxResults=results_steps
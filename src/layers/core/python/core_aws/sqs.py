@@ -1,29 +1,48 @@
 # -*- coding: utf-8 -*-
-import uuid
 import os
-import boto3
+import random
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from botocore.exceptions import (
     ClientError,
 )
+from core_aws.clients import get_client, get_credentials_params
 from core_utils.utils import (
     chunks,
     get_logger,
 )
 
 __all__ = [
+    "clear_queue_urls",
     "delete_sqs_messages",
     "get_sqs_queue_url",
+    "invalidate_queue_url",
     "UnprocessedMessagesError",
     "RecordsUnprocessedException",
     "send_message_to_queue",
     "send_messages_by_url",
     "send_message_batch_by_url",
     "send_message_by_queue_name",
+    "send_many",
     "receive_message",
+    "change_message_visibility",
 ]
 
 LOGGER = get_logger("layer-sqs")
 
+NON_EXISTENT_QUEUE_CODES = ("NonExistentQueue", "QueueDoesNotExist")
+MAX_ENTRIES_PER_CALL = 10
+MAX_CALL_SIZE = 256 * 1024
+TRANSIENT_ERROR_CODES = ("InternalError", "ServiceUnavailable", "RequestThrottled", "ThrottlingException",
+                         "KmsThrottled")
+
+# (queue name, region, access key id of the session or None for the default credentials): queue url
+_QUEUE_URLS = {}
+_QUEUE_URLS_LOCK = threading.Lock()
+
 
 def get_sqs_client(session=None, region="us-east-1"):
     """Gets a client for AWS SQS
@@ -34,17 +53,10 @@ def get_sqs_client(session=None, region="us-east-1"):
 
     """
     if not session:
-        return boto3.client("sqs", endpoint_url="https://sqs.{}.amazonaws.com".format(
+        return get_client("sqs", endpoint_url="https://sqs.{}.amazonaws.com".format(
             os.environ.get("AWS_DEFAULT_REGION", "us-east-1")))
     else:
-        params = {
-            'region_name': region,
-            'aws_access_key_id': session['Credentials']['AccessKeyId'],
-            'aws_secret_access_key': session['Credentials']['SecretAccessKey'],
-            'aws_session_token': session['Credentials']['SessionToken']
-        }
-
-        return boto3.client("sqs", **params)
+        return get_client("sqs", region_name=region, **get_credentials_params(session['Credentials']))
 
 
 def send_message_to_queue(queue_name: str, data: str, session=None, delay=None, is_fifo=False, message_group_id="1"):
@@ -72,7 +84,6 @@ def send_message_to_queue(queue_name: str, data: str, session=None, delay=None,
     sqs_client = get_sqs_client(session)
     params = {
         "MessageBody": data,
-        "QueueUrl": get_sqs_queue_url(queue_name, session)
     }
 
     if is_fifo:
@@ -81,7 +92,9 @@ def send_message_to_queue(queue_name: str, data: str, session=None, delay=None,
     if delay:
         params.update({"DelaySeconds": delay})
 
-    response = sqs_client.send_message(**params)
+    response = _call_with_queue_url(
+        queue_name, session, lambda queue_url: sqs_client.send_message(QueueUrl=queue_url, **params)
+    )
     return response
 
 
@@ -95,7 +108,7 @@ def get_sqs_client_sts(sts):
         Service client instance
 
     """
-    return sts.client("sqs")
+    return get_client("sqs", session=sts)
 
 
 def get_sqs_client_sts(sts):
@@ -108,13 +121,16 @@ def get_sqs_client_sts(sts):
         Service client instance
 
     """
-    return sts.client("sqs")
+    return get_client("sqs", session=sts)
 
 
-def delete_sqs_messages(queue_name: str, receipt_handles: list) -> dict:
+def delete_sqs_messages(queue_name: str, receipt_handles: list, *, max_workers: int = 4, max_retries: int = 2,
+                        backoff: float = 0.1) -> dict:
     """Deletes a list of messages from the specified queue.
 
-    It splits the messages in batches of 10 since the batch version of the DeleteMessage API only deletes up to ten.
+    It splits the messages in batches of 10 since the batch version of the DeleteMessage API only deletes up to ten,
+    and deletes several batches at a time. The entries failed by a transient error are retried after a jittered
+    exponential backoff.
 
     Parameters
     ----------
@@ -122,11 +138,18 @@ def delete_sqs_messages(queue_name: str, receipt_handles: list) -> dict:
         The name of the queue where the messages will be deleted.
     receipt_handles : list
         The list of receipt handles for the messages to be deleted.
+    max_workers : int
+        The batches deleted at the same time.
+    max_retries : int
+        Rounds of retries of the failed entries.
+    backoff : float
+        Seconds of the first retry, doubled on every round.
 
     Returns
     -------
     dict
-        The response from the DeleteMessage API with the results of every deleted message
+        The "Successful" and "Failed" entries of the DeleteMessageBatch responses, with the ReceiptHandle of each
+        one. The Id of every entry is the position of its receipt handle, the entries are sorted by it.
 
     Raises
     ------
@@ -134,34 +157,29 @@ def delete_sqs_messages(queue_name: str, receipt_handles: list) -> dict:
         If a queue with the provided name doesn't exist
 
     """
-    results = {"Successful": [], "Failed": []}
-
+    entries = [{"Id": str(index), "ReceiptHandle": handle} for index, handle in enumerate(receipt_handles)]
+    if not entries:
+        return {"Successful": [], "Failed": []}
+    queue_url = get_sqs_queue_url(queue_name)
     sqs_client = get_sqs_client()
-    try:
-        queue_url = sqs_client.get_queue_url(QueueName=queue_name)["QueueUrl"]
-    except ClientError as error:
-        if error.response["Error"]["Code"] == "AWS.SimpleQueueService.NonExistentQueue":
-            raise ValueError(
-                f"A queue with the name provided on the parameters doesn't exist: {queue_name}"
-            )
-        else:
-            raise error
 
-    for chunk in chunks(receipt_handles, 10):
+    def delete(batch):
         try:
-            entries = [
-                {"Id": str(uuid.uuid4()), "ReceiptHandle": receipt_handle}
-                for receipt_handle in chunk
-            ]
-            batch_results = delete_sqs_message_batch(queue_url, entries)
-            results.get("Successful").append(batch_results.get("Successful"))
-            results.get("Failed").append(batch_results.get("Failed"))
-        except ValueError as error:
-            results.get("Failed").append(
-                [{"Id": item.get("Id"), "Message": str(error)} for item in chunk]
-            )
-            continue
-    return results
+            return sqs_client.delete_message_batch(QueueUrl=queue_url, Entries=batch)
+        except ClientError as error:
+            if _is_non_existent_queue(error):
+                invalidate_queue_url(queue_name)
+            raise
+
+    successful, failed = _run_batches(
+        entries, lambda pending: chunks(pending, MAX_ENTRIES_PER_CALL), delete,
+        max_workers=max_workers, max_retries=max_retries, backoff=backoff, name="sqs-delete",
+    )
+    LOGGER.info(f"Deleted {len(successful)} of {len(entries)} messages from {queue_url}")
+    return {
+        "Successful": [dict(successful[index], ReceiptHandle=receipt_handles[index]) for index in sorted(successful)],
+        "Failed": [dict(failed[index], ReceiptHandle=receipt_handles[index]) for index in sorted(failed)],
+    }
 
 
 def delete_sqs_message_batch(queue_url: str, entries: list) -> dict:
@@ -212,27 +230,75 @@ def delete_sqs_message_batch(queue_url: str, entries: list) -> dict:
 
 def get_sqs_queue_url(queue_name, session=None):
     """
-    Get Queue URL to specific SQS resource
+    Get Queue URL to specific SQS resource, resolved once per queue name, region and credentials for the life of
+    the process.
     Args: (str)
         queue_name: Queue name to get URL
+        session: AWS session whose credentials are used, the default credentials when it is None
 
     Returns: (str)
         Queue URL belong SQS
 
-    Raises: (QueueDoesNotExist) Exception founded when URL is not exists
+    Raises: (ValueError) Exception founded when URL is not exists
 
     """
+    sqs_client = get_sqs_client(session)
+    key = _queue_url_key(queue_name, sqs_client, session)
+    queue_url = _QUEUE_URLS.get(key)
+    if queue_url is not None:
+        return queue_url
     try:
-        sqs_client = get_sqs_client(session)
-        queue_url = sqs_client.get_queue_url(QueueName=queue_name)
-        return queue_url["QueueUrl"]
+        queue_url = sqs_client.get_queue_url(QueueName=queue_name)["QueueUrl"]
     except ClientError as error:
-        if error.response["Error"]["Code"] == "AWS.SimpleQueueService.NonExistentQueue":
+        if _is_non_existent_queue(error):
             raise ValueError(
                 f"A queue with the name provided on the parameters doesn't exist: {queue_name}, error founded: {error}"
             )
         else:
             raise error
+    with _QUEUE_URLS_LOCK:
+        _QUEUE_URLS[key] = queue_url
+    return queue_url
+
+
+def invalidate_queue_url(queue_name, session=None):
+    """
+    Forget the URL resolved for a queue, the next call of get_sqs_queue_url asks SQS again.
+    Args:
+        queue_name: (str) The name of the queue
+        session: AWS session the URL was resolved with
+    """
+    key = _queue_url_key(queue_name, get_sqs_client(session), session)
+    with _QUEUE_URLS_LOCK:
+        _QUEUE_URLS.pop(key, None)
+
+
+def clear_queue_urls():
+    """Forget every resolved queue URL."""
+    with _QUEUE_URLS_LOCK:
+        _QUEUE_URLS.clear()
+
+
+def _queue_url_key(queue_name, sqs_client, session):
+    access_key_id = session["Credentials"]["AccessKeyId"] if session else None
+    return queue_name, sqs_client.meta.region_name, access_key_id
+
+
+def _is_non_existent_queue(error: ClientError) -> bool:
+    return error.response["Error"]["Code"].split(".")[-1] in NON_EXISTENT_QUEUE_CODES
+
+
+def _call_with_queue_url(queue_name, session, call):
+    # A cached URL of a queue that was deleted and created again is resolved once more before giving up.
+    queue_url = get_sqs_queue_url(queue_name, session)
+    try:
+        return call(queue_url)
+    except ClientError as error:
+        if not _is_non_existent_queue(error):
+            raise
+        LOGGER.warning(f"Queue {queue_name} not found at {queue_url}, resolving its URL again")
+        invalidate_queue_url(queue_name, session)
+        return call(get_sqs_queue_url(queue_name, session))
 
 
 def send_messages_by_url(
@@ -344,8 +410,7 @@ def send_message_by_queue_name(
     LOGGER.info(
         f"Data executed: Queue Name: -> {queue_name}, Data to send: {data_to_send}"
     )
-    queue_url = get_sqs_queue_url(queue_name)
-    return send_messages_by_url(
+    return _call_with_queue_url(queue_name, None, lambda queue_url: send_messages_by_url(
         data_to_send,
         queue_url,
         is_fifo,
@@ -353,7 +418,7 @@ def send_message_by_queue_name(
         message_deduplication_id,
         message_attributes,
         delay_seconds,
-    )
+    ))
 
 
 def send_message_batch_by_url(queue_url: str, entries: list):
@@ -378,7 +443,8 @@ def send_message_batch_by_url(queue_url: str, entries: list):
         ClientError: When an AWS exception is founded
         RuntimeError: If an unexpected error is founded
     """
-    LOGGER.info(f"Data executed: Queue URL: -> {queue_url}, Entries to send: {entries}")
+    LOGGER.info(f"Data executed: Queue URL: -> {queue_url}, Entries to send: {len(entries)}")
+    LOGGER.debug(entries)
     try:
         sqs_client = get_sqs_client()
         response = sqs_client.send_message_batch(QueueUrl=queue_url, Entries=entries)
@@ -392,7 +458,222 @@ def send_message_batch_by_url(queue_url: str, entries: list):
         raise err
 
 
-def receive_message(queue_url, max_number_messages, wait_time):
+def get_entry_size(entry: dict) -> int:
+    """
+    Calculates the size of a SendMessageBatchRequestEntry the way SQS does to enforce the 256KB limit, the body
+    plus the name, type and value of every message attribute.
+
+    Parameters
+    ----------
+    entry : dict
+        A SendMessageBatchRequestEntry.
+
+    Returns
+    -------
+    int
+        The size in bytes of the entry.
+    """
+    size = len(entry["MessageBody"].encode("utf-8"))
+    for name, attribute in entry.get("MessageAttributes", {}).items():
+        size += len(name.encode("utf-8")) + len(attribute.get("DataType", "").encode("utf-8"))
+        value = attribute.get("StringValue", attribute.get("BinaryValue", ""))
+        size += len(value.encode("utf-8") if isinstance(value, str) else value)
+    return size
+
+
+def send_many(queue: str, messages, *, session=None, max_workers: int = 4, max_retries: int = 2,
+              backoff: float = 0.1) -> dict:
+    """
+    Sends any number of messages packed in SendMessageBatch calls of up to 10 entries and 256KB, several calls at a
+    time.
+
+    Only the entries reported as failed without sender fault are retried, after a jittered exponential backoff.
+
+    The messages of a FIFO queue are sent one call at a time, in order, with at most one message of a group per call.
+    Every call is retried before the next one and, once a message of a group fails, the next ones of that group are
+    failed without being sent, so SQS never receives a message before an earlier one of its group.
+
+    Parameters
+    ----------
+    queue : str
+        The name or the URL of the queue.
+    messages : iterable
+        The bodies of the messages as str, or SendMessageBatchRequestEntry dicts without Id.
+    session
+        AWS session to use to send the messages
+    max_workers : int
+        The calls running at the same time, 1 for a FIFO queue.
+    max_retries : int
+        Rounds of retries of the failed entries.
+    backoff : float
+        Seconds of the first retry, doubled on every round.
+
+    Returns
+    -------
+    dict
+        The "Successful" and "Failed" entries of the SendMessageBatch responses. The Id of every entry is the
+        position of its message, the entries are sorted by it.
+
+    Examples
+    --------
+    >>> from core_aws.sqs import send_many
+    >>> result = send_many("p2p-transactions", [serializer.dumps(body) for body in bodies])
+    >>> failed = [bodies[int(entry["Id"])] for entry in result["Failed"]]
+    """
+    entries = [
+        dict(message, Id=str(index)) if isinstance(message, dict) else {"Id": str(index), "MessageBody": message}
+        for index, message in enumerate(messages)
+    ]
+    if not entries:
+        return {"Successful": [], "Failed": []}
+    queue_url = queue if queue.startswith("https://") else get_sqs_queue_url(queue, session)
+    sqs_client = get_sqs_client(session)
+
+    too_large = {
+        index: {"Id": entry["Id"], "SenderFault": True, "Code": "EntryTooLarge",
+                "Message": "The message exceeds the 256KB SendMessageBatch limit"}
+        for index, entry in enumerate(entries) if get_entry_size(entry) > MAX_CALL_SIZE
+    }
+
+    def send(batch):
+        try:
+            return sqs_client.send_message_batch(QueueUrl=queue_url, Entries=batch)
+        except ClientError as error:
+            if _is_non_existent_queue(error) and queue_url != queue:
+                invalidate_queue_url(queue, session)
+            raise
+
+    if queue_url.endswith(".fifo"):
+        run, pack = _run_in_order, _pack_by_group
+    else:
+        run, pack = partial(_run_batches, max_workers=max_workers), _pack
+    successful, failed = run(
+        [entry for index, entry in enumerate(entries) if index not in too_large], pack, send,
+        max_retries=max_retries, backoff=backoff, name="sqs-send",
+    )
+    failed.update(too_large)
+
+    LOGGER.info(f"Sent {len(successful)} of {len(entries)} messages to {queue_url}")
+    return {
+        "Successful": [successful[index] for index in sorted(successful)],
+        "Failed": [failed[index] for index in sorted(failed)],
+    }
+
+
+def _pack(entries: list):
+    batch, batch_size = [], 0
+    for entry in entries:
+        size = get_entry_size(entry)
+        if batch and (len(batch) == MAX_ENTRIES_PER_CALL or batch_size + size > MAX_CALL_SIZE):
+            yield batch
+            batch, batch_size = [], 0
+        batch.append(entry)
+        batch_size += size
+    if batch:
+        yield batch
+
+
+def _pack_by_group(entries: list):
+    # A retried entry must not be sent after a later one of its group, so a group is never twice in the same call.
+    batch, batch_size, groups = [], 0, set()
+    for entry in entries:
+        size = get_entry_size(entry)
+        group = entry.get("MessageGroupId")
+        if batch and (len(batch) == MAX_ENTRIES_PER_CALL or batch_size + size > MAX_CALL_SIZE or group in groups):
+            yield batch
+            batch, batch_size, groups = [], 0, set()
+        batch.append(entry)
+        batch_size += size
+        groups.add(group)
+    if batch:
+        yield batch
+
+
+def _is_transient(error: ClientError) -> bool:
+    status = error.response.get("ResponseMetadata", {}).get("HTTPStatusCode") or 0
+    return status >= 500 or error.response["Error"]["Code"].split(".")[-1] in TRANSIENT_ERROR_CODES
+
+
+def _run_batches(entries: list, pack, call, *, max_workers: int, max_retries: int, backoff: float, name: str):
+    """
+    Runs the batches packed from entries concurrently and retries the entries failed without sender fault.
+
+    The Id of every entry must be a distinct integer, the results are keyed by it. A ClientError of a whole call
+    fails each of its entries, as a sender fault unless the error is transient.
+
+    Returns
+    -------
+    tuple
+        The successful and the failed results of the batch responses, by position of their entry.
+    """
+    successful, failed = {}, {}
+
+    def run(batch):
+        try:
+            return call(batch)
+        except ClientError as error:
+            LOGGER.warning(f"{name} call of {len(batch)} entries failed: {error}")
+            fault = {"SenderFault": not _is_transient(error), "Code": error.response["Error"]["Code"],
+                     "Message": str(error)}
+            return {"Failed": [dict(fault, Id=entry["Id"]) for entry in batch]}
+
+    pending, attempt = entries, 0
+    while pending:
+        batches = list(pack(pending))
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(batches)), thread_name_prefix=name) as pool:
+            responses = list(pool.map(run, batches))
+        retry = []
+        for response in responses:
+            for result in response.get("Successful", []):
+                successful[int(result["Id"])] = result
+                failed.pop(int(result["Id"]), None)
+            for result in response.get("Failed", []):
+                failed[int(result["Id"])] = result
+                if not result.get("SenderFault"):
+                    retry.append(int(result["Id"]))
+        if not retry or attempt >= max_retries:
+            break
+        attempt += 1
+        LOGGER.warning(f"Retrying {len(retry)} failed entries of {name}, attempt {attempt}")
+        time.sleep(random.uniform(0, backoff * 2 ** (attempt - 1)))
+        retry = set(retry)
+        pending = [entry for entry in pending if int(entry["Id"]) in retry]
+    return successful, failed
+
+
+def _run_in_order(entries: list, pack, call, *, max_retries: int, backoff: float, name: str):
+    """
+    Runs the batches packed from entries one after another for a FIFO queue, each one with its retries. pack must
+    not put two entries of a MessageGroupId in the same batch, or a retried entry would be sent after a later one.
+
+    The entries of a MessageGroupId that already has a failed entry are failed with sender fault without being sent.
+
+    Returns
+    -------
+    tuple
+        The successful and the failed results of the batch responses, by position of their entry.
+    """
+    successful, failed = {}, {}
+    failed_groups = set()
+    for batch in pack(entries):
+        to_send = []
+        for entry in batch:
+            if entry.get("MessageGroupId") in failed_groups:
+                failed[int(entry["Id"])] = {"Id": entry["Id"], "SenderFault": True, "Code": "PreviousMessageFailed",
+                                            "Message": "Not sent, an earlier message of its group failed"}
+            else:
+                to_send.append(entry)
+        if not to_send:
+            continue
+        batch_successful, batch_failed = _run_batches(to_send, lambda pending: [pending], call, max_workers=1,
+                                                      max_retries=max_retries, backoff=backoff, name=name)
+        successful.update(batch_successful)
+        failed.update(batch_failed)
+        failed_groups.update(entry.get("MessageGroupId") for entry in to_send if int(entry["Id"]) in batch_failed)
+    return successful, failed
+
+
+def receive_message(queue_url, max_number_messages, wait_time, visibility_timeout=None):
     """
     Retrieves one or more messages (up to 10), from the specified queue. For more information about this, check this
     URL:
@@ -404,6 +685,8 @@ def receive_message(queue_url, max_number_messages, wait_time):
         max_number_messages: (int)  The maximum number of messages to return. Valid values: 1 to 10. Default: 1.
         wait_time: (int) The duration (in seconds) for which the call waits for a message to arrive in the queue before
         returning.
+        visibility_timeout: (int) The seconds the received messages are hidden from other receives, the one of the
+        queue when it is None.
 
     Returns: (dict)
         Data about the messages to receive. For each message returned, the response includes the following:
@@ -424,11 +707,16 @@ def receive_message(queue_url, max_number_messages, wait_time):
     )
     try:
         sqs_client = get_sqs_client()
-        response = sqs_client.receive_messages(
+        params = {}
+        if visibility_timeout is not None:
+            params.update({"VisibilityTimeout": visibility_timeout})
+        response = sqs_client.receive_message(
             QueueUrl=queue_url,
-            AttributeNames=["ALL"],
+            AttributeNames=["All"],
+            MessageAttributeNames=["All"],
             MaxNumberOfMessages=max_number_messages,
             WaitTimeSeconds=wait_time,
+            **params,
         )
         return response
     except ClientError as err:
@@ -439,6 +727,36 @@ def receive_message(queue_url, max_number_messages, wait_time):
         raise err
 
 
+def change_message_visibility(queue_url: str, receipt_handles: list, visibility_timeout: int) -> list:
+    """
+    Changes the visibility timeout of received messages, in batches of 10.
+
+    Parameters
+    ----------
+    queue_url : str
+        The URL of the queue of the messages.
+    receipt_handles : list
+        The receipt handles of the messages.
+    visibility_timeout : int
+        The seconds, counted from now, the messages stay hidden. 0 makes them visible again right away.
+
+    Returns
+    -------
+    list
+        The "Failed" entries of the ChangeMessageVisibilityBatch responses, the Id of every entry is the position of
+        its receipt handle.
+    """
+    sqs_client = get_sqs_client()
+    failed = []
+    for start in range(0, len(receipt_handles), MAX_ENTRIES_PER_CALL):
+        entries = [
+            {"Id": str(index), "ReceiptHandle": handle, "VisibilityTimeout": visibility_timeout}
+            for index, handle in enumerate(receipt_handles[start: start + MAX_ENTRIES_PER_CALL], start)
+        ]
+        failed.extend(sqs_client.change_message_visibility_batch(QueueUrl=queue_url, Entries=entries)["Failed"])
+    return failed
+
+
 class UnprocessedMessagesError(Exception):
     """Exception raised when messages couldn't be successfully processed"""
 
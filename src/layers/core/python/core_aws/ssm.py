@@ -1,12 +1,13 @@
 # -*- coding: utf-8 -*-
-from typing import Any, Union, Dict
+from typing import Any, Union, Dict, List
 
 from aws_lambda_powertools.utilities import parameters
-from aws_lambda_powertools.utilities.parameters.exceptions import GetParameterError
+from aws_lambda_powertools.utilities.parameters.exceptions import GetParameterError, TransformParameterError
+from core_aws.bootstrap import BOOTSTRAP, SSM
 from core_utils.environment import ParametersApp
 from core_utils.utils import get_logger
 
-__all__ = ["get_parameter"]
+__all__ = ["get_parameter", "declare_parameter", "get_parameters", "load_parameters"]
 
 LAYER_NAME = "ssm"
 
@@ -14,6 +15,21 @@ LOGGER = get_logger(f"layer-{LAYER_NAME}")
 
 PARAMETERS_APP = ParametersApp()
 PARAMETERS_PREFIX = f"/{PARAMETERS_APP.environment}/{PARAMETERS_APP.app_name}"
+GET_PARAMETERS_LIMIT = 10
+
+
+def declare_parameter(ssm_name, *, transform: bool = False, use_prefix: bool = True):
+    """
+    Declares a parameter to be fetched concurrently with the others on the first get_parameter call.
+
+    Examples
+    --------
+    >>> from core_aws.ssm import declare_parameter
+    >>> declare_parameter("my/parameter")
+
+    """
+    ssm_name = f"{PARAMETERS_PREFIX}/{ssm_name}" if use_prefix else ssm_name
+    BOOTSTRAP.declare(SSM, ssm_name, "json" if transform else None)
 
 
 def get_parameter(ssm_name, *,
@@ -49,6 +65,8 @@ def get_parameter(ssm_name, *,
     """
     extra_args = {"transform": "json"} if transform else {}
     ssm_name = f"{PARAMETERS_PREFIX}/{ssm_name}" if use_prefix else ssm_name
+    BOOTSTRAP.declare(SSM, ssm_name, extra_args.get("transform"))
+    BOOTSTRAP.prefetch()
     try:
         value = parameters.get_parameter(ssm_name, **extra_args)
     except GetParameterError as e:
@@ -61,3 +79,98 @@ def get_parameter(ssm_name, *,
     LOGGER.debug(f"Value for {ssm_name}: {value}")
 
     return value
+
+
+def load_parameters(prefix: str = None, *, recursive: bool = True) -> Dict[str, str]:
+    """
+    Load every parameter under a path with paginated GetParametersByPath calls.
+
+    The values are decrypted and kept as a snapshot, later get_parameter calls for any of them, with or
+    without transform, are served from it.
+
+    Parameters
+    ----------
+    prefix : str
+        The path to load. The app namespace "/{environment}/{app_name}" by default.
+    recursive : bool
+        If True, loads the whole hierarchy under the path.
+
+    Returns
+    -------
+    dict
+        The raw values keyed by the full parameter name.
+
+    Examples
+    --------
+    >>> from core_aws.ssm import load_parameters
+    >>> load_parameters()
+
+    """
+    client = BOOTSTRAP.provider(SSM).client
+    values = {}
+    paginator = client.get_paginator("get_parameters_by_path")
+    for page in paginator.paginate(Path=prefix or PARAMETERS_PREFIX, Recursive=recursive, WithDecryption=True):
+        for parameter in page["Parameters"]:
+            values[parameter["Name"]] = parameter["Value"]
+    BOOTSTRAP.load(SSM, values)
+    LOGGER.debug(f"Loaded {len(values)} parameters from {prefix or PARAMETERS_PREFIX}")
+    return values
+
+
+def get_parameters(ssm_names: List[str], *, transform: bool = False, use_prefix: bool = True) -> Dict[str, Any]:
+    """
+    Get several parameters, the ones not cached yet are fetched with GetParameters calls of up to 10 names.
+
+    Parameters
+    ----------
+    ssm_names : list
+        The names of the parameters to get.
+    transform : bool
+        If the parameter values are json strings you can pass this like true and get the values like dict objects.
+    use_prefix : bool
+        If True, the names are relative to the app namespace.
+
+    Returns
+    -------
+    dict
+        The values keyed by the names received, parameters that don't exist are left out.
+
+    Raises
+    ------
+    TransformParameterError
+        If transform is True and some of the values are not JSON.
+
+    Examples
+    --------
+    >>> from core_aws.ssm import get_parameters
+    >>> get_parameters(["my/parameter", "my/other-parameter"])
+
+    """
+    extra_args = {"transform": "json"} if transform else {}
+    names = {ssm_name: f"{PARAMETERS_PREFIX}/{ssm_name}" if use_prefix else ssm_name for ssm_name in ssm_names}
+    # In the order received, duplicates removed.
+    missing = [
+        name for name in dict.fromkeys(names.values())
+        if not BOOTSTRAP.is_cached(SSM, name, extra_args.get("transform"))
+    ]
+
+    client = BOOTSTRAP.provider(SSM).client
+    values = {}
+    for i in range(0, len(missing), GET_PARAMETERS_LIMIT):
+        response = client.get_parameters(Names=missing[i: i + GET_PARAMETERS_LIMIT], WithDecryption=True)
+        values.update({parameter["Name"]: parameter["Value"] for parameter in response["Parameters"]})
+        if response.get("InvalidParameters"):
+            LOGGER.warning(f"Parameters not found: {response['InvalidParameters']}")
+    BOOTSTRAP.load(SSM, values)
+
+    result = {}
+    invalid = []
+    for ssm_name, name in names.items():
+        if BOOTSTRAP.is_cached(SSM, name, extra_args.get("transform")):
+            result[ssm_name] = parameters.get_parameter(name, **extra_args)
+        elif transform and BOOTSTRAP.is_cached(SSM, name):
+            # Only the raw value was stored, it could not be decoded.
+            invalid.append(ssm_name)
+    if invalid:
+        raise TransformParameterError(f"Parameters with a value that is not JSON: {invalid}")
+    return result
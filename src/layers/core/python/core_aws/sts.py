@@ -1,5 +1,6 @@
 import boto3
 from aws_lambda_powertools.utilities.parameters.exceptions import GetParameterError
+from core_aws.clients import get_client, get_credentials_params
 from core_utils.utils import get_logger
 
 __all__ = [
@@ -29,7 +30,7 @@ def assume_role(role_arn, session_name):
     dict
         Temporary credentials to make AWS requests
     """
-    sts_client = boto3.client("sts")
+    sts_client = get_client("sts")
     return sts_client.assume_role(
         RoleArn=role_arn,
         RoleSessionName=session_name)
@@ -48,11 +49,7 @@ def get_client_sts(arn_account: str, region="us-east-1"):
     """
     try:
         sts_session = assume_role(arn_account, "dynamodb-session")
-        result = boto3.client('dynamodb',
-                              region_name=region,
-                              aws_access_key_id=sts_session['Credentials']['AccessKeyId'],
-                              aws_secret_access_key=sts_session['Credentials']['SecretAccessKey'],
-                              aws_session_token=sts_session['Credentials']['SessionToken'])
+        result = get_client('dynamodb', region_name=region, **get_credentials_params(sts_session['Credentials']))
 
     except GetParameterError as error:
         LOGGER.exception(f"{error}")
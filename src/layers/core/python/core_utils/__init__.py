@@ -2,16 +2,17 @@
 import os
 
 try:
-    if not os.getenv("DEVELOPER"):
-        print("patching...")
-        from aws_xray_sdk.core import patch_all
+    from core_utils.tracing import patch_modules
 
-        patch_all()
+    patch_modules()
 except Exception as e:
     print(str(e))
 
 
 def load_environment_variables():
+    if os.getenv("AWS_LAMBDA_FUNCTION_NAME"):
+        # There is no .env file in the Lambda runtime, the variables come from the function configuration.
+        return
     try:
         from dotenv import load_dotenv
     except ImportError:
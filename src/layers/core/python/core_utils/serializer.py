@@ -0,0 +1,341 @@
+# -*- coding: utf-8 -*-
+"""
+JSON serialization backends.
+
+The values json can't encode natively are converted by a type dispatch table, the converter of a type is resolved
+once through its MRO and cached. orjson is used as the backend when it is installed, the standard library json
+module otherwise, both produce the same values. NaN and infinite floats are rejected by both, json would write them
+as NaN, which is not JSON, and orjson as null. Payloads holding them raise a ValueError since then, json.dumps
+wrote them before.
+"""
+import datetime
+import json
+import math
+import sys
+import threading
+from decimal import Decimal
+from enum import Enum
+from uuid import UUID
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+__all__ = [
+    "ENCODERS",
+    "decimal_to_number",
+    "register",
+    "default",
+    "normalize",
+    "normalize_iterative",
+    "dumps",
+    "loads",
+    "set_backend",
+    "get_backend",
+]
+
+
+def decimal_to_number(value: Decimal):
+    """Casts a Decimal to int when it is written as a non negative integer, to float otherwise."""
+    # Going through str is several times faster than Decimal.as_tuple.
+    value = str(value)
+    return int(value) if value.isdigit() else float(value)
+
+
+def _isoformat(value):
+    return value.isoformat()
+
+
+def _model_data(value):
+    return value.__data__
+
+
+def _enum_value(value):
+    return value.value
+
+
+ENCODERS = {
+    Decimal: decimal_to_number,
+    UUID: str,
+    datetime.datetime: _isoformat,
+    datetime.date: _isoformat,
+    datetime.time: _isoformat,
+    # orjson writes the value of an Enum natively, json goes through this encoder.
+    Enum: _enum_value,
+}
+
+DEFAULT_MAX_DEPTH = 1000
+
+_PLAIN = {str, int, float, bool, type(None)}
+_KEYS = {True: "true", False: "false", None: "null"}
+_RESOLVED = {}
+_LOCK = threading.Lock()
+_BACKEND = {"name": "orjson" if orjson else "json"}
+
+
+def register(type_, encoder):
+    """
+    Registers the function used to convert the instances of a type, its subclasses included.
+
+    Parameters
+    ----------
+    type_ : type
+        The type to convert.
+    encoder : callable
+        Receives the instance and returns a value json can encode.
+
+    Examples
+    --------
+    >>> from core_utils.serializer import register
+    >>> register(set, list)
+
+    """
+    with _LOCK:
+        ENCODERS[type_] = encoder
+        _RESOLVED.clear()
+
+
+def _resolve(type_):
+    for base in type_.__mro__:
+        if base in ENCODERS:
+            return ENCODERS[base]
+    # peewee is not imported here, models are only encoded once the process loaded it.
+    peewee = sys.modules.get("peewee")
+    if peewee is not None and issubclass(type_, peewee.Model):
+        return _model_data
+    return None
+
+
+def default(o):
+    """
+    Converts a value json can't encode natively, None for the types without an encoder.
+
+    Examples
+    --------
+    >>> from core_utils.serializer import default
+    >>> default(Decimal("1.5"))
+
+    """
+    type_ = type(o)
+    try:
+        encoder = _RESOLVED[type_]
+    except KeyError:
+        encoder = _RESOLVED[type_] = _resolve(type_)
+    return encoder(o) if encoder else None
+
+
+def _key(key):
+    # The same conversion json applies to the keys of the objects.
+    if isinstance(key, str):
+        return str.__str__(key)
+    if key is None or isinstance(key, bool):
+        return _KEYS[key]
+    if isinstance(key, int):
+        return int.__repr__(key)
+    if isinstance(key, float):
+        return json.dumps(float(key))
+    raise TypeError(f"keys must be str, int, float, bool or None, not {type(key).__name__}")
+
+
+def _coerce(o):
+    # Subclasses of the json types are reduced to their base type, anything else goes through default.
+    if isinstance(o, str):
+        return str.__str__(o)
+    if isinstance(o, int):
+        return int(o)
+    if isinstance(o, float):
+        return float(o)
+    if isinstance(o, dict):
+        return dict(o)
+    if isinstance(o, (list, tuple)):
+        return list(o)
+    return default(o)
+
+
+def normalize(data):
+    """
+    Converts data to the values json.loads(json.dumps(data, default=default)) would return in a single pass,
+    without building the intermediate string.
+
+    Parameters
+    ----------
+    data : Any
+
+    Returns
+    -------
+    Any
+        The data made only of dict, list, str, int, float, bool and None.
+
+    Examples
+    --------
+    >>> from core_utils.serializer import normalize
+    >>> normalize({"amount": Decimal("10.5"), "ids": (1, 2)})
+
+    """
+    type_ = type(data)
+    if type_ in _PLAIN:
+        return data
+    # The plain values are checked inline, most of the elements don't need the extra call.
+    if type_ is dict:
+        return {
+            k if type(k) is str else _key(k): v if type(v) in _PLAIN else normalize(v) for k, v in data.items()
+        }
+    if type_ is list or type_ is tuple:
+        return [v if type(v) in _PLAIN else normalize(v) for v in data]
+    encoder = _RESOLVED.get(type_)
+    data = encoder(data) if encoder is not None else _coerce(data)
+    return data if type(data) in _PLAIN else normalize(data)
+
+
+def normalize_iterative(data, max_depth: int = DEFAULT_MAX_DEPTH):
+    """
+    Same as normalize but walks the data with an explicit stack, for structures nested deeper than the recursion
+    limit allows.
+
+    Parameters
+    ----------
+    data : Any
+    max_depth : int
+        The deepest nesting accepted.
+
+    Returns
+    -------
+    Any
+        The data made only of dict, list, str, int, float, bool and None.
+
+    Raises
+    ------
+    ValueError
+        If the data is nested deeper than max_depth, circular references included.
+
+    Examples
+    --------
+    >>> from core_utils.serializer import normalize_iterative
+    >>> normalize_iterative([[[Decimal("1")]]], max_depth=10)
+
+    """
+    root = [data]
+    stack = [(root, 0, 0)]
+    while stack:
+        parent, key, depth = stack.pop()
+        if depth > max_depth:
+            raise ValueError(f"The data is nested deeper than {max_depth} levels")
+        value = parent[key]
+        type_ = type(value)
+        while type_ not in _PLAIN and type_ is not dict and type_ is not list and type_ is not tuple:
+            value = _coerce(value)
+            type_ = type(value)
+        if type_ is dict:
+            items = {k if type(k) is str else _key(k): v for k, v in value.items()}
+            positions = items.items()
+        elif type_ is list or type_ is tuple:
+            items = list(value)
+            positions = enumerate(items)
+        else:
+            parent[key] = value
+            continue
+        parent[key] = items
+        # The plain values and the ones an encoder turns into plain values are done right away, only the
+        # containers and the other types go through the stack.
+        for position, item in positions:
+            if type(item) in _PLAIN:
+                continue
+            encoder = _RESOLVED.get(type(item))
+            if encoder is not None:
+                item = items[position] = encoder(item)
+                if type(item) in _PLAIN:
+                    continue
+            stack.append((items, position, depth + 1))
+    return root[0]
+
+
+def _has_non_finite(obj) -> bool:
+    stack = [obj]
+    while stack:
+        value = stack.pop()
+        if isinstance(value, float):
+            if not math.isfinite(value):
+                return True
+        elif isinstance(value, dict):
+            stack.extend(value.keys())
+            stack.extend(value.values())
+        elif isinstance(value, (list, tuple)):
+            stack.extend(value)
+        elif type(value) not in _PLAIN and not isinstance(value, (str, int)):
+            stack.append(default(value))
+    return False
+
+
+def _orjson_dumps(obj) -> str:
+    try:
+        value = orjson.dumps(
+            obj,
+            default=default,
+            option=orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS,
+        ).decode()
+    except orjson.JSONEncodeError:
+        # Integers bigger than 64 bits and other values orjson rejects.
+        return _json_dumps(obj)
+    # orjson writes NaN and infinite floats as null, the data is only walked when there is one.
+    if "null" in value and _has_non_finite(obj):
+        raise ValueError("Out of range float values are not JSON compliant")
+    return value
+
+
+def _json_dumps(obj) -> str:
+    return json.dumps(obj, default=default, ensure_ascii=False, allow_nan=False)
+
+
+def set_backend(name: str):
+    """
+    Selects the backend used by dumps and loads.
+
+    Parameters
+    ----------
+    name : str
+        "orjson" or "json".
+
+    Examples
+    --------
+    >>> from core_utils.serializer import set_backend
+    >>> set_backend("json")
+
+    """
+    if name not in ("orjson", "json"):
+        raise ValueError(f"Unknown JSON backend {name}")
+    if name == "orjson" and orjson is None:
+        raise ValueError("orjson is not installed")
+    _BACKEND["name"] = name
+
+
+def get_backend() -> str:
+    """Returns the name of the backend in use."""
+    return _BACKEND["name"]
+
+
+def dumps(obj) -> str:
+    """
+    Serializes an object to a JSON string with the selected backend.
+
+    Raises
+    ------
+    ValueError
+        If the object has a NaN or infinite float.
+
+    Examples
+    --------
+    >>> from core_utils.serializer import dumps
+    >>> dumps({"amount": Decimal("10.5")})
+
+    """
+    if _BACKEND["name"] == "orjson":
+        return _orjson_dumps(obj)
+    return _json_dumps(obj)
+
+
+def loads(value):
+    """Parses a JSON string or bytes with the selected backend, orjson reads integers wider than 64 bits as float."""
+    if _BACKEND["name"] == "orjson":
+        return orjson.loads(value)
+    return json.loads(value)
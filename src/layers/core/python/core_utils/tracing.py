@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+"""
+Selective X-Ray patching.
+
+Only the libraries listed in the TRACING_MODULES environment variable (comma separated) are patched, once per
+process, or the defaults of the layer when it is not set: core_utils patches DEFAULT_MODULES and db_utils
+botocore and psycopg2. The recording wrappers of botocore, requests and the dbapi2 cursors fall back to the plain
+call when the current segment is not sampled, the trace header is still propagated.
+
+A library is patched when it is first imported, not when the layer is, so neither the library nor the X-Ray SDK
+are loaded by the cold start of a function that does not use them.
+"""
+import importlib
+import os
+import threading
+
+import wrapt
+
+__all__ = [
+    "DEFAULT_MODULES",
+    "get_tracing_modules",
+    "is_sampled",
+    "patch_modules",
+]
+
+DEFAULT_MODULES = ("botocore", "requests")
+
+# library: module whose import triggers the patch. The clients are created through boto3, which has loaded the
+# botocore modules used by the X-Ray patch, the hook of a submodule runs before it is set on its package.
+IMPORT_POINTS = {
+    "botocore": "boto3",
+}
+
+_REGISTERED = set()
+_PATCHED = set()
+_LOCK = threading.Lock()
+
+
+def _call_original(wrapped, instance, args, kwargs):
+    # wrapped is the X-Ray wrapper, the undecorated callable sits right behind it.
+    return getattr(wrapped, "__wrapped__", wrapped)(*args, **kwargs)
+
+
+def _call_cursor(method):
+    def call(wrapped, instance, args, kwargs):
+        return getattr(instance.__wrapped__, method)(*args, **kwargs)
+
+    return call
+
+
+# library: [(module, attribute, call used when the segment is not sampled)]
+SAMPLED_ONLY_POINTS = {
+    "botocore": [("botocore.client", "BaseClient._make_api_call", _call_original)],
+    "requests": [("requests", "Session.request", _call_original)],
+    "psycopg2": [
+        ("aws_xray_sdk.ext.dbapi2", "XRayTracedCursor.execute", _call_cursor("execute")),
+        ("aws_xray_sdk.ext.dbapi2", "XRayTracedCursor.executemany", _call_cursor("executemany")),
+        ("aws_xray_sdk.ext.dbapi2", "XRayTracedCursor.callproc", _call_cursor("callproc")),
+    ],
+}
+
+
+def get_tracing_modules(default=DEFAULT_MODULES):
+    """
+    Returns the libraries to patch, read from the TRACING_MODULES environment variable.
+
+    Parameters
+    ----------
+    default : tuple
+        The libraries to patch when the variable is not set.
+
+    Returns
+    -------
+    tuple
+        The names of the libraries, default when the variable is not set and an empty tuple when it is set to
+        "none".
+
+    Examples
+    --------
+    >>> from core_utils.tracing import get_tracing_modules
+    >>> get_tracing_modules(("botocore", "psycopg2"))
+
+    """
+    value = os.getenv("TRACING_MODULES")
+    if value is None:
+        return tuple(default)
+    if value.strip().lower() == "none":
+        return ()
+    return tuple(module.strip() for module in value.split(",") if module.strip())
+
+
+def is_sampled():
+    """
+    Checks if the current trace entity is sampled, False when there is no active entity.
+
+    Examples
+    --------
+    >>> from core_utils.tracing import is_sampled
+    >>> is_sampled()
+
+    """
+    from aws_xray_sdk.core import xray_recorder
+
+    try:
+        return bool(xray_recorder.is_sampled())
+    except Exception:
+        return False
+
+
+def _sampled_only(call):
+    def wrapper(wrapped, instance, args, kwargs):
+        if is_sampled():
+            return wrapped(*args, **kwargs)
+        return call(wrapped, instance, args, kwargs)
+
+    return wrapper
+
+
+def _wrap_sampled_only(library):
+    for module_name, attribute, call in SAMPLED_ONLY_POINTS.get(library, []):
+        try:
+            module = importlib.import_module(module_name)
+        except ImportError:
+            continue
+        owner_name, method = attribute.split(".")
+        owner = getattr(module, owner_name)
+        marker = f"_sampled_only_{method}"
+        if getattr(owner, marker, False):
+            continue
+        wrapt.wrap_function_wrapper(module, attribute, _sampled_only(call))
+        setattr(owner, marker, True)
+
+
+def _patch(library, sampled_only):
+    def hook(module):
+        # An exception raised here would fail the import of the library.
+        try:
+            from aws_xray_sdk import global_sdk_config
+            from aws_xray_sdk.core import patch
+
+            with _LOCK:
+                if library in _PATCHED:
+                    return
+                patch([library], raise_errors=False)
+                if sampled_only and global_sdk_config.sdk_enabled():
+                    _wrap_sampled_only(library)
+                _PATCHED.add(library)
+        except Exception as e:
+            print(f"Unable to patch {library}: {e}")
+
+    return hook
+
+
+def patch_modules(modules=None, *, sampled_only=True):
+    """
+    Patches the given libraries for X-Ray tracing when they are first imported, the libraries already imported are
+    patched right away and the ones already registered by the process are skipped.
+
+    Nothing is patched when the DEVELOPER environment variable is set.
+
+    Parameters
+    ----------
+    modules : list
+        The libraries to patch, get_tracing_modules() by default.
+    sampled_only : bool
+        If True, the patched calls skip the X-Ray recording when the current segment is not sampled.
+
+    Returns
+    -------
+    list
+        The libraries registered by this call.
+
+    Examples
+    --------
+    >>> from core_utils.tracing import patch_modules
+    >>> patch_modules(["botocore"])
+
+    """
+    if os.getenv("DEVELOPER"):
+        return []
+    modules = get_tracing_modules() if modules is None else modules
+    with _LOCK:
+        pending = [module for module in modules if module not in _REGISTERED]
+        _REGISTERED.update(pending)
+    # Outside of the lock, the hook of an imported library runs right away.
+    for module in pending:
+        wrapt.register_post_import_hook(_patch(module, sampled_only), IMPORT_POINTS.get(module, module))
+    return pending
@@ -9,15 +9,14 @@ import datetime
 import json
 import random
 import tempfile
+import threading
 from decimal import Decimal
 from typing import Any, Union
 from uuid import UUID
 
 import core_utils.environment
-import pytz
-import requests
+from core_utils import serializer
 
-from aws_lambda_powertools import Logger
 from core_api.utils import (
     get_body,
     get_status_code,
@@ -71,6 +70,28 @@ class RoundOptions:
     round_method: str
     round_mask: str
 
+
+class _LazyLogger:
+    """Powertools Logger built on first use, importing aws_lambda_powertools takes tens of milliseconds."""
+
+    def __init__(self, properties):
+        self._properties = properties
+        self._logger = None
+        self._lock = threading.Lock()
+
+    def _get_logger(self):
+        if self._logger is None:
+            with self._lock:
+                if self._logger is None:
+                    from aws_lambda_powertools import Logger
+
+                    self._logger = Logger(**self._properties)
+        return self._logger
+
+    def __getattr__(self, name):
+        return getattr(self._get_logger(), name)
+
+
 def get_logger(name=None):
     """
     Returns a logger object.
@@ -82,6 +103,7 @@ def get_logger(name=None):
     Returns
     -------
     logger : Logger
+        A proxy of the Logger, built on its first use.
 
     Examples
     --------
@@ -95,7 +117,7 @@ def get_logger(name=None):
     )
     if name:
         properties.setdefault("service", name)
-    return Logger(**properties)
+    return _LazyLogger(properties)
 
 
 def get_mty_datetime():
@@ -112,6 +134,8 @@ def get_mty_datetime():
     >>> mty_datetime = get_mty_datetime()
 
     """
+    import pytz
+
     mty = pytz.timezone("America/Monterrey")
     return datetime.datetime.now(tz=mty)
 
@@ -354,7 +378,7 @@ def cast_python_default(data):
     >>> cast_python_default({"a": 1, "b": Decimal(1)})
 
     """
-    return json.loads(json.dumps(data, default=cast_default, ensure_ascii=False))
+    return serializer.normalize(data)
 
 
 def get_uniques_in_lists(iter_a, iter_b):
@@ -399,6 +423,8 @@ def get_date_by_timezone(timezone):
     >>> from core_utils.utils import get_date_by_timezone
     >>> tz_datetime = get_date_by_timezone(timezone)
     """
+    import pytz
+
     tz = pytz.timezone(timezone)
     return datetime.datetime.now(tz=tz)
 
@@ -481,6 +507,9 @@ def divide_chunks(list, n):
 
 
 def download_file(url, file_name, headers=""):
+    # requests is imported on first use, it takes a good part of the cold start otherwise.
+    import requests
+
     response = requests.get(url, headers=headers)
     f = tempfile.NamedTemporaryFile(suffix=file_name, delete=False)
     f.write(response.content)
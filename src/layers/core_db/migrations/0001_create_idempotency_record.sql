@@ -0,0 +1,12 @@
+-- Table of core_db.models.IdempotencyRecord, used by core_db.idempotency.IdempotencyStore.
+-- Run once per environment before deploying the functions that claim keys (request_p2p_transaction).
+CREATE SCHEMA IF NOT EXISTS p2p_schema;
+
+CREATE TABLE IF NOT EXISTS p2p_schema.idempotency_record (
+    key TEXT NOT NULL PRIMARY KEY,
+    status TEXT NOT NULL,
+    result JSON,
+    expires_at TIMESTAMP NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idempotencyrecord_expires_at ON p2p_schema.idempotency_record (expires_at);
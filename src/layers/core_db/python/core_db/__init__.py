@@ -1,4 +1,6 @@
 # -*- coding: utf-8 -*-
+import importlib
+
 from db_utils import (
     load_environment_variables,
 )
@@ -7,7 +9,19 @@ load_environment_variables()
 
 __all__ = [
     "base_model",
+    "connection",
     "decorators",
+    "idempotency",
     "models",
+    "rows",
+    "s3_import",
+    "sequences",
     "utils"
 ]
+
+
+def __getattr__(name):
+    # Submodules are imported on first access, so importing the package alone does not load them all.
+    if name in __all__:
+        return importlib.import_module(f"{__name__}.{name}")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,23 +1,38 @@
 # -*- coding: utf-8 -*-
+import itertools
+import re
+import time
 import uuid
-from collections import namedtuple
-from typing import Union
+from contextlib import contextmanager
+from decimal import Decimal
+from typing import Iterable, Union
 
+from core_db.connection import ConnectionManager, ReconnectPostgresqlDatabase
+from core_db.rows import compact_rows, row_type
+from db_utils.logger import get_logger
 from db_utils.params import ParametersDB
 from db_utils.app_params import ParametersApp
 
 from peewee import (
+    EXCLUDED,
+    Cast,
+    Function,
+    InterfaceError,
     Model,
-    PostgresqlDatabase,
     SelectBase,
+    Value,
     _ModelWriteQueryHelper,
     _WriteQuery,
     database_required,
     fn,
 )
 from psycopg2 import extensions
+from psycopg2.extras import Json
 
-__all__ = ["BaseModel", "database"]
+__all__ = ["BaseModel", "database", "connection_manager"]
+
+LAYER_NAME = "base-model"
+LOGGER = get_logger(f"layer-{LAYER_NAME}")
 
 PARAMETER_DB = ParametersDB()
 PARAMETER_APP = ParametersApp()
@@ -29,12 +44,12 @@ NAME_CONNECTION = f"{PARAMETER_APP.developer or PARAMETER_APP.lambda_name}"
 
 DB_NAME = PARAMETER_DB.name
 DB_USER = PARAMETER_DB.user
-DB_HOST = PARAMETER_DB.host
+DB_HOST = PARAMETER_DB.proxy_host or PARAMETER_DB.host
 DB_PORT = PARAMETER_DB.port
 DB_PASSWORD = PARAMETER_DB.password
 
 if PARAMETER_APP.developer == "DeployUnittest":
-    database = PostgresqlDatabase(
+    database = ReconnectPostgresqlDatabase(
         DB_NAME,
         user=DB_USER,
         password=DB_PASSWORD,
@@ -45,15 +60,28 @@ if PARAMETER_APP.developer == "DeployUnittest":
         application_name=NAME_CONNECTION
     )
 else:
-    database = PostgresqlDatabase(
+    database = ReconnectPostgresqlDatabase(
         DB_NAME, user=DB_USER, password=DB_PASSWORD, host=DB_HOST, port=DB_PORT, application_name=NAME_CONNECTION
     )
 
+# Behind an RDS Proxy the proxy keeps the server connections, so the connection is given back after every use.
+connection_manager = ConnectionManager(database, close_after_use=bool(PARAMETER_DB.proxy_host))
+
 DEFAULT_FALSE = "DEFAULT false"
 DEFAULT_NULL = "DEFAULT NULL::numeric"
 DEFAULT_DATE = "DEFAULT ('now'::text)::date"
 DEFAULT_TIMEZONE = "DEFAULT timezone('America/Los_angeles'::text, (now())::timestamp(0) without time zone)"
 
+# Rows fetched per round-trip by the server-side cursors of stream and stream_chunks.
+DEFAULT_ITERSIZE = 2000
+
+# Rows per INSERT statement of bulk_upsert.
+DEFAULT_UPSERT_BATCH_SIZE = 1000
+
+# Options of aws_s3.table_import_from_s3, the same as COPY's.
+DEFAULT_IMPORT_OPTIONS = "(format csv, HEADER true)"
+IMPORTED_ROWS = re.compile(r"^(\d+) rows? imported")
+
 
 class UnknownField(object):
     def __init__(self, *_, **__):
@@ -75,15 +103,102 @@ def single_object(self, database):
     self._cursor_wrapper = None
     try:
         result = self.execute(database)[0]
-        return namedtuple(f"single_object{uuid.uuid4().hex}", result.keys())(
-            *result.values()
-        )
+        return row_type(tuple(result.keys()))(*result.values())
     except IndexError:
         raise self.DoesNotExist()
 
 
+def many_objects(self, itersize: int = None, *, database=None):
+    """Yield the rows of the query as compact namedtuples, one class per set of columns shared by every call.
+
+    Rows are converted while they are read, from a server-side cursor fetching itersize rows per round-trip when
+    itersize is given.
+    """
+    database = _bound_database(self, database, "many_objects")
+    query = self.tuples()
+    if itersize is None:
+        wrapper = query.execute(database)
+        yield from _compact(wrapper, wrapper.iterator())
+    else:
+        with _server_side(query, database, itersize) as wrapper:
+            yield from _compact(wrapper, wrapper.iterator())
+
+
+def _bound_database(query, database, name):
+    # Unlike database_required, the database is keyword-only so the first positional argument is the size.
+    database = query._database if database is None else database
+    if not database:
+        raise InterfaceError(f'Query must be bound to a database in order to call "{name}".')
+    return database
+
+
+def _compact(wrapper, rows):
+    # The columns are known once the wrapper read the first row.
+    first = next(rows, None)
+    if first is not None:
+        yield from compact_rows(wrapper.columns, itertools.chain((first,), rows))
+
+
+class _StreamingCursor:
+    """Named cursor seen by peewee's cursor wrappers, rows come from its iterator so itersize rows travel per fetch."""
+
+    def __init__(self, cursor):
+        self.cursor = cursor
+        self.rows = iter(cursor)
+
+    @property
+    def description(self):
+        return self.cursor.description
+
+    def fetchone(self):
+        return next(self.rows, None)
+
+    def close(self):
+        self.cursor.close()
+
+
+@contextmanager
+def _server_side(query, database, itersize):
+    sql, params = database.get_sql_context().sql(query).query()
+    with database.atomic():
+        cursor = database.connection().cursor(name=f"stream_{uuid.uuid4().hex}")
+        cursor.itersize = itersize
+        try:
+            cursor.execute(sql, params)
+            yield query._get_cursor_wrapper(_StreamingCursor(cursor))
+        finally:
+            if not cursor.closed:
+                cursor.close()
+
+
+def stream(self, itersize: int = DEFAULT_ITERSIZE, *, database=None):
+    """Yield the rows of the query lazily from a server-side cursor, fetching itersize rows per round-trip.
+
+    Rows are model instances, dicts, tuples or namedtuples as selected with ``.dicts()``, ``.tuples()``, etc. The
+    cursor lives inside a transaction that stays open until the generator is exhausted or closed.
+    """
+    database = _bound_database(self, database, "stream")
+    with _server_side(self, database, itersize) as wrapper:
+        yield from wrapper.iterator()
+
+
+def stream_chunks(self, size: int = DEFAULT_ITERSIZE, itersize: int = None, *, database=None):
+    """Yield the rows of the query in lists of up to size rows, read from a server-side cursor like stream."""
+    chunk = []
+    for row in stream(self, itersize or size, database=database):
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
 setattr(SelectBase, "get_all", get_all)
 setattr(SelectBase, "single_object", single_object)
+setattr(SelectBase, "many_objects", many_objects)
+setattr(SelectBase, "stream", stream)
+setattr(SelectBase, "stream_chunks", stream_chunks)
 
 
 class BaseModel(Model):
@@ -109,10 +224,88 @@ class BaseModel(Model):
         return column
 
     @classmethod
-    def table_import_from_s3(cls, bucket_from_event, s3_key, region, fields):
+    def table_import_from_s3(cls, bucket_from_event, s3_key, region, fields, table_name=None,
+                             options=DEFAULT_IMPORT_OPTIONS):
+        """Query importing a CSV object of S3 with aws_s3.table_import_from_s3, executing it returns the rows imported.
+
+        table_name loads another table with the same columns, like a staging table, instead of the model's.
+        """
         if not fields:
             fields = cls._meta.sorted_fields
-        return ModelTableImport(cls, bucket_from_event, s3_key, region, fields)
+        return ModelTableImport(cls, bucket_from_event, s3_key, region, fields, table_name=table_name, options=options)
+
+    @classmethod
+    def bulk_upsert(cls, rows: Iterable, conflict_target, update_fields=None,
+                    batch_size: int = DEFAULT_UPSERT_BATCH_SIZE) -> int:
+        """Insert the rows with multi-row ``INSERT ... ON CONFLICT`` statements of up to batch_size rows.
+
+        Rows are dicts of field names or model instances, read lazily. The rows that conflict on conflict_target
+        get the update_fields of the new row, or are skipped when there are no update_fields. Returns the number of
+        rows inserted or updated.
+        """
+        conflict_target = [cls._meta.fields[f] if isinstance(f, str) else f for f in conflict_target]
+        update_fields = [cls._meta.fields[f] if isinstance(f, str) else f for f in update_fields or []]
+        rows = iter(rows)
+        started = time.perf_counter()
+        total = 0
+        while True:
+            batch = [row.__data__ if isinstance(row, Model) else row for row in itertools.islice(rows, batch_size)]
+            if not batch:
+                break
+            query = cls.insert_many(batch)
+            if update_fields:
+                query = query.on_conflict(
+                    conflict_target=conflict_target, update={f: getattr(EXCLUDED, f.column_name) for f in update_fields}
+                )
+            else:
+                query = query.on_conflict(conflict_target=conflict_target, action="IGNORE")
+            total += query.as_rowcount().execute()
+        _log_throughput("bulk_upsert", cls, total, started)
+        return total
+
+    @classmethod
+    def copy_from(cls, rows: Iterable, fields=None) -> int:
+        """Load the rows with ``COPY ... FROM STDIN``, streamed from the iterable as they are read by psycopg2.
+
+        Rows are dicts of field names, model instances or tuples in the order of fields. fields defaults to the
+        fields set in the first dict or model instance, so the columns left out keep their server default, and to
+        every field but an auto-increment primary key for tuples. A field missing from a later row gets its peewee
+        default, like ``insert_many``. Nothing is upserted, a duplicate key fails the whole copy. Returns the number
+        of rows copied.
+        """
+        rows = iter(rows)
+        first = next(rows, None)
+        if first is not None:
+            rows = itertools.chain([first], rows)
+        if fields is None and isinstance(first, dict):
+            fields = [cls._meta.fields[name] for name in first]
+        elif fields is None and isinstance(first, Model):
+            fields = [f for f in cls._meta.sorted_fields if f.name in first.__data__]
+        elif fields is None:
+            fields = [f for f in cls._meta.sorted_fields if not (cls._meta.auto_increment and f.primary_key)]
+        else:
+            fields = [cls._meta.fields[f] if isinstance(f, str) else f for f in fields]
+        columns = ", ".join(f'"{f.column_name}"' for f in fields)
+        table = f'"{cls._meta.schema}"."{cls._meta.table_name}"' if cls._meta.schema else f'"{cls._meta.table_name}"'
+        started = time.perf_counter()
+        model_database = cls._meta.database
+        with model_database.atomic():
+            cursor = model_database.cursor()
+            cursor.copy_expert(
+                f"COPY {table} ({columns}) FROM STDIN WITH (FORMAT csv)", _CopyStream(_copy_lines(rows, fields))
+            )
+            total = cursor.rowcount
+        _log_throughput("copy_from", cls, total, started)
+        return total
+
+    @classmethod
+    def get_by_ids(cls, ids):
+        """Load several rows with a single ``WHERE pk IN (...)`` select, keyed by primary key."""
+        ids = [_id for _id in set(ids) if _id is not None]
+        if not ids:
+            return {}
+        primary_key = cls._meta.primary_key
+        return {row.get_id(): row for row in cls.select().where(primary_key.in_(ids))}
 
     @classmethod
     def next_val(cls, sequence: str):
@@ -120,8 +313,88 @@ class BaseModel(Model):
             database.execute_sql("SELECT (nextval( %s ));", params=(sequence,))
         )[0]
 
+    @classmethod
+    def next_vals(cls, sequence: str, n: int):
+        """Reserve n values of the sequence with a single round-trip, in the order they were generated."""
+        if n <= 0:
+            return []
+        cursor = database.execute_sql(
+            "SELECT nextval( %s ) FROM generate_series(1, %s);", params=(sequence, n)
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+    def save(self, force_insert=False, only=None):
+        """Save the fields assigned since the row was loaded or last saved, a save without changes runs no query.
+
+        Rows that are not in the database yet are inserted with all their fields. Values mutated in place, like the
+        dict of a JSONField, are not seen as changes: assign them again or pass ``only``.
+        """
+        if self._meta.primary_key is False or self._pk is None:
+            force_insert = True
+        return super().save(force_insert=force_insert, only=only)
+
     class Meta:
         database = database
+        only_save_dirty = True
+
+
+def _log_throughput(operation, model, total, started):
+    elapsed = time.perf_counter() - started
+    LOGGER.info(
+        f"{operation} wrote {total} rows of {model._meta.table_name} in {elapsed:.3f}s"
+        f" ({total / elapsed if elapsed else 0:.0f} rows/s)"
+    )
+
+
+def _copy_value(value) -> str:
+    # CSV for COPY: NULL is an unquoted empty value, every other value but the numbers is quoted.
+    if value is None:
+        return ""
+    if isinstance(value, (int, float, Decimal)) and not isinstance(value, bool):
+        return str(value)
+    if isinstance(value, Cast):
+        # JSON fields wrap their value in a cast, COPY converts the text to the column type by itself.
+        value = value.node
+    if isinstance(value, Json):
+        value = value.dumps(value.adapted)
+    value = str(value)
+    return '"' + value.replace('"', '""') + '"'
+
+
+def _field_default(field):
+    return field.default() if callable(field.default) else field.default
+
+
+def _copy_lines(rows, fields):
+    names = [f.name for f in fields]
+    for row in rows:
+        if isinstance(row, Model):
+            row = row.__data__
+        if isinstance(row, dict):
+            values = [row[name] if name in row else _field_default(field) for name, field in zip(names, fields)]
+        else:
+            values = row
+        yield ",".join(_copy_value(field.db_value(value)) for field, value in zip(fields, values)) + "\n"
+
+
+class _CopyStream:
+    """File-like object read by copy_expert, the lines are produced only when psycopg2 asks for more data."""
+
+    def __init__(self, lines):
+        self.lines = lines
+        self.buffer = ""
+
+    def read(self, size=-1):
+        while size < 0 or len(self.buffer) < size:
+            line = next(self.lines, None)
+            if line is None:
+                break
+            self.buffer += line
+        if size < 0:
+            data, self.buffer = self.buffer, ""
+        else:
+            data, self.buffer = self.buffer[:size], self.buffer[size:]
+        return data
 
 
 class TableImport(_WriteQuery):
@@ -133,18 +406,25 @@ class TableImport(_WriteQuery):
         super(TableImport, self).__init__(table, **kwargs)
 
     def __sql__(self, ctx):
-        fields = " , ".join([f for f in self.fields])
         super(TableImport, self).__sql__(ctx)
-        ctx.literal("select aws_s3.table_import_from_s3")
-        ctx.literal(f"('{self.model._meta.schema}.{self.model._meta.table_name}',")
-        ctx.literal(f"'{fields}',")
-        ctx.literal("'(format csv , HEADER true)',")
-        ctx.literal(
-            f"aws_commons.create_s3_uri('{self.bucket}', '{self.s3_key}', '{self.region}'))"
+        fields = ",".join(f if isinstance(f, str) else f.column_name for f in self.fields)
+        table_name = self.table_name or (
+            f"{self.model._meta.schema}.{self.model._meta.table_name}" if self.model._meta.schema
+            else self.model._meta.table_name
+        )
+        # Every value is bound as a parameter.
+        s3_uri = Function("aws_commons.create_s3_uri", (Value(self.bucket), Value(self.s3_key), Value(self.region)))
+        ctx.literal("SELECT ").sql(
+            Function("aws_s3.table_import_from_s3", (Value(table_name), Value(fields), Value(self.options), s3_uri))
         )
-
         return ctx
 
+    def handle_result(self, database, cursor):
+        # The function reports "<n> rows imported into relation ..." as its only value.
+        row = cursor.fetchone()
+        match = IMPORTED_ROWS.match(row[0]) if row and row[0] else None
+        return int(match.group(1)) if match else 0
+
     def _execute(self, database):
         try:
             return super(TableImport, self)._execute(database)
@@ -153,10 +433,13 @@ class TableImport(_WriteQuery):
 
 
 class ModelTableImport(_ModelWriteQueryHelper, TableImport):
-    def __init__(self, model, bucket, s3_key, region, fields, *args, **kwargs):
+    def __init__(self, model, bucket, s3_key, region, fields, *args, table_name=None,
+                 options=DEFAULT_IMPORT_OPTIONS, **kwargs):
         self.bucket = bucket
         self.s3_key = s3_key
         self.region = region
         self.fields = fields
+        self.table_name = table_name
+        self.options = options
 
         super(ModelTableImport, self).__init__(model, *args, **kwargs)
@@ -0,0 +1,252 @@
+# -*- coding: utf-8 -*-
+"""
+Lifecycle of the database connection across warm Lambda invocations.
+"""
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+import psycopg2
+from db_utils.logger import get_logger
+from peewee import (
+    InterfaceError,
+    OperationalError,
+    PostgresqlDatabase,
+)
+from playhouse.shortcuts import ReconnectMixin
+
+__all__ = ["ReconnectPostgresqlDatabase", "ConnectionManager"]
+
+LAYER_NAME = "connection"
+LOGGER = get_logger(f"layer-{LAYER_NAME}")
+
+
+class ReconnectPostgresqlDatabase(ReconnectMixin, PostgresqlDatabase):
+    """PostgresqlDatabase that reopens the connection when a statement outside a transaction finds it dropped."""
+
+    reconnect_errors = (
+        (OperationalError, "server closed the connection"),
+        (OperationalError, "terminating connection"),
+        (OperationalError, "could not receive data from server"),
+        (OperationalError, "ssl connection has been closed"),
+        (InterfaceError, "connection already closed"),
+    )
+
+
+class ConnectionManager:
+    """
+    Keeps one connection open between warm invocations and decides when it has to be replaced.
+
+    Parameters
+    ----------
+    database : peewee.Database
+        The database whose connection is managed.
+    max_age : int
+        Seconds after which the connection is replaced even if it is healthy.
+    max_idle : int
+        Seconds without use after which close_idle closes the connection.
+    health_check_after : int
+        Seconds without use after which the connection is checked with a "SELECT 1" before reusing it.
+    retries : int
+        Number of times a failed connect is retried.
+    backoff : float
+        Seconds to wait before the first retry, doubled on every retry.
+    close_after_use : bool
+        If True the connection is closed when released. Use it behind an RDS Proxy endpoint, the proxy pools
+        the server connections so holding one between invocations only takes a slot from max_connections.
+    pool_size : int
+        Connections of the worker threads kept open to be reused by the next workers.
+
+    Examples
+    --------
+    >>> from core_db.base_model import connection_manager
+    >>> @connection_manager.managed
+    ... def lambda_handler(event, context):
+    ...     pass
+    >>> with connection_manager.worker():  # in a worker thread
+    ...     pass
+    """
+
+    def __init__(self, database, *, max_age: int = 900, max_idle: int = 300, health_check_after: int = 30,
+                 retries: int = 3, backoff: float = 0.1, close_after_use: bool = False, pool_size: int = 4):
+        self.database = database
+        self.max_age = max_age
+        self.max_idle = max_idle
+        self.health_check_after = health_check_after
+        self.retries = retries
+        self.backoff = backoff
+        self.close_after_use = close_after_use
+        self._connected_at = None
+        self._last_used = None
+        self.pool_size = pool_size
+        self._pool = []
+        self._pool_lock = threading.Lock()
+
+    @property
+    def age(self):
+        return None if self._connected_at is None else time.monotonic() - self._connected_at
+
+    @property
+    def idle(self):
+        return None if self._last_used is None else time.monotonic() - self._last_used
+
+    def is_healthy(self) -> bool:
+        """Checks the open connection with a round-trip, without reconnecting."""
+        conn = self.database._state.conn
+        if conn is None or conn.closed:
+            return False
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+                cursor.fetchone()
+            if not self.database.in_transaction():
+                conn.rollback()
+        except psycopg2.Error:
+            return False
+        return True
+
+    def acquire(self):
+        """
+        Returns an open connection, reusing the current one when it is still valid.
+
+        Raises
+        ------
+        peewee.OperationalError
+            If a new connection could not be opened after the retries.
+        """
+        if not self.database.is_closed():
+            if self.age is not None and self.age > self.max_age:
+                LOGGER.info("Replacing connection that reached its max age")
+                self.close()
+            elif self.idle is not None and self.idle > self.health_check_after and not self.is_healthy():
+                LOGGER.warning("Replacing stale connection")
+                self.close()
+        if self.database.is_closed():
+            self.__connect()
+        self._last_used = time.monotonic()
+        return self.database.connection()
+
+    def release(self):
+        """Marks the end of a unit of work, closing the connection when it should not be kept."""
+        self._last_used = time.monotonic()
+        if self.close_after_use or (self.age is not None and self.age > self.max_age):
+            self.close()
+
+    def close_idle(self) -> bool:
+        """Idle-close hook, closes the connection if it has not been used for max_idle seconds."""
+        if self.database.is_closed() or self.idle is None or self.idle <= self.max_idle:
+            return False
+        LOGGER.info("Closing idle connection")
+        self.close()
+        self.close_pool()
+        return True
+
+    def close(self):
+        try:
+            if not self.database.is_closed():
+                self.database.close()
+        except (OperationalError, InterfaceError) as error:
+            LOGGER.warning(f"Error closing the connection: {error}")
+            self.database._state.reset()
+        self._connected_at = None
+
+    def close_pool(self):
+        """Closes the connections kept for the worker threads."""
+        with self._pool_lock:
+            pool, self._pool = self._pool, []
+        for conn, _ in pool:
+            self.__discard(conn)
+
+    @contextmanager
+    def worker(self):
+        """
+        Binds a connection of its own to the current thread for the duration of the block.
+
+        peewee keeps the connection per thread, so every worker thread of a batch needs one. The connection is taken
+        from the pool when there is one younger than max_age, and on exit it is rolled back and put back in the pool
+        or closed when the pool is full or close_after_use is set.
+
+        Raises
+        ------
+        RuntimeError
+            If the thread already has an open connection, e.g. the main thread of a managed handler.
+        peewee.OperationalError
+            If a new connection could not be opened after the retries.
+        """
+        if not self.database.is_closed():
+            raise RuntimeError("The thread already has an open connection")
+        conn, connected_at = self.__take_pooled()
+        if conn is None:
+            self.__open()
+            connected_at = time.monotonic()
+        else:
+            self.database._state.set_connection(conn)
+        try:
+            yield self.database.connection()
+        finally:
+            conn = self.database._state.conn
+            # Unbinds the connection without closing it.
+            self.database._state.reset()
+            if conn is not None:
+                self.__give_back(conn, connected_at)
+
+    def managed(self, function):
+        """Decorator that acquires the connection before the function and releases it afterwards."""
+
+        @wraps(function)
+        def decorator(*args, **kwargs):
+            self.close_idle()
+            self.acquire()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.release()
+
+        return decorator
+
+    def __take_pooled(self):
+        with self._pool_lock:
+            while self._pool:
+                conn, connected_at = self._pool.pop()
+                if not conn.closed and time.monotonic() - connected_at <= self.max_age:
+                    return conn, connected_at
+                self.__discard(conn)
+        return None, None
+
+    def __give_back(self, conn, connected_at):
+        try:
+            conn.rollback()
+        except psycopg2.Error:
+            self.__discard(conn)
+            return
+        with self._pool_lock:
+            if (not self.close_after_use and not conn.closed and len(self._pool) < self.pool_size
+                    and time.monotonic() - connected_at <= self.max_age):
+                self._pool.append((conn, connected_at))
+                return
+        self.__discard(conn)
+
+    @staticmethod
+    def __discard(conn):
+        try:
+            conn.close()
+        except psycopg2.Error as error:
+            LOGGER.warning(f"Error closing the connection: {error}")
+
+    def __connect(self):
+        self.__open()
+        self._connected_at = time.monotonic()
+
+    def __open(self):
+        for attempt in range(self.retries + 1):
+            try:
+                self.database.connect(reuse_if_open=True)
+            except OperationalError as error:
+                if attempt == self.retries:
+                    raise
+                wait = self.backoff * 2 ** attempt
+                LOGGER.warning(f"Connection attempt {attempt + 1} failed, retrying in {wait}s: {error}")
+                time.sleep(wait)
+            else:
+                return
@@ -0,0 +1,231 @@
+# -*- coding: utf-8 -*-
+"""
+Idempotency store for the messages that can be delivered more than once.
+
+A key is claimed as IN_PROGRESS before its work starts and marked COMPLETED with the result once it is done, both
+states expire after a TTL so a crashed invocation does not block the key forever. The completed results are also
+kept in an in-memory LRU, a duplicate seen again by the same warm container is answered without a query.
+
+The records live in the IdempotencyRecord table, created by layers/core_db/migrations/0001_create_idempotency_record.sql
+before the functions using the store are deployed.
+"""
+import datetime
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from typing import Any, Dict, Hashable, Iterable
+
+from core_db.models import IdempotencyRecord
+from db_utils.enum import IdempotencyStatusEnum
+from db_utils.logger import get_logger
+
+__all__ = ["Claim", "IdempotencyStore"]
+
+LAYER_NAME = "idempotency"
+LOGGER = get_logger(f"layer-{LAYER_NAME}")
+
+Claim = namedtuple("Claim", ["claimed", "status", "result"])
+Claim.__doc__ = """
+State of a key after IdempotencyStore.begin.
+
+claimed is True when the caller owns the key and has to do the work, otherwise status tells if another invocation
+is doing it (IN_PROGRESS) or already did it (COMPLETED, with its result).
+"""
+
+
+def _utcnow():
+    return datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+
+
+class _LRUCache:
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            if item[1] <= time.monotonic():
+                del self._items[key]
+                return None
+            self._items.move_to_end(key)
+            return item
+
+    def put(self, key, value, expires_at: float):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._items[key] = (value, expires_at)
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+
+class IdempotencyStore:
+    """
+    Claims keys before their work starts and keeps the result of the completed ones.
+
+    Every method takes the keys of a whole batch and runs one statement, outside of any transaction of the caller
+    the claims are committed right away and visible to the other invocations.
+
+    Parameters
+    ----------
+    namespace : str
+        Prefix of the stored keys, so several processes can use the same ids.
+    model : peewee.Model
+        The table of the records, IdempotencyRecord by default.
+    ttl : int
+        Seconds a completed result is kept.
+    in_progress_ttl : int
+        Seconds after which a claim that was never completed can be taken again, about the lambda timeout so a
+        crashed invocation only blocks the redeliveries of its messages until it would have timed out anyway.
+    cache_size : int
+        Completed results kept in memory, 0 disables the cache.
+
+    Examples
+    --------
+    >>> from core_db.idempotency import IdempotencyStore
+    >>> store = IdempotencyStore("request_p2p_transaction")
+    >>> claims = store.begin([8, 9])
+    >>> store.complete({8: {"status": "done"}})
+    >>> store.release([9])
+    """
+
+    def __init__(self, namespace: str, *, model=IdempotencyRecord, ttl: int = 3600, in_progress_ttl: int = 30,
+                 cache_size: int = 1024):
+        self.namespace = namespace
+        self.model = model
+        self.ttl = ttl
+        self.in_progress_ttl = in_progress_ttl
+        self.cache = _LRUCache(cache_size)
+
+    def begin(self, keys: Iterable[Hashable]) -> Dict[Hashable, Claim]:
+        """
+        Claims the keys that are not in progress or completed.
+
+        Parameters
+        ----------
+        keys : iterable
+            The keys of the batch, repeated keys are claimed once.
+
+        Returns
+        -------
+        dict
+            The Claim of every key.
+        """
+        claims = {}
+        pending = {}
+        for key in keys:
+            if key in claims or key in pending:
+                continue
+            cached = self.cache.get(self.__key(key))
+            if cached is not None:
+                claims[key] = Claim(False, IdempotencyStatusEnum.COMPLETED, cached[0])
+            else:
+                pending[self.__key(key)] = key
+        if not pending:
+            return claims
+
+        model = self.model
+        now = _utcnow()
+        expires_at = now + datetime.timedelta(seconds=self.in_progress_ttl)
+        rows = [
+            {model.key: stored, model.status: IdempotencyStatusEnum.IN_PROGRESS.value, model.expires_at: expires_at}
+            for stored in pending
+        ]
+        # An existing record is only taken over once it expired.
+        query = (
+            model.insert_many(rows)
+            .on_conflict(
+                conflict_target=[model.key],
+                preserve=[model.status, model.expires_at],
+                update={model.result: None},
+                where=(model.expires_at <= now),
+            )
+            .returning(model.key)
+        )
+        claimed = {row.key for row in query.execute()}
+        for stored in claimed:
+            claims[pending.pop(stored)] = Claim(True, IdempotencyStatusEnum.IN_PROGRESS, None)
+        if not pending:
+            return claims
+
+        for record in model.select().where(model.key.in_(list(pending))):
+            key = pending.pop(record.key)
+            status = IdempotencyStatusEnum(record.status)
+            claims[key] = Claim(False, status, record.result)
+            if status is IdempotencyStatusEnum.COMPLETED:
+                self.__cache(record.key, record.result, record.expires_at, now)
+        # Records deleted in between, they are retried later rather than claimed twice.
+        for key in pending.values():
+            claims[key] = Claim(False, IdempotencyStatusEnum.IN_PROGRESS, None)
+        return claims
+
+    def complete(self, results: Dict[Hashable, Any]):
+        """
+        Marks the claimed keys as completed and keeps their results for ttl seconds.
+
+        Parameters
+        ----------
+        results : dict
+            The JSON serializable result of every key.
+        """
+        if not results:
+            return
+        model = self.model
+        now = _utcnow()
+        expires_at = now + datetime.timedelta(seconds=self.ttl)
+        rows = [
+            {
+                model.key: self.__key(key),
+                model.status: IdempotencyStatusEnum.COMPLETED.value,
+                model.result: result,
+                model.expires_at: expires_at,
+            }
+            for key, result in results.items()
+        ]
+        model.insert_many(rows).on_conflict(
+            conflict_target=[model.key],
+            preserve=[model.status, model.result, model.expires_at],
+        ).execute()
+        for key, result in results.items():
+            self.__cache(self.__key(key), result, expires_at, now)
+
+    def release(self, keys: Iterable[Hashable]) -> int:
+        """
+        Drops the claims of keys whose work failed, so the next delivery can claim them again.
+
+        Returns
+        -------
+        int
+            The number of claims dropped.
+        """
+        stored = list({self.__key(key) for key in keys})
+        if not stored:
+            return 0
+        model = self.model
+        return (
+            model.delete()
+            .where(model.key.in_(stored) & (model.status == IdempotencyStatusEnum.IN_PROGRESS.value))
+            .execute()
+        )
+
+    def purge_expired(self) -> int:
+        """Deletes the expired records, returns how many were deleted."""
+        model = self.model
+        deleted = model.delete().where(model.expires_at <= _utcnow()).execute()
+        LOGGER.info(f"Purged {deleted} expired idempotency records")
+        return deleted
+
+    def __key(self, key) -> str:
+        return f"{self.namespace}:{key}"
+
+    def __cache(self, stored: str, result, expires_at: datetime.datetime, now: datetime.datetime):
+        self.cache.put(stored, result, time.monotonic() + (expires_at - now).total_seconds())
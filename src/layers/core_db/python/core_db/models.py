@@ -1,6 +1,8 @@
 # -*- coding: utf-8 -*-
+from typing import Iterable, List
+
 from core_db.base_model import BaseModel
-from peewee import (SQL, AutoField, BigAutoField, BigIntegerField,
+from peewee import (SQL, Value, fn, AutoField, BigAutoField, BigIntegerField,
                     BooleanField, CharField, CompositeKey, DateField,
                     DateTimeField, DecimalField, DoubleField, ForeignKeyField,
                     IntegerField, TextField, UUIDField, SmallIntegerField)
@@ -14,6 +16,7 @@ UTC_NOW = "DEFAULT timezone('UTC'::text, now())"
 
 __all__ = [
     "P2Ptransaction",
+    "IdempotencyRecord",
 ]
 
 
@@ -25,7 +28,35 @@ class P2Ptransaction(BaseModel):
     status = TextField(null=False)
     created_at = DateTimeField()
 
+    @classmethod
+    def transition(cls, ids: Iterable[int], from_status: str, to_status: str) -> List["P2Ptransaction"]:
+        """Move the transactions still in from_status to to_status with one conditional ``UPDATE ... RETURNING``.
+
+        The transactions in any other status are left untouched, so concurrent consumers can't apply the same
+        transition twice. Returns the updated rows, the ids missing from them were not found or not in from_status.
+        """
+        ids = [cls.id.db_value(_id) for _id in set(ids) if _id is not None]
+        if not ids:
+            return []
+        # Bound as a single array parameter, the statement is the same whatever the number of ids.
+        query = (
+            cls.update(status=to_status)
+            .where((cls.id == fn.ANY(Value(ids, converter=False, unpack=False))) & (cls.status == from_status))
+            .returning(cls)
+        )
+        return list(query.execute())
+
     class Meta:
         table_name = "p2p_transaction"
         schema = "p2p_schema"
 
+
+class IdempotencyRecord(BaseModel):
+    key = TextField(primary_key=True)
+    status = TextField(null=False)
+    result = JSONField(null=True)
+    expires_at = DateTimeField(null=False, index=True)
+
+    class Meta:
+        table_name = "idempotency_record"
+        schema = "p2p_schema"
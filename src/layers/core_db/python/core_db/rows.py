@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+"""
+Compact row types for query results.
+
+A namedtuple class is created once per tuple of column names and reused by every row with the same columns, the
+rows are tuples without a per instance __dict__.
+"""
+from collections import namedtuple
+from functools import lru_cache
+from typing import Iterable, Iterator, Tuple
+
+__all__ = ["row_type", "compact_rows"]
+
+ROW_TYPES_CACHE_SIZE = 256
+
+
+@lru_cache(maxsize=ROW_TYPES_CACHE_SIZE)
+def row_type(columns: Tuple[str, ...]):
+    """
+    Returns the namedtuple class of the rows with the given columns, created on the first call.
+
+    Parameters
+    ----------
+    columns : tuple
+        The column names, in the order of the values.
+
+    Examples
+    --------
+    >>> from core_db.rows import row_type
+    >>> row_type(("id", "status"))(8, "done")
+    """
+    return namedtuple("Row", columns)
+
+
+def compact_rows(columns: Iterable[str], rows: Iterable[tuple]) -> Iterator[tuple]:
+    """
+    Yields every tuple of values as a row of row_type(columns).
+
+    Examples
+    --------
+    >>> from core_db.rows import compact_rows
+    >>> list(compact_rows(["id", "status"], [(8, "done"), (9, "failure")]))
+    """
+    make = row_type(tuple(columns))._make
+    for values in rows:
+        yield make(values)
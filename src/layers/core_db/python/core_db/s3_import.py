@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+"""
+Parallel imports of S3 objects with aws_s3.table_import_from_s3.
+
+The objects are split in partitions, every partition is imported by its own thread and connection into an unlogged
+staging table, and the staging tables are merged into the model's table in one transaction. A failed partition
+leaves the table untouched.
+"""
+import time
+import uuid
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, List
+
+from core_db.base_model import DEFAULT_IMPORT_OPTIONS, connection_manager, database
+from db_utils.logger import get_logger
+from peewee import SQL, Column, Entity, NodeList, Table
+
+__all__ = ["PartitionResult", "ImportResult", "partition_keys", "import_from_s3"]
+
+LAYER_NAME = "s3-import"
+LOGGER = get_logger(f"layer-{LAYER_NAME}")
+
+PartitionResult = namedtuple("PartitionResult", ["partition", "keys", "rows", "seconds"])
+ImportResult = namedtuple("ImportResult", ["rows", "partitions"])
+
+
+def partition_keys(keys: Iterable[str], partitions: int) -> List[List[str]]:
+    """
+    Splits the keys in up to partitions lists, dealt in turns so the partitions get keys of every part of the prefix.
+
+    Examples
+    --------
+    >>> from core_db.s3_import import partition_keys
+    >>> partition_keys(["a", "b", "c"], 2)
+    [['a', 'c'], ['b']]
+    """
+    keys = list(keys)
+    partitions = max(1, min(partitions, len(keys)))
+    return [keys[i::partitions] for i in range(partitions)] if keys else []
+
+
+def import_from_s3(model, bucket: str, keys: Iterable[str], region: str, fields=None, *, partitions: int = None,
+                   max_workers: int = 4, options: str = DEFAULT_IMPORT_OPTIONS) -> ImportResult:
+    """
+    Imports the CSV objects into the table of the model, several at a time.
+
+    Parameters
+    ----------
+    model : BaseModel
+        The model of the table to load.
+    bucket : str
+        The bucket of the objects.
+    keys : iterable
+        The keys of the objects, core_aws.s3.list_object_keys(bucket, prefix) lists the ones under a prefix.
+    region : str
+        The region of the bucket.
+    fields : list
+        The columns of the objects, every field of the model by default.
+    partitions : int
+        The number of staging tables, max_workers by default.
+    max_workers : int
+        The imports running at the same time, each one holds a connection.
+    options : str
+        The COPY options of the objects.
+
+    Returns
+    -------
+    ImportResult
+        The rows merged and the PartitionResult of every partition.
+
+    Raises
+    ------
+    Exception
+        The first error of the partitions, nothing is merged then.
+
+    Examples
+    --------
+    >>> from core_aws.s3 import list_object_keys
+    >>> from core_db.s3_import import import_from_s3
+    >>> import_from_s3(P2Ptransaction, bucket, list_object_keys(bucket, "backfill/"), "us-east-1")
+    """
+    groups = partition_keys(keys, partitions or max_workers)
+    if not groups:
+        return ImportResult(0, [])
+    fields = fields or model._meta.sorted_fields
+    fields = [model._meta.fields[f] if isinstance(f, str) else f for f in fields]
+    schema, table = model._meta.schema, model._meta.table_name
+    stages = [f"{table}_stage_{uuid.uuid4().hex[:8]}_{n}" for n in range(len(groups))]
+
+    def load(partition):
+        started = time.perf_counter()
+        stage = stages[partition]
+        rows = 0
+        with connection_manager.worker():
+            database.execute(NodeList((
+                SQL("CREATE UNLOGGED TABLE"), Entity(*filter(None, (schema, stage))),
+                SQL("(LIKE"), Entity(*filter(None, (schema, table))), SQL("INCLUDING DEFAULTS)"),
+            )))
+            for key in groups[partition]:
+                rows += model.table_import_from_s3(
+                    bucket, key, region, fields, table_name=".".join(filter(None, (schema, stage))), options=options
+                ).execute()
+        result = PartitionResult(partition, len(groups[partition]), rows, time.perf_counter() - started)
+        LOGGER.info(f"Partition {partition} imported {rows} rows from {result.keys} objects in {result.seconds:.1f}s")
+        return result
+
+    try:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(groups)), thread_name_prefix="s3-import") as pool:
+            futures = [pool.submit(load, partition) for partition in range(len(groups))]
+        results = [future.result() for future in futures]
+        with database.atomic():
+            for stage in stages:
+                source = Table(stage, schema=schema)
+                model.insert_from(source.select(*[Column(source, f.column_name) for f in fields]), fields).execute()
+    finally:
+        for stage in stages:
+            database.execute(NodeList((SQL("DROP TABLE IF EXISTS"), Entity(*filter(None, (schema, stage))))))
+
+    total = sum(result.rows for result in results)
+    LOGGER.info(f"Merged {total} rows from {len(groups)} partitions into {table}")
+    return ImportResult(total, results)
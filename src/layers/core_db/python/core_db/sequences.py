@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+"""
+Per process allocation of sequence values.
+
+The ids are reserved in blocks with BaseModel.next_vals and handed out from memory. Once the block drops below the
+low-water mark the next one is reserved by a background thread on a connection of its own, so the callers only wait
+for the database when the ids run out before the refill arrives.
+
+The background refill is off by default in Lambda: the sandbox is frozen as soon as the handler returns, and a refill
+still running is frozen in the middle of its query, holding a connection the server may have dropped by the time it
+is thawed. The blocks are reserved in the calling thread there, pass background=True to opt in.
+"""
+import os
+import threading
+from collections import deque
+from typing import List
+
+from core_db.base_model import BaseModel, connection_manager
+from db_utils.logger import get_logger
+
+__all__ = ["IdAllocator"]
+
+LAYER_NAME = "sequences"
+LOGGER = get_logger(f"layer-{LAYER_NAME}")
+
+
+class IdAllocator:
+    """
+    Hands out the values of a sequence reserved in blocks.
+
+    The values left in memory when the process ends are never used, the sequence has gaps as it does with rolled
+    back inserts.
+
+    Parameters
+    ----------
+    sequence : str
+        The name of the sequence, with its schema.
+    block_size : int
+        Values reserved by every round-trip.
+    low_water : int
+        Values left that start the background refill, a quarter of the block by default.
+    background : bool
+        If False the block is only refilled when it is empty, in the calling thread. False in Lambda by default.
+
+    Examples
+    --------
+    >>> from core_db.sequences import IdAllocator
+    >>> allocator = IdAllocator("p2p_schema.p2p_transaction_id_seq", block_size=500)
+    >>> ids = allocator.take(len(rows))
+    """
+
+    def __init__(self, sequence: str, *, block_size: int = 100, low_water: int = None, background: bool = None):
+        if block_size < 1:
+            raise ValueError("block_size must be greater than 0")
+        self.sequence = sequence
+        self.block_size = block_size
+        self.low_water = block_size // 4 if low_water is None else low_water
+        self.background = not os.getenv("AWS_LAMBDA_FUNCTION_NAME") if background is None else background
+        self._ids = deque()
+        self._lock = threading.Lock()
+        self._refill = None
+
+    def __len__(self):
+        return len(self._ids)
+
+    def next(self) -> int:
+        """Returns the next id."""
+        return self.take(1)[0]
+
+    def take(self, n: int) -> List[int]:
+        """
+        Returns n ids, reserving a block in the calling thread when there are not enough in memory.
+
+        Raises
+        ------
+        peewee.OperationalError
+            If the ids could not be reserved.
+        """
+        if n <= 0:
+            return []
+        with self._lock:
+            if len(self._ids) < n:
+                self._wait_refill()
+            if len(self._ids) < n:
+                self._ids.extend(BaseModel.next_vals(self.sequence, max(self.block_size, n - len(self._ids))))
+            ids = [self._ids.popleft() for _ in range(n)]
+            if self.background and len(self._ids) < self.low_water and self._refill is None:
+                self._refill = threading.Thread(target=self._fill, name=f"refill-{self.sequence}", daemon=True)
+                self._refill.start()
+        return ids
+
+    def _wait_refill(self):
+        refill = self._refill
+        if refill is not None:
+            # The refill takes the lock to store its block, it is released while waiting.
+            self._lock.release()
+            try:
+                refill.join()
+            finally:
+                self._lock.acquire()
+
+    def _fill(self):
+        try:
+            with connection_manager.worker():
+                ids = BaseModel.next_vals(self.sequence, self.block_size)
+        except Exception as details:
+            LOGGER.warning(f"Background refill of {self.sequence} failed: {details}")
+            ids = []
+        with self._lock:
+            self._ids.extend(ids)
+            self._refill = None
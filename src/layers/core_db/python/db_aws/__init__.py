@@ -1,12 +1,24 @@
 # -*- coding: utf-8 -*-
-try:
-    from dotenv import load_dotenv
-except ImportError:
-    pass
-else:
-    load_dotenv()
+import importlib
+import os
+
+if not os.getenv("AWS_LAMBDA_FUNCTION_NAME"):
+    try:
+        from dotenv import load_dotenv
+    except ImportError:
+        pass
+    else:
+        load_dotenv()
 
 __all__ = [
+    "bootstrap",
     "secret_manager",
     "ssm"
 ]
+
+
+def __getattr__(name):
+    # Submodules are imported on first access, so importing the package alone does not load them all.
+    if name in __all__:
+        return importlib.import_module(f"{__name__}.{name}")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,10 @@
+# -*- coding: utf-8 -*-
+"""
+Cold-start prefetch of SSM parameters and Secrets Manager secrets.
+
+The registry of ``core_aws.bootstrap`` is shared, the core layer is attached next to core_db in the lambdas, so a
+prefetch declared by either layer serves both of them.
+"""
+from core_aws.bootstrap import BOOTSTRAP, SECRETS, SSM, ParametersBootstrap
+
+__all__ = ["ParametersBootstrap", "BOOTSTRAP", "SSM", "SECRETS"]
@@ -1,17 +1,19 @@
 # -*- coding: utf-8 -*-
 import os
 
+# The tracing of core_utils is shared by both layers, attached together to the lambdas.
 try:
-    if not os.getenv("DEVELOPER"):
-        print("patching...")
-        from aws_xray_sdk.core import patch_all
+    from core_utils.tracing import get_tracing_modules, patch_modules
 
-        patch_all()
+    patch_modules(get_tracing_modules(("botocore", "psycopg2")))
 except Exception as e:
     print(str(e))
 
 
 def load_environment_variables():
+    if os.getenv("AWS_LAMBDA_FUNCTION_NAME"):
+        # There is no .env file in the Lambda runtime, the variables come from the function configuration.
+        return
     try:
         from dotenv import load_dotenv
     except ImportError:
@@ -4,7 +4,9 @@ from enum import Enum
 __all__ = [
     "StatusLoanEnum",
     "OfferStatusEnum",
-    "OtpStatusEnum"
+    "OtpStatusEnum",
+    "IdempotencyStatusEnum",
+    "P2PTransactionStatusEnum"
 ]
 
 
@@ -27,3 +29,14 @@ class OtpStatusEnum(Enum):
     GENERATED = 1
     VALIDATED = 2
     EXPIRED = 3
+
+
+class IdempotencyStatusEnum(Enum):
+    IN_PROGRESS = "IN_PROGRESS"
+    COMPLETED = "COMPLETED"
+
+
+class P2PTransactionStatusEnum(Enum):
+    CREATED = "created"
+    DONE = "done"
+    FAILURE = "failure"
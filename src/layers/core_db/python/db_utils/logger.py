@@ -3,7 +3,8 @@
 Helper functions for working with Python.
 """
 from typing import Any
-from aws_lambda_powertools import Logger
+
+from core_utils.utils import _LazyLogger
 
 __all__ = [
     "get_logger"
@@ -23,6 +24,7 @@ def get_logger(name=None):
     Returns
     -------
     logger : Logger
+        A proxy of the Logger, built on its first use.
 
     Examples
     --------
@@ -36,5 +38,5 @@ def get_logger(name=None):
     )
     if name:
         properties.setdefault("service", name)
-    return Logger(**properties)
+    return _LazyLogger(properties)
 
@@ -2,13 +2,16 @@ import os
 from typing import Dict, Any
 
 from db_aws.secret_manager import get_secret
-from db_aws.ssm import get_parameter
+from db_aws.ssm import declare_parameter, get_parameter
 from db_utils.logger import get_logger
 from db_utils.app_params import ParametersApp
 
 LAYER_NAME = "params"
 LOGGER = get_logger(f"layer-{LAYER_NAME}")
 
+DB_CONFIG_PARAMETER = f"/config/infra/{ParametersApp().environment}/db/credentials"
+declare_parameter(DB_CONFIG_PARAMETER, use_prefix=False, transform=True)
+
 
 class ParametersDB:
     def __init__(self):
@@ -17,6 +20,7 @@ class ParametersDB:
         self.__db_password = os.environ.get("DB_PASSWORD")
         self.__db_host = os.environ.get("DB_HOST")
         self.__db_port = os.environ.get("DB_PORT")
+        self.__db_proxy_host = os.environ.get("DB_PROXY_HOST")
         self.__override_params()
 
     @property
@@ -39,14 +43,17 @@ class ParametersDB:
     def port(self):
         return self.__db_port
 
+    @property
+    def proxy_host(self):
+        return self.__db_proxy_host
+
     def __override_params(self):
-        parameter_app = ParametersApp()
-        db_config: Dict[str, Any] = get_parameter(f"/config/infra/{parameter_app.environment}/db/credentials",
-                                                  use_prefix=False, transform=True)
+        db_config: Dict[str, Any] = get_parameter(DB_CONFIG_PARAMETER, use_prefix=False, transform=True)
         if not self.__db_port and not self.__db_host and not self.__db_name:
             self.__db_name = db_config.get("db-name")
             self.__db_host = db_config.get("db-host")
             self.__db_port = db_config.get("db-port")
+            self.__db_proxy_host = self.__db_proxy_host or db_config.get("db-proxy-host")
         self.__get_access_credentials(db_config.get("db-password"))
 
     def __get_access_credentials(self, secret_arn: str):
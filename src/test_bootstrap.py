@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+from unittest import TestCase, mock
+
+LAYERS = Path(__file__).parent / "layers"
+sys.path[:0] = [
+    str(LAYERS / "core" / "python"),
+    str(LAYERS / "core_db" / "python"),
+    str(LAYERS / "lambda_powertools_custom" / "python"),
+]
+os.environ.setdefault("ENVIRONMENT", "dev")
+os.environ.setdefault("APP_NAME", "p2p")
+os.environ.setdefault("DEVELOPER", "Test")
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+
+from aws_lambda_powertools.utilities.parameters import base  # noqa: E402
+from core_aws import bootstrap, clients  # noqa: E402
+from core_aws.bootstrap import SECRETS, SSM, ParametersBootstrap  # noqa: E402
+
+VALUES = {
+    (SSM, "/dev/p2p/db", "json"): {"host": "localhost"},
+    (SSM, "/dev/p2p/bus", None): "p2p-bus",
+    (SECRETS, "p2p/api", None): "secret",
+}
+
+
+class Later(datetime):
+    """datetime one minute and one second ahead, past the ttl of the values stored by the tests."""
+
+    @classmethod
+    def now(cls, tz=None):
+        return datetime.now(tz) + timedelta(seconds=61)
+
+
+class TestParametersBootstrap(TestCase):
+
+    def setUp(self):
+        patcher = mock.patch.dict(base.DEFAULT_PROVIDERS)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        for kind in (SSM, SECRETS):
+            base.DEFAULT_PROVIDERS.pop(kind, None)
+        self.bootstrap = ParametersBootstrap(ttl=60)
+        self.fetched = []
+
+    def fake_get(self, kind):
+        def get(name, **sdk_options):
+            self.fetched.append((kind, name))
+            transform = "json" if name == "/dev/p2p/db" else None
+            value = VALUES[(kind, name, transform)]
+            return '{"host": "localhost"}' if transform else value
+
+        patcher = mock.patch.object(self.bootstrap.provider(kind), "_get", side_effect=get)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_providers_use_the_shared_clients(self):
+        self.assertIs(self.bootstrap.provider(SSM).client, clients.get_client("ssm"))
+        self.assertIs(self.bootstrap.provider(SECRETS).client, clients.get_client("secretsmanager"))
+        self.assertIs(self.bootstrap.provider(SSM), base.DEFAULT_PROVIDERS[SSM])
+
+    def test_prefetch_fetches_declared_values_once(self):
+        self.fake_get(SSM)
+        self.fake_get(SECRETS)
+        for key in VALUES:
+            self.bootstrap.declare(*key)
+            self.bootstrap.declare(*key)
+
+        self.assertEqual(self.bootstrap.prefetch(), VALUES)
+        self.assertEqual(self.bootstrap.prefetch(), {})
+        self.assertEqual(sorted(self.fetched), sorted((kind, name) for kind, name, _ in VALUES))
+        for key in VALUES:
+            self.assertTrue(self.bootstrap.is_cached(*key))
+
+    def test_prefetch_failures_are_skipped(self):
+        self.fake_get(SSM)
+        self.bootstrap.declare(SSM, "/dev/p2p/bus")
+        self.bootstrap.declare(SSM, "/dev/p2p/missing")
+
+        self.assertEqual(self.bootstrap.prefetch(), {(SSM, "/dev/p2p/bus", None): "p2p-bus"})
+        self.assertFalse(self.bootstrap.is_cached(SSM, "/dev/p2p/missing"))
+
+    def test_load_fills_the_provider_store(self):
+        self.bootstrap.declare(SSM, "/dev/p2p/db", "json")
+        self.bootstrap.load(SSM, {"/dev/p2p/db": '{"host": "localhost"}', "/dev/p2p/bus": "p2p-bus"})
+
+        provider = self.bootstrap.provider(SSM)
+        self.assertEqual(provider.get("/dev/p2p/db", transform="json"), {"host": "localhost"})
+        self.assertEqual(provider.get("/dev/p2p/bus"), "p2p-bus")
+        self.assertFalse(self.bootstrap.is_cached(SSM, "/dev/p2p/bus", "json"))
+        self.assertEqual(self.bootstrap.prefetch(), {})
+
+    def test_values_expire_after_ttl(self):
+        self.fake_get(SSM)
+        self.bootstrap.load(SSM, {"/dev/p2p/bus": "p2p-bus"})
+
+        with mock.patch.object(base, "datetime", Later):
+            self.assertFalse(self.bootstrap.is_cached(SSM, "/dev/p2p/bus"))
+            self.assertEqual(self.bootstrap.provider(SSM).get("/dev/p2p/bus", max_age=60), "p2p-bus")
+
+        self.assertEqual(self.fetched, [(SSM, "/dev/p2p/bus")])
+
+    def test_layers_share_the_registry(self):
+        from db_aws import bootstrap as db_bootstrap
+
+        self.assertIs(db_bootstrap.BOOTSTRAP, bootstrap.BOOTSTRAP)
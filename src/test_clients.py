@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+from pathlib import Path
+from unittest import TestCase
+
+LAYERS = Path(__file__).parent / "layers"
+sys.path[:0] = [
+    str(LAYERS / "core" / "python"),
+    str(LAYERS / "lambda_powertools_custom" / "python"),
+]
+os.environ.setdefault("ENVIRONMENT", "dev")
+os.environ.setdefault("APP_NAME", "p2p")
+os.environ.setdefault("DEVELOPER", "Test")
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+
+from core_aws import clients, s3  # noqa: E402
+
+CREDENTIALS = {"access_key_id": "AKIDEXAMPLE", "secret_access_key": "secret", "session_token": "token"}
+
+
+class TestClients(TestCase):
+
+    def setUp(self):
+        clients.clear()
+        self.addCleanup(clients.clear)
+
+    def test_clients_are_shared(self):
+        self.assertIs(clients.get_client("sqs", region_name="us-east-1"),
+                      clients.get_client("sqs", region_name="us-east-1"))
+        self.assertIsNot(clients.get_client("sqs", region_name="us-east-1"),
+                         clients.get_client("sqs", region_name="us-west-2"))
+
+    def test_clients_are_kept_per_credentials(self):
+        default = clients.get_client("s3", region_name="us-east-1")
+        assumed = clients.get_client("s3", region_name="us-east-1", aws_access_key_id="AKIDEXAMPLE",
+                                     aws_secret_access_key="secret", aws_session_token="token")
+
+        self.assertIsNot(default, assumed)
+        self.assertEqual(assumed._request_signer._credentials.access_key, "AKIDEXAMPLE")
+
+    def test_clients_are_kept_per_config(self):
+        from botocore.config import Config
+
+        default = clients.get_client("sqs", region_name="us-east-1")
+        retries = clients.get_client("sqs", region_name="us-east-1", config=Config(retries={"max_attempts": 1}))
+
+        self.assertIsNot(default, retries)
+        self.assertEqual(retries.meta.config.retries["total_max_attempts"], 2)
+        self.assertIs(clients.get_client("sqs", region_name="us-east-1", config=Config(retries={"max_attempts": 1})),
+                      retries)
+        self.assertIsNot(clients.get_client("sqs", region_name="us-east-1", config=Config(read_timeout=5)), retries)
+
+    def test_least_recently_used_clients_are_dropped(self):
+        first = clients.get_client("sqs", region_name="region-0")
+        for n in range(1, clients.MAX_ENTRIES + 1):
+            clients.get_client("sqs", region_name=f"region-{n}")
+
+        self.assertIsNot(clients.get_client("sqs", region_name="region-0"), first)
+
+
+class TestS3Client(TestCase):
+
+    def setUp(self):
+        clients.clear()
+        self.addCleanup(clients.clear)
+
+    def test_default_credentials(self):
+        self.assertIs(s3.get_client(), clients.get_client("s3"))
+
+    def test_given_credentials(self):
+        client = s3.get_client(region="us-west-2", **CREDENTIALS)
+
+        self.assertEqual(client.meta.region_name, "us-west-2")
+        self.assertEqual(client._request_signer._credentials.access_key, "AKIDEXAMPLE")
+        self.assertIs(client, s3.get_client(region="us-west-2", **CREDENTIALS))
+
+    def test_list_object_keys_follows_pages(self):
+        from botocore.stub import Stubber
+
+        stubber = Stubber(s3.get_client())
+        stubber.activate()
+        self.addCleanup(stubber.deactivate)
+        expected = {"Bucket": "backfill", "Prefix": "2024/"}
+        stubber.add_response("list_objects_v2", {"Contents": [{"Key": "2024/a.csv"}], "IsTruncated": True,
+                                                 "NextContinuationToken": "page-2"}, expected)
+        stubber.add_response("list_objects_v2", {"Contents": [{"Key": "2024/b.csv"}], "IsTruncated": False},
+                             dict(expected, ContinuationToken="page-2"))
+
+        self.assertEqual(s3.list_object_keys("backfill", "2024/"), ["2024/a.csv", "2024/b.csv"])
+        stubber.assert_no_pending_responses()
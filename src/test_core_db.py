@@ -0,0 +1,669 @@
+# -*- coding: utf-8 -*-
+import os
+import re
+import sys
+import threading
+from contextlib import nullcontext
+from pathlib import Path
+from unittest import TestCase, mock
+
+LAYERS = Path(__file__).parent / "layers"
+sys.path[:0] = [
+    str(LAYERS / "core_db" / "python"),
+    str(LAYERS / "core" / "python"),
+    str(LAYERS / "lambda_powertools_custom" / "python"),
+]
+os.environ.setdefault("ENVIRONMENT", "dev")
+os.environ.setdefault("APP_NAME", "p2p")
+os.environ.setdefault("DEVELOPER", "Test")
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+for name, value in {"DB_NAME": "p2p", "DB_USER": "test", "DB_PASSWORD": "test", "DB_HOST": "localhost",
+                    "DB_PORT": "5432"}.items():
+    os.environ.setdefault(name, value)
+
+# The database configuration parameter is read when base_model is imported, nothing here connects.
+with mock.patch("db_aws.ssm.get_parameter", return_value={}):
+    from core_db.base_model import BaseModel, database  # noqa: E402
+from core_db.connection import ConnectionManager, ReconnectPostgresqlDatabase  # noqa: E402
+from core_db import s3_import  # noqa: E402
+from core_db.rows import compact_rows, row_type  # noqa: E402
+from core_db.sequences import IdAllocator  # noqa: E402
+import psycopg2  # noqa: E402
+from peewee import BigIntegerField, OperationalError, TextField  # noqa: E402
+from playhouse.postgres_ext import JSONField  # noqa: E402
+
+
+class Transaction(BaseModel):
+    id = BigIntegerField(primary_key=True)
+    status = TextField()
+
+    class Meta:
+        table_name = "transaction"
+        schema = "p2p_schema"
+
+
+class Payment(BaseModel):
+    id = BigIntegerField(primary_key=True)
+    status = TextField(default="created")
+    note = TextField(null=True)
+    result = JSONField(null=True)
+
+    class Meta:
+        table_name = "payment"
+        schema = "p2p_schema"
+
+
+class FakeCursor:
+    """Named psycopg2 cursor returning the given rows."""
+
+    def __init__(self, columns, rows):
+        self.description = [(column,) for column in columns]
+        self.rows = rows
+        self.itersize = None
+        self.closed = False
+        self.executed = None
+        self.unread = None
+
+    def execute(self, sql, params=None):
+        self.executed = (sql, params)
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def fetchone(self):
+        if self.unread is None:
+            self.unread = iter(self.rows)
+        return next(self.unread, None)
+
+    def close(self):
+        self.closed = True
+
+
+class ServerSideTestCase(TestCase):
+
+    def fake_cursor(self, columns, rows):
+        cursor = FakeCursor(columns, rows)
+        connection = mock.Mock()
+        connection.cursor.return_value = cursor
+        for patcher in (mock.patch.object(database, "connection", return_value=connection),
+                        mock.patch.object(database, "atomic", side_effect=nullcontext)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.connection = connection
+        return cursor
+
+
+class TestStream(ServerSideTestCase):
+
+    def test_stream_chunks(self):
+        cursor = self.fake_cursor(["id", "status"], [(i, "done") for i in range(5)])
+
+        chunks = list(Transaction.select(Transaction.id, Transaction.status).tuples().stream_chunks(2))
+
+        self.assertEqual([len(chunk) for chunk in chunks], [2, 2, 1])
+        self.assertEqual(chunks[2], [(4, "done")])
+        self.assertEqual(cursor.itersize, 2)
+        self.assertTrue(cursor.closed)
+        self.assertTrue(self.connection.cursor.call_args.kwargs["name"].startswith("stream_"))
+
+    def test_stream_itersize_is_positional(self):
+        cursor = self.fake_cursor(["id", "status"], [(1, "done")])
+
+        rows = list(Transaction.select(Transaction.id, Transaction.status).dicts().stream(500))
+
+        self.assertEqual(rows, [{"id": 1, "status": "done"}])
+        self.assertEqual(cursor.itersize, 500)
+        self.assertIn('FROM "p2p_schema"."transaction"', cursor.executed[0])
+
+    def test_stream_closed_early_closes_cursor(self):
+        cursor = self.fake_cursor(["id", "status"], [(i, "done") for i in range(5)])
+
+        rows = Transaction.select(Transaction.id, Transaction.status).tuples().stream(1)
+        next(rows)
+        rows.close()
+
+        self.assertTrue(cursor.closed)
+
+
+class TestManyObjects(ServerSideTestCase):
+
+    def test_rows_share_one_compact_type(self):
+        cursor = self.fake_cursor(["id", "status"], [(8, "done"), (9, "failure")])
+
+        with mock.patch.object(database, "execute_sql", return_value=cursor):
+            rows = list(Transaction.select(Transaction.id, Transaction.status).many_objects())
+
+        self.assertEqual([(row.id, row.status) for row in rows], [(8, "done"), (9, "failure")])
+        self.assertIs(type(rows[0]), row_type(("id", "status")))
+        self.assertFalse(hasattr(rows[0], "__dict__"))
+
+    def test_itersize_is_positional(self):
+        cursor = self.fake_cursor(["id", "status"], [(8, "done")])
+
+        rows = list(Transaction.select(Transaction.id, Transaction.status).many_objects(1000))
+
+        self.assertEqual(rows, [row_type(("id", "status"))(8, "done")])
+        self.assertEqual(cursor.itersize, 1000)
+        self.assertTrue(cursor.closed)
+
+
+class TestRows(TestCase):
+
+    def test_row_type_is_cached_by_columns(self):
+        self.assertIs(row_type(("id", "status")), row_type(("id", "status")))
+        self.assertIsNot(row_type(("id", "status")), row_type(("status", "id")))
+
+    def test_compact_rows(self):
+        rows = list(compact_rows(["id", "status"], [(8, "done"), (9, "failure")]))
+
+        self.assertEqual([row._asdict() for row in rows], [{"id": 8, "status": "done"}, {"id": 9, "status": "failure"}])
+        self.assertIs(type(rows[0]), type(rows[1]))
+
+    def test_compact_rows_without_rows(self):
+        self.assertEqual(list(compact_rows(["id"], [])), [])
+
+
+class TestCopyFrom(TestCase):
+
+    def copy(self, rows, fields=None):
+        cursor = mock.Mock(rowcount=2)
+        cursor.copy_expert.side_effect = lambda sql, stream: self.copied.append((sql, stream.read()))
+        self.copied = []
+        with mock.patch.object(database, "cursor", return_value=cursor), \
+                mock.patch.object(database, "atomic", side_effect=nullcontext):
+            self.assertEqual(Payment.copy_from(rows, fields), 2)
+        return self.copied[0]
+
+    def test_dict_rows_copy_their_keys(self):
+        sql, data = self.copy([{"id": 1, "note": 'say "hi"', "result": {"a": [1, "b"]}}, {"id": 2, "note": ""}])
+
+        self.assertEqual(sql, 'COPY "p2p_schema"."payment" ("id", "note", "result") FROM STDIN WITH (FORMAT csv)')
+        self.assertEqual(data, '1,"say ""hi""","{""a"": [1, ""b""]}"\n2,"",\n')
+
+    def test_missing_keys_get_the_field_default(self):
+        sql, data = self.copy([{"id": 1, "status": "done"}, {"id": 2}])
+
+        self.assertIn('("id", "status")', sql)
+        self.assertEqual(data, '1,"done"\n2,"created"\n')
+
+    def test_model_rows_copy_the_fields_set(self):
+        sql, data = self.copy([Payment(id=1, note=None), Payment(id=2, note="paid")])
+
+        self.assertIn('("id", "status", "note")', sql)
+        self.assertEqual(data, '1,"created",\n2,"created","paid"\n')
+
+    def test_tuple_rows_copy_every_field(self):
+        sql, data = self.copy([(1, "done", None, None)])
+
+        self.assertIn('("id", "status", "note", "result")', sql)
+        self.assertEqual(data, '1,"done",,\n')
+
+    def test_copies_into_the_database_of_the_model(self):
+        other = mock.Mock(atomic=nullcontext)
+        other.cursor.return_value.rowcount = 1
+
+        with Payment.bind_ctx(other), mock.patch.object(database, "cursor") as cursor:
+            self.assertEqual(Payment.copy_from([{"id": 1}]), 1)
+
+        other.cursor.return_value.copy_expert.assert_called_once()
+        cursor.assert_not_called()
+
+
+class TestBulkUpsert(TestCase):
+
+    def upsert(self, rows, **kwargs):
+        with mock.patch.object(database, "execute_sql", return_value=mock.Mock(rowcount=1)) as execute_sql:
+            total = Payment.bulk_upsert(rows, ["id"], batch_size=2, **kwargs)
+        return total, [c.args for c in execute_sql.call_args_list]
+
+    def test_conflicts_update_the_given_fields(self):
+        total, statements = self.upsert([{"id": i, "status": "done"} for i in range(3)], update_fields=["status"])
+
+        self.assertEqual(total, 2)
+        self.assertEqual([params for _, params in statements], [[0, "done", 1, "done"], [2, "done"]])
+        self.assertTrue(statements[0][0].startswith('INSERT INTO "p2p_schema"."payment" ("id", "status") VALUES'))
+        self.assertIn('ON CONFLICT ("id") DO UPDATE SET "status" = EXCLUDED."status"', statements[0][0])
+
+    def test_conflicts_are_skipped_without_update_fields(self):
+        _, statements = self.upsert([Payment(id=1, status="done")])
+
+        self.assertIn('("id", "status") VALUES (%s, %s) ON CONFLICT ("id") DO NOTHING', statements[0][0])
+        self.assertEqual(statements[0][1], [1, "done"])
+
+
+class TestSave(TestCase):
+
+    def save(self, instance, **kwargs):
+        with mock.patch.object(database, "execute_sql", return_value=mock.Mock(rowcount=1)) as execute_sql:
+            instance.save(**kwargs)
+        return [c.args for c in execute_sql.call_args_list]
+
+    def loaded(self):
+        # A row read from the database, its fields are not dirty.
+        instance = Payment(id=8, status="created", note="first")
+        instance._dirty.clear()
+        return instance
+
+    def test_save_without_changes_runs_no_query(self):
+        instance = self.loaded()
+
+        self.assertEqual(self.save(instance), [])
+
+    def test_save_updates_only_assigned_fields(self):
+        instance = self.loaded()
+        instance.status = "done"
+
+        (sql, params), = self.save(instance)
+
+        self.assertEqual(sql, 'UPDATE "p2p_schema"."payment" SET "status" = %s WHERE ("payment"."id" = %s)')
+        self.assertEqual(params, ["done", 8])
+        self.assertEqual(self.save(instance), [])
+
+    def test_save_with_only(self):
+        instance = self.loaded()
+
+        (sql, params), = self.save(instance, only=[Payment.note])
+
+        self.assertIn('SET "note" = %s', sql)
+        self.assertEqual(params, ["first", 8])
+
+    def test_new_instance_is_inserted(self):
+        (sql, params), = self.save(Payment())
+
+        self.assertTrue(sql.startswith('INSERT INTO "p2p_schema"."payment" ("status") VALUES (%s)'))
+        self.assertEqual(params, ["created"])
+
+    def test_new_instance_without_fields_is_inserted(self):
+        (sql, params), = self.save(Transaction())
+
+        self.assertTrue(sql.startswith('INSERT INTO "p2p_schema"."transaction" DEFAULT VALUES'))
+        self.assertEqual(params, [])
+
+
+class TestTableImport(TestCase):
+
+    def test_sql(self):
+        query = Transaction.table_import_from_s3("bucket", "backfill/part-1.csv", "us-east-1",
+                                                 ["id", Transaction.status], table_name="p2p_schema.transaction_stage")
+
+        self.assertEqual(query.sql(), (
+            "SELECT aws_s3.table_import_from_s3(%s, %s, %s, aws_commons.create_s3_uri(%s, %s, %s))",
+            ["p2p_schema.transaction_stage", "id,status", "(format csv, HEADER true)", "bucket",
+             "backfill/part-1.csv", "us-east-1"],
+        ))
+
+    def test_sql_of_the_model_table(self):
+        _, params = Transaction.table_import_from_s3("bucket", "part-1.csv", "us-east-1", None).sql()
+
+        self.assertEqual(params[:2], ["p2p_schema.transaction", "id,status"])
+
+    def test_handle_result(self):
+        query = Transaction.table_import_from_s3("bucket", "part-1.csv", "us-east-1", None)
+        for row, rows in [(("3 rows imported into relation \"transaction\" from file part-1.csv",), 3),
+                          (("1 row imported into relation \"transaction\" from file part-1.csv",), 1),
+                          ((None,), 0), (None, 0)]:
+            with self.subTest(row=row):
+                self.assertEqual(query.handle_result(database, mock.Mock(**{"fetchone.return_value": row})), rows)
+
+
+class TestImportFromS3(TestCase):
+
+    def setUp(self):
+        self.statements = []
+        self.imported = []
+        patchers = [
+            mock.patch.object(database, "execute", side_effect=self.execute),
+            mock.patch.object(database, "atomic", side_effect=nullcontext),
+            mock.patch.object(s3_import.connection_manager, "worker", side_effect=nullcontext),
+            mock.patch.object(Transaction, "table_import_from_s3", side_effect=self.table_import),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def execute(self, query, *args, **kwargs):
+        self.statements.append(database.get_sql_context().sql(query).query()[0])
+        return mock.Mock(rowcount=0)
+
+    def table_import(self, bucket, key, region, fields, table_name=None, options=None):
+        def execute():
+            if key == "part-2.csv":
+                raise RuntimeError("Mock error raised")
+            self.imported.append((key, table_name))
+            return 10
+
+        return mock.Mock(execute=execute)
+
+    def stages(self, statement):
+        return sorted(s.split('"p2p_schema".')[1].split()[0] for s in self.statements if s.startswith(statement))
+
+    def test_partitions_are_merged_and_dropped(self):
+        result = s3_import.import_from_s3(Transaction, "bucket", ["part-0.csv", "part-1.csv", "part-3.csv"],
+                                          "us-east-1", partitions=2, max_workers=2)
+
+        self.assertEqual(result.rows, 30)
+        self.assertEqual([(partition.keys, partition.rows) for partition in result.partitions], [(2, 20), (1, 10)])
+        self.assertEqual(len(self.stages("CREATE UNLOGGED TABLE")), 2)
+        merged = [s for s in self.statements if s.startswith('INSERT INTO "p2p_schema"."transaction"')]
+        self.assertEqual(len(merged), 2)
+        self.assertEqual(self.stages("DROP TABLE IF EXISTS"), self.stages("CREATE UNLOGGED TABLE"))
+        self.assertTrue(all(stage.startswith("p2p_schema.transaction_stage_") for _, stage in self.imported))
+
+    def test_failed_partition_drops_the_staging_tables(self):
+        with self.assertRaisesRegex(RuntimeError, "Mock error raised"):
+            s3_import.import_from_s3(Transaction, "bucket", ["part-0.csv", "part-1.csv", "part-2.csv"], "us-east-1",
+                                     partitions=3, max_workers=3)
+
+        self.assertEqual(len(self.stages("DROP TABLE IF EXISTS")), 3)
+        self.assertEqual(self.stages("DROP TABLE IF EXISTS"), self.stages("CREATE UNLOGGED TABLE"))
+        self.assertFalse([s for s in self.statements if s.startswith("INSERT")])
+
+
+class FakeConnection:
+    """psycopg2 connection that only tracks whether it was rolled back or closed."""
+
+    server_version = 130000
+
+    def __init__(self):
+        self.closed = 0
+        self.rollbacks = 0
+        self.healthy = True
+
+    def cursor(self):
+        cursor = mock.MagicMock()
+        if not self.healthy:
+            error = psycopg2.OperationalError("server closed the connection")
+            cursor.__enter__.return_value.execute.side_effect = error
+        return cursor
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def close(self):
+        self.closed = 1
+
+
+class ConnectionTestCase(TestCase):
+
+    def setUp(self):
+        self.database = ReconnectPostgresqlDatabase("p2p")
+        self.connections = []
+        patcher = mock.patch.object(self.database, "_connect", side_effect=self.connect)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def connect(self):
+        self.connections.append(FakeConnection())
+        return self.connections[-1]
+
+    def in_thread(self, function):
+        thread = threading.Thread(target=function)
+        thread.start()
+        thread.join()
+
+
+class TestWorker(ConnectionTestCase):
+
+    def test_workers_reuse_pooled_connections(self):
+        manager = ConnectionManager(self.database, pool_size=1)
+        used = []
+
+        def work():
+            with manager.worker() as conn:
+                used.append(conn)
+
+        for _ in range(3):
+            self.in_thread(work)
+
+        self.assertEqual(len(self.connections), 1)
+        self.assertEqual(used, [self.connections[0]] * 3)
+        self.assertEqual(self.connections[0].rollbacks, 3)
+        self.assertFalse(self.connections[0].closed)
+        self.assertTrue(self.database.is_closed())
+
+    def test_connections_over_pool_size_are_closed(self):
+        manager = ConnectionManager(self.database, pool_size=1)
+        barrier = threading.Barrier(2, timeout=5)
+
+        def work():
+            with manager.worker():
+                barrier.wait()
+
+        threads = [threading.Thread(target=work) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(sorted(conn.closed for conn in self.connections), [0, 1])
+        manager.close_pool()
+        self.assertEqual([conn.closed for conn in self.connections], [1, 1])
+
+    def test_expired_connections_are_not_pooled(self):
+        manager = ConnectionManager(self.database, max_age=-1)
+        for _ in range(2):
+            with manager.worker():
+                pass
+
+        self.assertEqual([conn.closed for conn in self.connections], [1, 1])
+
+    def test_connections_are_closed_after_use(self):
+        manager = ConnectionManager(self.database, close_after_use=True)
+        with manager.worker():
+            pass
+
+        self.assertEqual([conn.closed for conn in self.connections], [1])
+
+    def test_thread_with_connection(self):
+        manager = ConnectionManager(self.database)
+        self.database.connect()
+
+        with self.assertRaises(RuntimeError):
+            with manager.worker():
+                pass
+
+
+class TestConnectionManager(ConnectionTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.manager = ConnectionManager(self.database, max_age=900, max_idle=300, health_check_after=30)
+        self.addCleanup(self.manager.close)
+
+    def elapse(self, seconds):
+        # Moves the connection and last use timestamps back instead of patching the clock.
+        if self.manager._connected_at is not None:
+            self.manager._connected_at -= seconds
+        self.manager._last_used -= seconds
+
+    def test_connection_is_kept_between_invocations(self):
+        first = self.manager.acquire()
+        self.manager.release()
+        self.elapse(10)
+
+        self.assertIs(self.manager.acquire(), first)
+        self.assertEqual(len(self.connections), 1)
+
+    def test_connection_is_replaced_at_max_age(self):
+        first = self.manager.acquire()
+        self.elapse(901)
+
+        self.assertIsNot(self.manager.acquire(), first)
+        self.assertTrue(first.closed)
+
+    def test_connection_is_closed_on_release_at_max_age(self):
+        self.manager.acquire()
+        self.elapse(901)
+        self.manager.release()
+
+        self.assertTrue(self.database.is_closed())
+
+    def test_stale_connection_is_replaced_after_health_check(self):
+        first = self.manager.acquire()
+        first.healthy = False
+        self.elapse(10)
+        self.assertIs(self.manager.acquire(), first)
+
+        self.elapse(31)
+        self.assertIsNot(self.manager.acquire(), first)
+        self.assertEqual(len(self.connections), 2)
+
+    def test_close_after_use(self):
+        self.manager.close_after_use = True
+        self.manager.acquire()
+        self.manager.release()
+
+        self.assertTrue(self.database.is_closed())
+        self.assertTrue(self.connections[0].closed)
+
+    def test_close_idle(self):
+        self.assertFalse(self.manager.close_idle())
+        self.manager.acquire()
+        self.elapse(299)
+        self.assertFalse(self.manager.close_idle())
+
+        self.elapse(2)
+        self.assertTrue(self.manager.close_idle())
+        self.assertTrue(self.database.is_closed())
+
+    def test_managed_releases_after_errors(self):
+        self.manager.close_after_use = True
+
+        @self.manager.managed
+        def handler():
+            self.assertFalse(self.database.is_closed())
+            raise RuntimeError("Mock error raised")
+
+        with self.assertRaises(RuntimeError):
+            handler()
+        self.assertTrue(self.database.is_closed())
+
+
+class TestConnectRetries(ConnectionTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.failures = 0
+        patcher = mock.patch("time.sleep")
+        self.sleep = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def connect(self):
+        if self.failures:
+            self.failures -= 1
+            raise psycopg2.OperationalError("could not connect to server")
+        return super().connect()
+
+    def test_backoff_doubles_between_attempts(self):
+        self.failures = 2
+        manager = ConnectionManager(self.database, retries=3, backoff=0.1)
+
+        self.assertIs(manager.acquire(), self.connections[0])
+        self.assertEqual([c.args[0] for c in self.sleep.call_args_list], [0.1, 0.2])
+        manager.close()
+
+    def test_raises_after_the_retries(self):
+        self.failures = 3
+        manager = ConnectionManager(self.database, retries=2, backoff=0.1)
+
+        with self.assertRaises(OperationalError):
+            manager.acquire()
+        self.assertEqual([c.args[0] for c in self.sleep.call_args_list], [0.1, 0.2])
+        self.assertEqual(self.connections, [])
+
+
+class TestIdAllocator(TestCase):
+
+    def setUp(self):
+        self.blocks = []
+        self.refill_started = threading.Event()
+        self.release_refill = threading.Event()
+        patchers = [
+            mock.patch.object(BaseModel, "next_vals", side_effect=self.next_vals),
+            mock.patch("core_db.sequences.connection_manager.worker", side_effect=nullcontext),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def next_vals(self, sequence, n):
+        block = self.blocks.pop(0)
+        if threading.current_thread() is not threading.main_thread():
+            self.refill_started.set()
+            self.assertTrue(self.release_refill.wait(5))
+        if isinstance(block, Exception):
+            raise block
+        return block[:n]
+
+    def test_refill_in_background_below_low_water(self):
+        self.blocks = [[1, 2, 3, 4], [5, 6, 7, 8]]
+        self.release_refill.set()
+        allocator = IdAllocator("p2p_schema.seq", block_size=4, low_water=2, background=True)
+
+        self.assertEqual(allocator.take(3), [1, 2, 3])
+        allocator._refill.join(5)
+
+        self.assertEqual(len(allocator), 5)
+        self.assertEqual(allocator.take(5), [4, 5, 6, 7, 8])
+
+    def test_waiting_for_refill_releases_the_lock(self):
+        self.blocks = [[1, 2, 3, 4], [5, 6, 7, 8]]
+        allocator = IdAllocator("p2p_schema.seq", block_size=4, low_water=2, background=True)
+        allocator.take(3)
+        self.assertTrue(self.refill_started.wait(5))
+        refill, joining = allocator._refill, threading.Event()
+        refill.join = lambda timeout=None: joining.set() or threading.Thread.join(refill, timeout)
+        taken = []
+        waiting = threading.Thread(target=lambda: taken.extend(allocator.take(2)))
+        waiting.start()
+
+        # The refill stores its block under the lock, the waiting take does not hold it while joining.
+        self.assertTrue(joining.wait(5))
+        self.assertFalse(allocator._lock.locked())
+        self.release_refill.set()
+        waiting.join(5)
+
+        self.assertFalse(waiting.is_alive())
+        self.assertEqual(taken, [4, 5])
+        self.assertEqual(BaseModel.next_vals.call_count, 2)
+
+    def test_failed_refill_falls_back_to_the_caller(self):
+        self.blocks = [[1, 2, 3, 4], RuntimeError("Mock error raised"), [10, 11, 12, 13]]
+        self.release_refill.set()
+        allocator = IdAllocator("p2p_schema.seq", block_size=4, low_water=2, background=True)
+
+        self.assertEqual(allocator.take(3), [1, 2, 3])
+        self.assertEqual(allocator.take(2), [4, 10])
+        self.assertEqual(BaseModel.next_vals.call_count, 3)
+
+    def test_without_background_refill(self):
+        self.blocks = [[1, 2], [3, 4]]
+        allocator = IdAllocator("p2p_schema.seq", block_size=2, background=False)
+
+        self.assertEqual([allocator.next() for _ in range(3)], [1, 2, 3])
+        self.assertIsNone(allocator._refill)
+
+    def test_background_refill_is_off_in_lambda(self):
+        with mock.patch.dict(os.environ, {"AWS_LAMBDA_FUNCTION_NAME": "request_p2p_transaction"}):
+            self.assertFalse(IdAllocator("p2p_schema.seq").background)
+        with mock.patch.dict(os.environ):
+            os.environ.pop("AWS_LAMBDA_FUNCTION_NAME", None)
+            self.assertTrue(IdAllocator("p2p_schema.seq").background)
+
+
+class TestMigrations(TestCase):
+
+    def normalize(self, sql):
+        sql = " ".join(sql.replace('"', "").replace("IF NOT EXISTS ", "").split())
+        return re.sub(r" ?([(),]) ?", r"\1", sql)
+
+    def test_idempotency_record_matches_the_model(self):
+        from core_db.models import IdempotencyRecord
+
+        migration = (LAYERS / "core_db" / "migrations" / "0001_create_idempotency_record.sql").read_text()
+        context = database.get_sql_context
+        statements = [context().sql(IdempotencyRecord._schema._create_table()).query()[0]]
+        statements += [context().sql(index).query()[0] for index in IdempotencyRecord._schema._create_indexes()]
+
+        for statement in statements:
+            self.assertIn(self.normalize(statement), self.normalize(migration))
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+from pathlib import Path
+from unittest import TestCase
+
+LAYERS = Path(__file__).parent / "layers"
+sys.path[:0] = [
+    str(LAYERS / "core" / "python"),
+    str(LAYERS / "lambda_powertools_custom" / "python"),
+]
+os.environ.setdefault("ENVIRONMENT", "dev")
+os.environ.setdefault("APP_NAME", "p2p")
+os.environ.setdefault("DEVELOPER", "Test")
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+
+from botocore.stub import Stubber  # noqa: E402
+from core_aws import dynamo  # noqa: E402
+from core_aws.clients import get_client  # noqa: E402
+
+TABLE = "Invoices"
+KEY_CONDITION = "cdc = :cdc"
+VALUES = {":cdc": {"S": "123456"}}
+
+
+def item(i):
+    return {"cdc": {"S": "123456"}, "id": {"N": str(i)}}
+
+
+class TestQuery(TestCase):
+    """Queries a stubbed low-level client, every call not queued on the stubber fails the test."""
+
+    def setUp(self):
+        self.client = get_client("dynamodb")
+        self.stubber = Stubber(self.client)
+        self.stubber.activate()
+        self.addCleanup(self.stubber.deactivate)
+
+    def stub_page(self, ids, start=None, last=None, **params):
+        response = {"Items": [item(i) for i in ids], "Count": len(ids), "ScannedCount": len(ids)}
+        if last is not None:
+            response["LastEvaluatedKey"] = item(last)
+        expected = {"TableName": TABLE, "KeyConditionExpression": KEY_CONDITION, "ExpressionAttributeValues": VALUES}
+        expected.update(params)
+        if start is not None:
+            expected["ExclusiveStartKey"] = item(start)
+        self.stubber.add_response("query", response, expected)
+
+    def test_follows_exclusive_start_key(self):
+        self.stub_page([1, 2], last=2)
+        self.stub_page([], start=2, last=4)
+        self.stub_page([5], start=4)
+
+        response = dynamo.get_items_by_query(TABLE, None, KEY_CONDITION, VALUES, client=self.client)
+
+        self.assertEqual(response["Items"], [item(1), item(2), item(5)])
+        self.assertEqual(response["Count"], 3)
+        self.assertNotIn("LastEvaluatedKey", response)
+        self.stubber.assert_no_pending_responses()
+
+    def test_limit_stops_early(self):
+        self.stub_page([1, 2], last=2, Limit=2, ProjectionExpression="id")
+        self.stub_page([3, 4], start=2, last=4, Limit=2, ProjectionExpression="id")
+
+        items = list(dynamo.query_items(TABLE, None, KEY_CONDITION, VALUES, client=self.client, limit=3,
+                                        page_size=2, projection="id"))
+
+        self.assertEqual(items, [item(1), item(2), item(3)])
+        self.stubber.assert_no_pending_responses()
+
+    def test_collect_limit(self):
+        self.stub_page([1, 2], last=2)
+
+        response = dynamo.collect(dynamo.query_pages(TABLE, None, KEY_CONDITION, VALUES, client=self.client), 1)
+
+        self.assertEqual(response["Items"], [item(1)])
+        self.assertEqual(response["LastEvaluatedKey"], item(1))
+        self.stubber.assert_no_pending_responses()
+
+    def test_collect_limit_at_the_end_of_a_page(self):
+        self.stub_page([1, 2], last=2)
+
+        response = dynamo.collect(dynamo.query_pages(TABLE, None, KEY_CONDITION, VALUES, client=self.client), 2)
+
+        self.assertEqual(response["Items"], [item(1), item(2)])
+        self.assertEqual(response["LastEvaluatedKey"], item(2))
+
+    def test_collect_limit_on_the_last_page(self):
+        self.stub_page([1, 2])
+        pages = dynamo.query_pages(TABLE, None, KEY_CONDITION, VALUES, client=self.client)
+
+        response = dynamo.collect(pages, 1, key_names=["cdc", "id"])
+
+        self.assertEqual(response["Count"], 1)
+        self.assertEqual(response["LastEvaluatedKey"], item(1))
+
+    def test_collect_limit_on_the_last_page_without_key_names(self):
+        self.stub_page([1, 2])
+
+        with self.assertRaises(ValueError):
+            dynamo.collect(dynamo.query_pages(TABLE, None, KEY_CONDITION, VALUES, client=self.client), 1)
@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+from pathlib import Path
+from unittest import TestCase
+
+LAYERS = Path(__file__).parent / "layers"
+sys.path[:0] = [
+    str(LAYERS / "core" / "python"),
+    str(LAYERS / "lambda_powertools_custom" / "python"),
+]
+os.environ.setdefault("ENVIRONMENT", "dev")
+os.environ.setdefault("APP_NAME", "p2p")
+os.environ.setdefault("DEVELOPER", "Test")
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+
+from botocore.stub import ANY, Stubber  # noqa: E402
+from core_aws.clients import get_client  # noqa: E402
+from core_aws.eventbridge import EventPublisher  # noqa: E402
+
+BUS_NAME = "p2p-bus"
+
+
+def entry(i, detail):
+    return {"Time": ANY, "Source": "lambda", "DetailType": f"event-{i}", "Detail": detail, "EventBusName": BUS_NAME}
+
+
+class TestEventPublisher(TestCase):
+    """Publishes to a stubbed client, every call not queued on the stubber fails the test."""
+
+    def setUp(self):
+        self.client = get_client("events")
+        self.stubber = Stubber(self.client)
+        self.stubber.activate()
+        self.addCleanup(self.stubber.deactivate)
+        self.publisher = EventPublisher(bus_name=BUS_NAME, backoff=0, client=self.client)
+        self.details = {}
+
+    def add(self, i, value="x"):
+        self.details[i] = f'{{"value":"{value}"}}'
+        return self.publisher.add(event_name=f"event-{i}", event_input={"value": value})
+
+    def stub_put_events(self, ids, failed=()):
+        self.stubber.add_response(
+            "put_events",
+            {
+                "FailedEntryCount": len(failed),
+                "Entries": [{"ErrorCode": "InternalFailure", "ErrorMessage": "Mock error"} if i in failed
+                            else {"EventId": f"event-id-{i}"} for i in ids],
+            },
+            {"Entries": [entry(i, self.details[i]) for i in ids]},
+        )
+
+    def test_packs_by_count(self):
+        for i in range(25):
+            self.add(i)
+        for start in range(0, 25, 10):
+            self.stub_put_events(range(start, min(start + 10, 25)))
+
+        statuses = self.publisher.flush()
+
+        self.assertEqual([status["event_id"] for status in statuses], [f"event-id-{i}" for i in range(25)])
+        self.assertEqual(len(self.publisher), 0)
+        self.stubber.assert_no_pending_responses()
+
+    def test_packs_by_size(self):
+        for i in range(3):
+            self.add(i, "x" * (100 * 1024))
+        self.stub_put_events([0, 1])
+        self.stub_put_events([2])
+
+        self.assertTrue(all(status["success"] for status in self.publisher.flush()))
+        self.stubber.assert_no_pending_responses()
+
+    def test_entries_over_the_limit_are_not_sent(self):
+        self.add(0)
+        self.add(1, "x" * (256 * 1024))
+        self.stub_put_events([0])
+
+        statuses = self.publisher.flush()
+
+        self.assertTrue(statuses[0]["success"])
+        self.assertEqual(statuses[1]["error_code"], "EntryTooLarge")
+        self.stubber.assert_no_pending_responses()
+
+    def test_retries_only_failed_entries(self):
+        for i in range(4):
+            self.add(i)
+        self.stub_put_events(range(4), failed=(1, 3))
+        self.stub_put_events([1, 3], failed=(3,))
+        self.stub_put_events([3])
+
+        statuses = self.publisher.flush()
+
+        self.assertEqual([status["event_id"] for status in statuses], [f"event-id-{i}" for i in range(4)])
+        self.stubber.assert_no_pending_responses()
+
+    def test_failed_entries_keep_their_error_after_the_retries(self):
+        self.publisher.max_retries = 1
+        self.add(0)
+        self.add(1)
+        self.stub_put_events([0, 1], failed=(1,))
+        self.stub_put_events([1], failed=(1,))
+
+        statuses = self.publisher.flush()
+
+        self.assertTrue(statuses[0]["success"])
+        self.assertEqual(statuses[1], {"success": False, "event_id": None, "error_code": "InternalFailure",
+                                       "error_message": "Mock error"})
+        self.stubber.assert_no_pending_responses()
+
+    def test_client_error_keeps_the_statuses_of_the_sent_chunks(self):
+        self.publisher.max_retries = 0
+        for i in range(12):
+            self.add(i)
+        self.stub_put_events(range(10))
+        self.stubber.add_client_error("put_events", service_error_code="InternalException", http_status_code=500,
+                                      expected_params={"Entries": [entry(i, self.details[i]) for i in (10, 11)]})
+
+        statuses = self.publisher.flush()
+
+        self.assertEqual([status["event_id"] for status in statuses[:10]], [f"event-id-{i}" for i in range(10)])
+        self.assertEqual([(status["success"], status["error_code"]) for status in statuses[10:]],
+                         [(False, "InternalException")] * 2)
+        self.stubber.assert_no_pending_responses()
+
+    def test_entries_of_a_failed_call_are_retried(self):
+        self.add(0)
+        self.stubber.add_client_error("put_events", service_error_code="ThrottlingException", http_status_code=400)
+        self.stub_put_events([0])
+
+        self.assertTrue(self.publisher.flush()[0]["success"])
+        self.stubber.assert_no_pending_responses()
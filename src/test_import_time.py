@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+import json
+import os
+import subprocess
+import sys
+import threading
+import warnings
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from unittest import TestCase
+
+SRC = Path(__file__).parent
+LAYERS = SRC / "layers"
+PYTHONPATH = [
+    LAYERS / "core" / "python",
+    LAYERS / "core_db" / "python",
+    LAYERS / "lambda_powertools_custom" / "python",
+    SRC / "lambdas" / "request_p2p_transaction",
+]
+
+# Loaded only on first use, the X-Ray SDK is loaded with the first traced library.
+LAZY_MODULES = ["requests", "aws_xray_sdk", "aws_lambda_powertools"]
+
+# module: (cumulative import time budget in ms, modules that must be loaded only on first use)
+BUDGETS = {
+    "core_aws": (100, ["boto3", "botocore", *LAZY_MODULES]),
+    "core_aws.s3": (150, ["boto3", *LAZY_MODULES]),
+    "core_aws.session": (100, ["boto3", "botocore", *LAZY_MODULES]),
+    "core_aws.sqs": (250, ["boto3", *LAZY_MODULES]),
+    "core_aws.eventbridge": (300, ["boto3", *LAZY_MODULES]),
+    "core_aws.dynamo": (600, []),
+    "core_aws.ssm": (600, []),
+    "core_api.responses": (250, ["pytz", "boto3", *LAZY_MODULES]),
+    "core_utils.utils": (250, ["pytz", "boto3", *LAZY_MODULES]),
+    "db_utils.logger": (200, ["boto3", "peewee", "psycopg2", *LAZY_MODULES]),
+    "db_aws": (100, ["boto3", "peewee", "psycopg2", *LAZY_MODULES]),
+    "core_db": (100, ["boto3", "peewee", "psycopg2", *LAZY_MODULES]),
+    # Both read their parameters at import, from the local endpoint of ParametersServer. The handler loads requests
+    # with requester_patch.
+    "core_db.base_model": (900, ["requests", "pytz"]),
+    "lambda_function": (1200, ["pytz"]),
+}
+
+# The budgets are wall-clock times of a shared machine, only an import this many times over its budget fails.
+TOLERANCE = 3
+
+PARAMETERS = {
+    "/config/infra/dev/db/credentials": json.dumps({"db-name": "p2p", "db-host": "localhost", "db-port": 5432,
+                                                    "db-password": "p2p-db-secret"}),
+    "/dev/p2p/p2p/transaction-bus/arn": "arn:aws:events:us-east-1:123456789012:event-bus/p2p-bus",
+}
+SECRETS = {"p2p-db-secret": json.dumps({"username": "p2p", "password": "p2p"})}
+
+
+class ParametersServer(ThreadingHTTPServer):
+    """Local endpoint answering the GetParameter and GetSecretValue calls the modules make at import."""
+
+    daemon_threads = True
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            target = self.headers["X-Amz-Target"]
+            if target == "AmazonSSM.GetParameter" and request["Name"] in PARAMETERS:
+                status, body = 200, {"Parameter": {"Name": request["Name"], "Type": "String",
+                                                   "Value": PARAMETERS[request["Name"]]}}
+            elif target == "secretsmanager.GetSecretValue" and request["SecretId"] in SECRETS:
+                status, body = 200, {"Name": request["SecretId"], "SecretString": SECRETS[request["SecretId"]]}
+            else:
+                status, body = 400, {"__type": "ResourceNotFoundException", "message": f"{target} {request}"}
+            payload = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/x-amz-json-1.1")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, *args):
+            pass
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), self.Handler)
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+
+def import_time(module, endpoint_url):
+    """Returns the -X importtime breakdown of a module as (self_us, cumulative_us, name) tuples."""
+    # DEVELOPER is unset like in Lambda, where the traced libraries are registered for patching.
+    env = {name: value for name, value in os.environ.items()
+           if name not in ("DEVELOPER", "TRACING_MODULES") and not name.startswith("DB_")}
+    env.update({
+        "PYTHONPATH": os.pathsep.join(map(str, PYTHONPATH)),
+        "AWS_LAMBDA_FUNCTION_NAME": "ImportTime",
+        "ENVIRONMENT": "dev",
+        "APP_NAME": "p2p",
+        "AWS_DEFAULT_REGION": "us-east-1",
+        "AWS_ENDPOINT_URL": endpoint_url,
+        "AWS_ACCESS_KEY_ID": "AKIDEXAMPLE",
+        "AWS_SECRET_ACCESS_KEY": "secret",
+    })
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        env=env, capture_output=True, text=True,
+    )
+    if result.returncode:
+        raise AssertionError(f"import {module} failed\n{result.stderr[-3000:]}")
+    report = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        report.append((int(self_us), int(cumulative_us), name.strip()))
+    return report
+
+
+def format_report(report, top=15):
+    lines = [f"{self_us / 1000:>8.1f} {cumulative_us / 1000:>8.1f}  {name}"
+             for self_us, cumulative_us, name in sorted(report, reverse=True)[:top]]
+    return "\n".join(["    self ms   cum ms  module"] + lines)
+
+
+class TestImportTime(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ParametersServer()
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def test_import_time_budget(self):
+        for module, (budget, lazy_modules) in BUDGETS.items():
+            with self.subTest(module=module):
+                report = import_time(module, self.server.url)
+                loaded = {name for _, _, name in report}.intersection(lazy_modules)
+                self.assertFalse(
+                    loaded,
+                    f"{module} imports {sorted(loaded)} at import\n{format_report(report)}"
+                )
+                cumulative_ms = report[-1][1] / 1000
+                message = f"{module} took {cumulative_ms:.1f}ms to import, the budget is {budget}ms"
+                if cumulative_ms > budget:
+                    warnings.warn(f"{message}\n{format_report(report)}")
+                self.assertLessEqual(cumulative_ms, budget * TOLERANCE, f"{message}\n{format_report(report)}")
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+import datetime
+import json
+import os
+import sys
+from decimal import Decimal
+from enum import Enum, IntEnum
+from pathlib import Path
+from unittest import TestCase
+from uuid import UUID
+
+LAYERS = Path(__file__).parent / "layers"
+sys.path[:0] = [
+    str(LAYERS / "core" / "python"),
+    str(LAYERS / "lambda_powertools_custom" / "python"),
+]
+os.environ.setdefault("ENVIRONMENT", "dev")
+os.environ.setdefault("APP_NAME", "p2p")
+os.environ.setdefault("DEVELOPER", "Test")
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+
+from core_utils import serializer  # noqa: E402
+
+
+class Status(Enum):
+    DONE = "DONE"
+
+
+class Priority(IntEnum):
+    HIGH = 1
+
+
+DATA = {
+    "id": 8,
+    "amount": Decimal("10.50"),
+    "reference": UUID("5fea7756-0ea4-451a-a703-a558b933e274"),
+    "created_at": datetime.datetime(2024, 1, 2, 3, 4, 5),
+    "rate": 0.25,
+    "note": None,
+    "ids": (1, 2),
+    1: "integer key",
+    "status": Status.DONE,
+    "priority": Priority.HIGH,
+}
+BACKENDS = ["json"] + (["orjson"] if serializer.orjson else [])
+
+
+class TestBackends(TestCase):
+
+    def setUp(self):
+        self.addCleanup(serializer.set_backend, serializer.get_backend())
+
+    def test_backends_produce_the_same_values(self):
+        for backend in BACKENDS:
+            with self.subTest(backend=backend):
+                serializer.set_backend(backend)
+                self.assertEqual(json.loads(serializer.dumps(DATA)), {
+                    "id": 8, "amount": 10.5, "reference": "5fea7756-0ea4-451a-a703-a558b933e274",
+                    "created_at": "2024-01-02T03:04:05", "rate": 0.25, "note": None, "ids": [1, 2],
+                    "1": "integer key", "status": "DONE", "priority": 1,
+                })
+
+    def test_normalize_enum(self):
+        self.assertEqual(serializer.normalize([Status.DONE, Priority.HIGH]), ["DONE", 1])
+
+    def test_backends_reject_non_finite_floats(self):
+        for backend in BACKENDS:
+            serializer.set_backend(backend)
+            for value in (float("nan"), float("inf"), [None, -float("inf")], {"rate": Decimal("NaN")}):
+                with self.subTest(backend=backend, value=value):
+                    with self.assertRaisesRegex(ValueError, "not JSON compliant"):
+                        serializer.dumps(value)
+
+    def test_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            serializer.set_backend("simplejson")
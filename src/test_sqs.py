@@ -0,0 +1,416 @@
+# -*- coding: utf-8 -*-
+import contextlib
+import json
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+from unittest import TestCase, mock
+
+LAYERS = Path(__file__).parent / "layers"
+sys.path[:0] = [
+    str(LAYERS / "core" / "python"),
+    str(LAYERS / "lambda_powertools_custom" / "python"),
+]
+os.environ.setdefault("ENVIRONMENT", "dev")
+os.environ.setdefault("APP_NAME", "p2p")
+os.environ.setdefault("DEVELOPER", "Test")
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+
+from botocore.stub import Stubber  # noqa: E402
+from core_aws import sqs  # noqa: E402
+from core_aws.batch import RecordExecutor, RecordFailure, SqsBatchProcessor, process_partial_response  # noqa: E402
+from core_aws.consumer import SqsConsumer  # noqa: E402
+
+QUEUE_NAME = "p2p-transactions"
+QUEUE_URL = f"https://sqs.us-east-1.amazonaws.com/123456789012/{QUEUE_NAME}"
+SENT = {"MessageId": "5fea7756-0ea4-451a-a703-a558b933e274", "MD5OfMessageBody": "99914b932bd37a50b983c5e7c90ae93b"}
+
+
+class TestQueueUrl(TestCase):
+    """Runs the SQS helpers against a stubbed client, every call not queued on the stubber fails the test."""
+
+    def setUp(self):
+        sqs.clear_queue_urls()
+        self.stubber = Stubber(sqs.get_sqs_client())
+        self.stubber.activate()
+        self.addCleanup(self.stubber.deactivate)
+        self.addCleanup(sqs.clear_queue_urls)
+
+    def stub_get_queue_url(self):
+        self.stubber.add_response("get_queue_url", {"QueueUrl": QUEUE_URL}, {"QueueName": QUEUE_NAME})
+
+    def stub_send_message(self):
+        self.stubber.add_response("send_message", SENT)
+
+    def test_queue_url_resolved_once_per_process(self):
+        self.stub_get_queue_url()
+        for _ in range(3):
+            self.stub_send_message()
+            self.stub_send_message()
+
+        for _ in range(3):
+            sqs.send_message_to_queue(QUEUE_NAME, "{}")
+            sqs.send_message_by_queue_name("{}", QUEUE_NAME)
+
+        self.stubber.assert_no_pending_responses()
+
+    def test_queue_url_resolved_again_after_non_existent_queue(self):
+        self.stub_get_queue_url()
+        self.stub_send_message()
+        self.stubber.add_client_error("send_message", service_error_code="AWS.SimpleQueueService.NonExistentQueue")
+        self.stub_get_queue_url()
+        self.stub_send_message()
+
+        sqs.send_message_to_queue(QUEUE_NAME, "{}")
+        self.assertEqual(sqs.send_message_to_queue(QUEUE_NAME, "{}"), SENT)
+        self.stubber.assert_no_pending_responses()
+
+    def test_invalidate_queue_url(self):
+        self.stub_get_queue_url()
+        self.stub_get_queue_url()
+
+        self.assertEqual(sqs.get_sqs_queue_url(QUEUE_NAME), QUEUE_URL)
+        self.assertEqual(sqs.get_sqs_queue_url(QUEUE_NAME), QUEUE_URL)
+        sqs.invalidate_queue_url(QUEUE_NAME)
+        self.assertEqual(sqs.get_sqs_queue_url(QUEUE_NAME), QUEUE_URL)
+        self.stubber.assert_no_pending_responses()
+
+    def test_missing_queue_is_not_cached(self):
+        self.stubber.add_client_error("get_queue_url", service_error_code="AWS.SimpleQueueService.NonExistentQueue")
+        self.stub_get_queue_url()
+
+        with self.assertRaises(ValueError):
+            sqs.get_sqs_queue_url(QUEUE_NAME)
+        self.assertEqual(sqs.get_sqs_queue_url(QUEUE_NAME), QUEUE_URL)
+
+
+class TestSendMany(TestCase):
+
+    def setUp(self):
+        self.stubber = Stubber(sqs.get_sqs_client())
+        self.stubber.activate()
+        self.addCleanup(self.stubber.deactivate)
+
+    def stub_send_message_batch(self, ids, failed=(), sender_fault=False):
+        self.stubber.add_response(
+            "send_message_batch",
+            {
+                "Successful": [{"Id": str(i), "MessageId": f"message-{i}", "MD5OfMessageBody": "md5"}
+                               for i in ids if i not in failed],
+                "Failed": [{"Id": str(i), "SenderFault": sender_fault, "Code": "InternalError"} for i in failed],
+            },
+            {"QueueUrl": QUEUE_URL, "Entries": [{"Id": str(i), "MessageBody": f"body-{i}"} for i in ids]},
+        )
+
+    def test_packs_by_count(self):
+        for start in range(0, 25, 10):
+            self.stub_send_message_batch(range(start, min(start + 10, 25)))
+
+        result = sqs.send_many(QUEUE_URL, [f"body-{i}" for i in range(25)], max_workers=1)
+
+        self.assertEqual([entry["Id"] for entry in result["Successful"]], [str(i) for i in range(25)])
+        self.assertEqual(result["Failed"], [])
+        self.stubber.assert_no_pending_responses()
+
+    def test_packs_by_size(self):
+        body = "x" * (100 * 1024)
+        for ids in ([0, 1], [2]):
+            self.stubber.add_response(
+                "send_message_batch",
+                {"Successful": [{"Id": str(i), "MessageId": "m", "MD5OfMessageBody": "md5"} for i in ids],
+                 "Failed": []},
+                {"QueueUrl": QUEUE_URL, "Entries": [{"Id": str(i), "MessageBody": body} for i in ids]},
+            )
+
+        result = sqs.send_many(QUEUE_URL, [body] * 3, max_workers=1)
+
+        self.assertEqual(len(result["Successful"]), 3)
+        self.stubber.assert_no_pending_responses()
+
+    def test_retries_only_failed_entries(self):
+        self.stub_send_message_batch(range(5), failed=(1, 3))
+        self.stub_send_message_batch([1, 3], failed=(3,))
+        self.stub_send_message_batch([3])
+
+        result = sqs.send_many(QUEUE_URL, [f"body-{i}" for i in range(5)], max_workers=1, backoff=0)
+
+        self.assertEqual([entry["Id"] for entry in result["Successful"]], ["0", "1", "2", "3", "4"])
+        self.assertEqual(result["Failed"], [])
+        self.stubber.assert_no_pending_responses()
+
+    def test_sender_faults_are_not_retried(self):
+        self.stub_send_message_batch(range(3), failed=(2,), sender_fault=True)
+
+        result = sqs.send_many(QUEUE_URL, [f"body-{i}" for i in range(3)], max_workers=1, backoff=0)
+
+        self.assertEqual([entry["Id"] for entry in result["Failed"]], ["2"])
+        self.stubber.assert_no_pending_responses()
+
+
+class TestSendManyFifo(TestCase):
+
+    def setUp(self):
+        self.stubber = Stubber(sqs.get_sqs_client())
+        self.stubber.activate()
+        self.addCleanup(self.stubber.deactivate)
+        self.groups = list("abcdefghij") + ["a", "b"]
+
+    def stub_send_message_batch(self, ids, failed=(), sender_fault=False):
+        self.stubber.add_response(
+            "send_message_batch",
+            {
+                "Successful": [{"Id": str(i), "MessageId": f"message-{i}", "MD5OfMessageBody": "md5"}
+                               for i in ids if i not in failed],
+                "Failed": [{"Id": str(i), "SenderFault": sender_fault, "Code": "InternalError"} for i in failed],
+            },
+            {"QueueUrl": f"{QUEUE_URL}.fifo",
+             "Entries": [{"Id": str(i), "MessageBody": f"body-{i}", "MessageGroupId": self.groups[i],
+                          "MessageDeduplicationId": f"dedup-{i}"} for i in ids]},
+        )
+
+    def send_many(self):
+        messages = [{"MessageBody": f"body-{i}", "MessageGroupId": group, "MessageDeduplicationId": f"dedup-{i}"}
+                    for i, group in enumerate(self.groups)]
+        return sqs.send_many(f"{QUEUE_URL}.fifo", messages, max_workers=4, backoff=0)
+
+    def test_batches_are_retried_before_the_next_one(self):
+        self.stub_send_message_batch(range(10), failed=(2,))
+        self.stub_send_message_batch([2])
+        self.stub_send_message_batch([10, 11])
+
+        result = self.send_many()
+
+        self.assertEqual([entry["Id"] for entry in result["Successful"]], [str(i) for i in range(12)])
+        self.stubber.assert_no_pending_responses()
+
+    def test_group_is_not_sent_after_a_failure(self):
+        self.stub_send_message_batch(range(10), failed=(0,), sender_fault=True)
+        self.stub_send_message_batch([11])
+
+        result = self.send_many()
+
+        self.assertEqual([(entry["Id"], entry["Code"]) for entry in result["Failed"]],
+                         [("0", "InternalError"), ("10", "PreviousMessageFailed")])
+        self.assertEqual(len(result["Successful"]), 10)
+        self.stubber.assert_no_pending_responses()
+
+    def test_a_group_is_sent_once_per_call(self):
+        self.groups = ["a", "b", "a", "a", "c"]
+        self.stub_send_message_batch([0, 1], failed=(0,))
+        self.stub_send_message_batch([0])
+        self.stub_send_message_batch([2])
+        self.stub_send_message_batch([3, 4])
+
+        result = self.send_many()
+
+        self.assertEqual([entry["Id"] for entry in result["Successful"]], [str(i) for i in range(5)])
+        self.stubber.assert_no_pending_responses()
+
+
+class TestDeleteMessages(TestCase):
+
+    def setUp(self):
+        sqs.clear_queue_urls()
+        self.stubber = Stubber(sqs.get_sqs_client())
+        self.stubber.activate()
+        self.addCleanup(self.stubber.deactivate)
+        self.addCleanup(sqs.clear_queue_urls)
+        self.stubber.add_response("get_queue_url", {"QueueUrl": QUEUE_URL}, {"QueueName": QUEUE_NAME})
+
+    def stub_delete_message_batch(self, ids, failed=(), sender_fault=False):
+        self.stubber.add_response(
+            "delete_message_batch",
+            {
+                "Successful": [{"Id": str(i)} for i in ids if i not in failed],
+                "Failed": [{"Id": str(i), "SenderFault": sender_fault, "Code": "InternalError"} for i in failed],
+            },
+            {"QueueUrl": QUEUE_URL, "Entries": [{"Id": str(i), "ReceiptHandle": f"handle-{i}"} for i in ids]},
+        )
+
+    def test_results_are_flat_and_mapped_to_handles(self):
+        self.stub_delete_message_batch(range(10), failed=(4,), sender_fault=True)
+        self.stub_delete_message_batch(range(10, 12))
+
+        result = sqs.delete_sqs_messages(QUEUE_NAME, [f"handle-{i}" for i in range(12)], max_workers=1)
+
+        self.assertEqual([entry["ReceiptHandle"] for entry in result["Successful"]],
+                         [f"handle-{i}" for i in range(12) if i != 4])
+        self.assertEqual([(entry["Id"], entry["ReceiptHandle"]) for entry in result["Failed"]], [("4", "handle-4")])
+        self.stubber.assert_no_pending_responses()
+
+    def test_retries_transient_failures(self):
+        self.stub_delete_message_batch(range(3), failed=(0, 2))
+        self.stubber.add_client_error("delete_message_batch", service_error_code="ServiceUnavailable",
+                                      http_status_code=503)
+        self.stub_delete_message_batch([0, 2])
+
+        result = sqs.delete_sqs_messages(QUEUE_NAME, [f"handle-{i}" for i in range(3)], max_workers=1, backoff=0)
+
+        self.assertEqual([entry["Id"] for entry in result["Successful"]], ["0", "1", "2"])
+        self.assertEqual(result["Failed"], [])
+        self.stubber.assert_no_pending_responses()
+
+
+def received(*ids):
+    return {"Messages": [
+        {"MessageId": f"message-{i}", "ReceiptHandle": f"handle-{i}", "Body": json.dumps({"id": i}),
+         "MessageAttributes": {"origin": {"DataType": "String", "StringValue": "test"}}}
+        for i in ids
+    ]}
+
+
+def deleted(queue_name, receipt_handles):
+    return {"Successful": [{"Id": str(i), "ReceiptHandle": handle} for i, handle in enumerate(receipt_handles)],
+            "Failed": []}
+
+
+@mock.patch.object(sqs, "change_message_visibility", return_value=[])
+@mock.patch.object(sqs, "delete_sqs_messages", side_effect=deleted)
+@mock.patch.object(sqs, "get_sqs_queue_url", return_value=QUEUE_URL)
+class TestConsumer(TestCase):
+
+    def test_drains_until_empty(self, _, delete, __):
+        def handler(record):
+            if json.loads(record.body)["id"] == 2:
+                raise RuntimeError("Mock error raised")
+            self.assertEqual(record.message_attributes["origin"].string_value, "test")
+            self.assertEqual(record.event_source_arn, f"arn:aws:sqs:us-east-1:123456789012:{QUEUE_NAME}")
+
+        with mock.patch.object(sqs, "receive_message", side_effect=[received(1, 2), received(3), {}]) as receive:
+            totals = SqsConsumer(QUEUE_NAME, handler).run(stop_when_empty=True)
+
+        self.assertEqual(totals, {"batches": 2, "received": 3, "deleted": 2, "failed": 1})
+        self.assertEqual(receive.call_args.args, (QUEUE_URL, 10, 20, 60))
+        self.assertEqual([c.args[1] for c in delete.call_args_list], [["handle-1"], ["handle-3"]])
+
+    def test_max_batches_does_not_prefetch(self, *_):
+        with mock.patch.object(sqs, "receive_message", side_effect=[received(1), received(2)]) as receive:
+            totals = SqsConsumer(QUEUE_NAME, batch_handler=lambda records: [None] * len(records)).run(max_batches=1)
+
+        self.assertEqual(totals["batches"], 1)
+        receive.assert_called_once()
+
+    def test_stop_releases_prefetched_messages(self, _, delete, visibility):
+        consumer = SqsConsumer(QUEUE_NAME, lambda record: consumer.stop())
+
+        with mock.patch.object(sqs, "receive_message", side_effect=[received(1), received(2)]):
+            totals = consumer.run()
+
+        self.assertEqual(totals["deleted"], 1)
+        visibility.assert_called_once_with(QUEUE_URL, ["handle-2"], 0)
+
+    def test_failed_batch_releases_prefetched_messages(self, _, delete, visibility):
+        delete.side_effect = RuntimeError("Mock error raised")
+        consumer = SqsConsumer(QUEUE_NAME, lambda record: None)
+
+        with mock.patch.object(sqs, "receive_message", side_effect=[received(1), received(2)]):
+            with self.assertRaisesRegex(RuntimeError, "Mock error raised"):
+                consumer.run()
+
+        visibility.assert_called_once_with(QUEUE_URL, ["handle-2"], 0)
+        self.assertEqual(consumer._in_flight, {})
+
+    def test_extends_visibility_of_slow_messages(self, _, __, visibility):
+        consumer = SqsConsumer(QUEUE_NAME, lambda record: time.sleep(2.5), visibility_timeout=2)
+
+        with mock.patch.object(sqs, "receive_message", side_effect=[received(1), {}]):
+            consumer.run(stop_when_empty=True)
+
+        visibility.assert_any_call(QUEUE_URL, ["handle-1"], 2)
+
+
+class TestRecordExecutor(TestCase):
+
+    def test_groups_keep_their_order_on_one_worker(self):
+        items = [("a", 1), ("b", 1), ("a", 2), (None, 1), ("b", 2), ("a", 3), (None, 2)]
+        calls = []
+
+        def function(item):
+            calls.append((item, threading.get_ident()))
+            time.sleep(0.01)
+            return item[1] * 10
+
+        results = RecordExecutor(3).map(function, items, group_key=lambda item: item[0])
+
+        self.assertEqual(results, [item[1] * 10 for item in items])
+        for group in ("a", "b"):
+            group_calls = [(item, thread) for item, thread in calls if item[0] == group]
+            self.assertEqual([item for item, _ in group_calls], [item for item in items if item[0] == group])
+            self.assertEqual(len({thread for _, thread in group_calls}), 1)
+
+    def test_groups_run_concurrently(self):
+        barrier = threading.Barrier(2, timeout=5)
+
+        results = RecordExecutor(2).map(lambda item: barrier.wait() is not None, ["a", "b"], group_key=str)
+
+        self.assertEqual(results, [True, True])
+
+    def test_worker_context_entered_once_per_worker(self):
+        entered = []
+
+        @contextlib.contextmanager
+        def worker_context():
+            entered.append(threading.get_ident())
+            yield
+
+        def function(item):
+            # Both workers hold a context before the first items finish.
+            if item < 2:
+                barrier.wait()
+            return item
+
+        barrier = threading.Barrier(2, timeout=5)
+        results = RecordExecutor(2, worker_context=worker_context).map(function, range(10))
+
+        self.assertEqual(results, list(range(10)))
+        self.assertEqual(len(set(entered)), len(entered))
+        self.assertEqual(len(entered), 2)
+
+    def test_first_error_raised_after_every_item(self):
+        done = []
+
+        def function(item):
+            if item in (3, 5):
+                raise RuntimeError(f"Mock error raised {item}")
+            done.append(item)
+
+        with self.assertRaisesRegex(RuntimeError, "Mock error raised 3"):
+            RecordExecutor(2).map(function, range(8))
+        self.assertEqual(sorted(done), [0, 1, 2, 4, 6, 7])
+
+
+def fifo_record(message_id, group):
+    return {"messageId": message_id, "receiptHandle": f"handle-{message_id}", "body": message_id,
+            "attributes": {"MessageGroupId": group}, "messageAttributes": {}, "md5OfBody": "md5",
+            "eventSource": "aws:sqs", "eventSourceARN": f"arn:aws:sqs:us-east-1:123456789012:{QUEUE_NAME}.fifo",
+            "awsRegion": "us-east-1"}
+
+
+class TestSqsBatchProcessor(TestCase):
+
+    def setUp(self):
+        self.records = [fifo_record(message_id, message_id[0])
+                        for message_id in ("a-1", "b-1", "a-2", "b-2", "a-3")]
+        self.processed = []
+
+    def handler(self, record):
+        self.processed.append(record.message_id)
+        if record.message_id == "a-2":
+            raise RuntimeError("Mock error raised")
+        return record.message_id
+
+    def assert_rest_of_group_failed(self, processor):
+        response = process_partial_response({"Records": self.records}, self.handler, processor=processor)
+
+        self.assertEqual(response, {"batchItemFailures": [{"itemIdentifier": "a-2"}, {"itemIdentifier": "a-3"}]})
+        self.assertNotIn("a-3", self.processed)
+        self.assertIsInstance(processor.results[4], RecordFailure)
+        self.assertEqual(processor.results[:2], ["a-1", "b-1"])
+
+    def test_fifo_group_fails_after_first_failure(self):
+        self.assert_rest_of_group_failed(SqsBatchProcessor())
+
+    def test_fifo_group_fails_after_first_failure_with_executor(self):
+        self.assert_rest_of_group_failed(SqsBatchProcessor(executor=RecordExecutor(2)))
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+from pathlib import Path
+from unittest import TestCase, mock
+
+LAYERS = Path(__file__).parent / "layers"
+sys.path[:0] = [
+    str(LAYERS / "core" / "python"),
+    str(LAYERS / "core_db" / "python"),
+    str(LAYERS / "lambda_powertools_custom" / "python"),
+]
+os.environ.setdefault("ENVIRONMENT", "dev")
+os.environ.setdefault("APP_NAME", "p2p")
+os.environ.setdefault("DEVELOPER", "Test")
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+
+from aws_lambda_powertools.utilities.parameters import base  # noqa: E402
+from aws_lambda_powertools.utilities.parameters.exceptions import TransformParameterError  # noqa: E402
+from botocore.stub import Stubber  # noqa: E402
+from core_aws import ssm as core_ssm  # noqa: E402
+from core_aws.bootstrap import ParametersBootstrap  # noqa: E402
+from core_aws.clients import get_client  # noqa: E402
+from db_aws import ssm as db_ssm  # noqa: E402
+
+PREFIX = f"/{os.environ['ENVIRONMENT']}/{os.environ['APP_NAME']}"
+
+
+def parameter(name, value):
+    return {"Name": f"{PREFIX}/{name}", "Type": "String", "Value": value}
+
+
+class SsmTests:
+    """Runs the bulk loaders of a layer against a stubbed client, every call not queued fails the test."""
+
+    ssm = None
+
+    def setUp(self):
+        patchers = [mock.patch.dict(base.DEFAULT_PROVIDERS),
+                    mock.patch.object(self.ssm, "BOOTSTRAP", ParametersBootstrap())]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        base.DEFAULT_PROVIDERS.pop("ssm", None)
+        self.stubber = Stubber(get_client("ssm"))
+        self.stubber.activate()
+        self.addCleanup(self.stubber.deactivate)
+
+    def stub_get_parameters(self, names, values=None, invalid=()):
+        values = values or {}
+        response = {"Parameters": [parameter(name, values.get(name, f"value-{name}"))
+                                   for name in names if name not in invalid]}
+        if invalid:
+            response["InvalidParameters"] = [f"{PREFIX}/{name}" for name in invalid]
+        self.stubber.add_response(
+            "get_parameters", response, {"Names": [f"{PREFIX}/{name}" for name in names], "WithDecryption": True}
+        )
+
+    def test_load_parameters_follows_pages(self):
+        expected = {"Path": PREFIX, "Recursive": True, "WithDecryption": True}
+        self.stubber.add_response("get_parameters_by_path", {"Parameters": [parameter("db", '{"port": 5432}')],
+                                                             "NextToken": "page-2"}, expected)
+        self.stubber.add_response("get_parameters_by_path", {"Parameters": [parameter("bus", "p2p-bus")]},
+                                  dict(expected, NextToken="page-2"))
+
+        values = self.ssm.load_parameters()
+
+        self.assertEqual(values, {f"{PREFIX}/db": '{"port": 5432}', f"{PREFIX}/bus": "p2p-bus"})
+        self.assertEqual(self.ssm.get_parameter("db", transform=True), {"port": 5432})
+        self.assertEqual(self.ssm.get_parameter("bus"), "p2p-bus")
+        self.stubber.assert_no_pending_responses()
+
+    def test_get_parameters_in_batches_of_ten(self):
+        names = [f"name-{i}" for i in range(12)]
+        self.stub_get_parameters(names[:10], invalid=("name-3",))
+        self.stub_get_parameters(names[10:])
+
+        values = self.ssm.get_parameters(names + ["name-0"])
+
+        self.assertEqual(values, {name: f"value-{name}" for name in names if name != "name-3"})
+        self.stubber.assert_no_pending_responses()
+
+    def test_get_parameters_fetches_only_missing_values(self):
+        self.stub_get_parameters(["a", "b"])
+        self.stub_get_parameters(["c"])
+
+        self.ssm.get_parameters(["a", "b"])
+        values = self.ssm.get_parameters(["b", "c"])
+
+        self.assertEqual(values, {"b": "value-b", "c": "value-c"})
+        self.stubber.assert_no_pending_responses()
+
+    def test_get_parameters_transformed(self):
+        self.stub_get_parameters(["db"], {"db": '{"port": 5432}'})
+
+        self.assertEqual(self.ssm.get_parameters(["db"], transform=True), {"db": {"port": 5432}})
+
+    def test_get_parameters_not_json(self):
+        self.stub_get_parameters(["db", "bus"], {"db": '{"port": 5432}', "bus": "p2p-bus"})
+
+        with self.assertRaisesRegex(TransformParameterError, "bus"):
+            self.ssm.get_parameters(["db", "bus"], transform=True)
+
+
+class TestCoreSsm(SsmTests, TestCase):
+    ssm = core_ssm
+
+
+class TestDbSsm(TestCase):
+
+    def test_layers_share_the_functions(self):
+        for name in db_ssm.__all__:
+            self.assertIs(getattr(db_ssm, name), getattr(core_ssm, name))
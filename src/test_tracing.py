@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+import importlib
+import os
+import sys
+import tempfile
+import uuid
+from pathlib import Path
+from unittest import TestCase, mock
+
+LAYERS = Path(__file__).parent / "layers"
+sys.path[:0] = [
+    str(LAYERS / "core" / "python"),
+    str(LAYERS / "lambda_powertools_custom" / "python"),
+]
+os.environ.setdefault("ENVIRONMENT", "dev")
+os.environ.setdefault("APP_NAME", "p2p")
+os.environ.setdefault("DEVELOPER", "Test")
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+
+from core_utils import tracing  # noqa: E402
+
+
+class TestTracingModules(TestCase):
+
+    def test_default(self):
+        with mock.patch.dict(os.environ):
+            os.environ.pop("TRACING_MODULES", None)
+            self.assertEqual(tracing.get_tracing_modules(), tracing.DEFAULT_MODULES)
+            self.assertEqual(tracing.get_tracing_modules(["botocore", "psycopg2"]), ("botocore", "psycopg2"))
+
+    def test_from_environment(self):
+        with mock.patch.dict(os.environ, {"TRACING_MODULES": " psycopg2, ,botocore "}):
+            self.assertEqual(tracing.get_tracing_modules(["requests"]), ("psycopg2", "botocore"))
+
+    def test_none(self):
+        with mock.patch.dict(os.environ, {"TRACING_MODULES": "None"}):
+            self.assertEqual(tracing.get_tracing_modules(), ())
+
+
+class TestPatchModules(TestCase):
+
+    def setUp(self):
+        patchers = [
+            mock.patch.object(tracing, "_REGISTERED", set()),
+            mock.patch.object(tracing, "_PATCHED", set()),
+            mock.patch.object(tracing, "_wrap_sampled_only"),
+            mock.patch("aws_xray_sdk.core.patch"),
+            mock.patch.dict(os.environ),
+        ]
+        self.wrap, self.patch = [patcher.start() for patcher in patchers][2:4]
+        for patcher in patchers:
+            self.addCleanup(patcher.stop)
+        os.environ.pop("DEVELOPER")
+
+    def import_module(self, name):
+        # A module never imported before, the post import hooks of wrapt can not be removed.
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        Path(directory.name, f"{name}.py").write_text("")
+        sys.path.insert(0, directory.name)
+        self.addCleanup(sys.path.remove, directory.name)
+        self.addCleanup(sys.modules.pop, name, None)
+        return importlib.import_module(name)
+
+    def test_skipped_for_developers(self):
+        os.environ["DEVELOPER"] = "Test"
+
+        self.assertEqual(tracing.patch_modules(["json"]), [])
+        self.patch.assert_not_called()
+
+    def test_imported_libraries_are_patched_right_away(self):
+        self.assertEqual(tracing.patch_modules(["json", "csv"]), ["json", "csv"])
+        self.assertEqual(tracing.patch_modules(["json", "io"]), ["io"])
+
+        self.assertEqual([c.args[0] for c in self.patch.call_args_list], [["json"], ["csv"], ["io"]])
+        self.assertEqual([c.args[0] for c in self.wrap.call_args_list], ["json", "csv", "io"])
+
+    def test_libraries_are_patched_on_first_import(self):
+        name = f"tracing_library_{uuid.uuid4().hex}"
+
+        self.assertEqual(tracing.patch_modules([name]), [name])
+        self.patch.assert_not_called()
+        self.import_module(name)
+
+        self.patch.assert_called_once_with([name], raise_errors=False)
+
+    def test_failed_patch_does_not_fail_the_import(self):
+        name = f"tracing_library_{uuid.uuid4().hex}"
+        self.patch.side_effect = RuntimeError("Mock error raised")
+
+        tracing.patch_modules([name])
+
+        self.assertEqual(self.import_module(name).__name__, name)
+        self.assertNotIn(name, tracing._PATCHED)
+
+    def test_sampled_only_disabled(self):
+        tracing.patch_modules(["json"], sampled_only=False)
+
+        self.patch.assert_called_once()
+        self.wrap.assert_not_called()
+
+    def test_botocore_is_patched_with_boto3(self):
+        with mock.patch("wrapt.register_post_import_hook") as register:
+            tracing.patch_modules(["botocore", "psycopg2"])
+
+        self.assertEqual([c.args[1] for c in register.call_args_list], ["boto3", "psycopg2"])
+
+
+class TestSampledOnly(TestCase):
+
+    def setUp(self):
+        self.original = mock.Mock(return_value="original")
+        self.recorded = mock.Mock(return_value="recorded", __wrapped__=self.original)
+
+    def test_sampled_calls_are_recorded(self):
+        with mock.patch.object(tracing, "is_sampled", return_value=True):
+            result = tracing._sampled_only(tracing._call_original)(self.recorded, None, (1,), {"a": 2})
+
+        self.assertEqual(result, "recorded")
+        self.recorded.assert_called_once_with(1, a=2)
+        self.original.assert_not_called()
+
+    def test_not_sampled_calls_skip_the_recorder(self):
+        with mock.patch.object(tracing, "is_sampled", return_value=False):
+            result = tracing._sampled_only(tracing._call_original)(self.recorded, None, (1,), {"a": 2})
+
+        self.assertEqual(result, "original")
+        self.original.assert_called_once_with(1, a=2)
+        self.recorded.assert_not_called()
+
+    def test_not_sampled_cursor_calls_the_raw_cursor(self):
+        cursor = mock.Mock(__wrapped__=mock.Mock())
+        with mock.patch.object(tracing, "is_sampled", return_value=False):
+            tracing._sampled_only(tracing._call_cursor("execute"))(self.recorded, cursor, ("SELECT 1",), {})
+
+        cursor.__wrapped__.execute.assert_called_once_with("SELECT 1")
+        self.recorded.assert_not_called()
+
+    def test_without_active_segment(self):
+        self.assertFalse(tracing.is_sampled())